@@ -1,7 +1,9 @@
 # backend/app/api/v1/deps.py
 from typing import Optional
 from fastapi import Depends, HTTPException
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
 from ..db.session import async_session
 from ..middleware.auth import get_current_user_id
 
@@ -17,3 +19,21 @@ async def require_user_id(user_id: Optional[str] = Depends(get_current_user_id))
 # --- NEW: alias for older routes that import `auth_user` ---
 async def auth_user(user_id: str = Depends(require_user_id)) -> str:
     return user_id
+
+async def require_moderator(
+    user_id: str = Depends(require_user_id),
+    db: AsyncSession = Depends(get_db),
+) -> str:
+    res = await db.execute(
+        text("""
+          select exists (
+            select 1 from public.profiles
+             where id = cast(:uid as uuid)
+               and cast(roles as text[]) && cast(:roles as text[])
+          )
+        """),
+        {"uid": user_id, "roles": [r.strip() for r in settings.MODERATOR_ROLES.split(",") if r.strip()]},
+    )
+    if not res.scalar():
+        raise HTTPException(status_code=403, detail="Moderators only")
+    return user_id
@@ -10,6 +10,10 @@ from .routes_match import router as match
 from .routes_ratings import router as ratings
 from .routes_views import router as views
 from .routes_entries import router as entries
+from .routes_feed import router as feed
+from .routes_tags import router as tags
+from .routes_calendar import router as calendar
+from .routes_moderation import router as moderation
 from .routes_psm_offers import router as psm_offers
 from .routes_psm_requests import router as psm_requests
 from .routes_psm_engagements import router as psm_engagements
@@ -44,6 +48,10 @@ router.include_router(match,     prefix="/match",     tags=["match"])
 router.include_router(ratings, prefix="/ratings", tags=["ratings"])
 router.include_router(views, prefix="/views", tags=["views"])  # ✅ change
 router.include_router(entries, prefix="/entries", tags=["entries"])
+router.include_router(feed, prefix="/feed", tags=["feed"])
+router.include_router(tags, prefix="/tags", tags=["tags"])
+router.include_router(calendar)        # /api/calendar/...
+router.include_router(moderation)      # /api/moderation/...
 # New PSM routes
 router.include_router(psm_offers)      # /api/psm/offers...
 router.include_router(psm_requests)    # /api/psm/requests...
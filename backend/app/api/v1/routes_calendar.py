@@ -0,0 +1,68 @@
+# app/api/v1/routes_calendar.py
+from __future__ import annotations
+
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import UUID4
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...api.deps import get_db, require_user_id
+from ...core.config import settings
+from ...middleware.etag import etag_matches
+from ...services.calendar import check_feed_token, feed_token, offer_feed, user_feed
+
+router = APIRouter(prefix="/calendar", tags=["calendar"])
+
+ICS_MEDIA_TYPE = "text/calendar; charset=utf-8"
+
+
+def _ics_response(request: Request, feed: dict, cache_control: str) -> Response:
+    headers = {
+        "ETag": feed["etag"],
+        "Last-Modified": format_datetime(feed["last_modified"], usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        if etag_matches(inm, feed["etag"]):
+            return Response(status_code=304, headers=headers)
+    elif (ims := request.headers.get("if-modified-since")):
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            since = None
+        if since is not None and since.tzinfo is not None and feed["last_modified"] <= since:
+            return Response(status_code=304, headers=headers)
+    return Response(content=feed["body"], media_type=ICS_MEDIA_TYPE, headers=headers)
+
+
+@router.get("/token", response_model=dict)
+async def my_feed_token(user_id: str = Depends(require_user_id)):
+    """Subscription URL for the caller's calendar feed (engagements + events)."""
+    token = feed_token(user_id)
+    if token is None:
+        raise HTTPException(503, "calendar feeds are not configured")
+    prefix = "/" + getattr(settings, "API_PREFIX", "/api").strip("/")
+    return {"token": token, "path": f"{prefix}/calendar/users/{user_id}.ics?token={token}"}
+
+
+@router.get("/users/{user_id}.ics")
+async def user_calendar(
+    request: Request,
+    user_id: UUID4,
+    token: str = Query(..., min_length=8),
+    db: AsyncSession = Depends(get_db),
+):
+    """Scheduled engagements (either side) and events the user is going to."""
+    if not check_feed_token(str(user_id), token):
+        raise HTTPException(404, "feed not found")
+    feed = await user_feed(db, str(user_id))
+    return _ics_response(request, feed, f"private, max-age={settings.CALENDAR_CACHE_TTL}")
+
+
+@router.get("/offers/{offer_id}.ics")
+async def offer_calendar(request: Request, offer_id: UUID4, db: AsyncSession = Depends(get_db)):
+    """Upcoming open slots of an offer."""
+    feed = await offer_feed(db, str(offer_id))
+    return _ics_response(request, feed, f"public, max-age={settings.CALENDAR_CACHE_TTL}")
@@ -1,36 +1,185 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
+from typing import Literal, Optional
+from pydantic import UUID4, Field
 from ...api.deps import get_db, require_user_id
+from ...schemas.common import BatchIds
+from ...services.exports import ExportFormat, export_response
+from ...services.profiles import attach_profiles
 from ...utils.dbhelpers import row_to_dict
+from ...utils.pagination import decode_cursor, page_of, parse_ts, set_next_cursor
 
 router = APIRouter()
 
+MAX_DEPTH = 8
+
+CommentEntity = Literal["rfh", "question", "content", "offer", "project", "event"]
+
+_AUTHOR = {"author_id": {
+    "username": "author_username", "display_name": "author_name", "avatar_url": "author_avatar_url",
+}}
+
+_COLS = """
+    c.id, c.entity, c.entity_id, c.author_id, c.body, c.created_at,
+    c.parent_id, c.depth, c.reply_count, c.path
+"""
+
+
 @router.get("", response_model=list[dict])
 async def list_comments(
+    response: Response,
     entity: str = Query(...),
     id: str = Query(..., alias="id"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
 ):
     """
-    GET /api/comments?entity=rfh&id=<uuid>
-    Returns newest first.
+    GET /api/comments?entity=rfh&id=<uuid>[&limit=50&cursor=...]
+    Top-level comments, newest first, each with `reply_count`.
+    Next page cursor is returned in the X-Next-Cursor header.
     """
+    args: dict = {"e": entity, "id": id, "lim": limit + 1}
+    after = ""
+    c = decode_cursor(cursor, 2)
+    if c:
+        after = "and (c.created_at, c.id) < (:c_ts, cast(:c_id as uuid))"
+        args.update({"c_ts": parse_ts(c[0]), "c_id": c[1]})
     res = await db.execute(
-        text("""
-            select c.id, c.entity, c.entity_id, c.author_id, c.body, c.created_at,
-                   p.username as author_username,
-                   p.display_name as author_name,
-                   p.avatar_url as author_avatar_url
+        text(f"""
+            select {_COLS}
             from public.comments c
-            left join public.profiles p on p.id = c.author_id
             where c.entity = :e and c.entity_id = :id
-            order by c.created_at desc
+              and c.parent_id is null
+              {after}
+            order by c.created_at desc, c.id desc
+            limit :lim
         """),
+        args,
+    )
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "created_at", "id")
+    set_next_cursor(response, next_cursor)
+    return await attach_profiles(db, items, _AUTHOR)
+
+
+@router.get("/export")
+async def export_comments(
+    entity: CommentEntity = Query(...),
+    id: UUID4 = Query(..., alias="id"),
+    format: ExportFormat = Query("ndjson"),
+):
+    """Whole thread of an entity in thread order (path), streamed as NDJSON or CSV."""
+    sql = f"""
+        select {_COLS}, p.username as author_username
+        from public.comments c
+        left join public.profiles p on p.id = c.author_id
+        where c.entity = :e and c.entity_id = cast(:id as uuid)
+        order by c.path collate "C"
+    """
+    # validated up front: once streaming starts a bad value can only truncate the body
+    return export_response(sql, {"e": entity, "id": str(id)}, format, f"comments-{entity}-{id}")
+
+
+@router.get("/count", response_model=dict)
+async def comment_count(
+    entity: str = Query(...),
+    id: str = Query(..., alias="id"),
+    db: AsyncSession = Depends(get_db),
+):
+    r = await db.execute(
+        text("select count from public.comment_counts where entity = :e and entity_id = cast(:id as uuid)"),
         {"e": entity, "id": id},
     )
-    return [row_to_dict(r) for r in res.fetchall()]
+    return {"entity": entity, "entity_id": id, "count": int(r.scalar() or 0)}
+
+
+class CommentsBatch(BatchIds):
+    entity: str
+    per_entity: int = Field(3, ge=0, le=20)
+
+
+@router.post("/batch", response_model=dict)
+async def comments_batch(payload: CommentsBatch, db: AsyncSession = Depends(get_db)):
+    """
+    Card hydration for a list of entities of one type.
+    Body: {"entity":"rfh", "ids":[uuid, ...<=300], "per_entity":3}
+    Returns {entity_id: {"count": n, "latest": [top-level comments, newest first]}}
+    """
+    ids = payload.keys()
+    out: dict[str, dict] = {i: {"count": 0, "latest": []} for i in ids}
+
+    counts = await db.execute(
+        text("""
+            select entity_id, count from public.comment_counts
+            where entity = :e and entity_id = any(cast(:ids as uuid[]))
+        """),
+        {"e": payload.entity, "ids": ids},
+    )
+    for r in counts.fetchall():
+        out[str(r.entity_id)]["count"] = int(r.count)
+
+    if payload.per_entity:
+        res = await db.execute(
+            text(f"""
+                select {_COLS}
+                from unnest(cast(:ids as uuid[])) as t(id)
+                cross join lateral (
+                  select * from public.comments c
+                  where c.entity = :e and c.entity_id = t.id and c.parent_id is null
+                  order by c.created_at desc, c.id desc
+                  limit :per
+                ) c
+            """),
+            {"e": payload.entity, "ids": ids, "per": payload.per_entity},
+        )
+        rows = [row_to_dict(r) for r in res.fetchall()]
+        await attach_profiles(db, rows, _AUTHOR)
+        for r in rows:
+            out[str(r["entity_id"])]["latest"].append(r)
+    return out
+
+
+@router.get("/{comment_id}/replies", response_model=list[dict])
+async def list_replies(
+    comment_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Whole subtree under a comment in thread order (depth-first, oldest first),
+    served as one range scan over the materialized path.
+    """
+    root = await db.execute(
+        text("select path from public.comments where id = cast(:id as uuid)"), {"id": comment_id}
+    )
+    path = root.scalar()
+    if path is None:
+        raise HTTPException(404, "comment not found")
+
+    lo = path + "."
+    c = decode_cursor(cursor, 1)
+    if c:
+        if not str(c[0]).startswith(lo):
+            raise HTTPException(422, "invalid cursor")
+        lo = c[0]
+    res = await db.execute(
+        text(f"""
+            select {_COLS}
+            from public.comments c
+            where c.path collate "C" > :lo
+              and c.path collate "C" < :hi
+            order by c.path collate "C"
+            limit :lim
+        """),
+        {"lo": lo, "hi": path + "/", "lim": limit + 1},
+    )
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "path")
+    set_next_cursor(response, next_cursor)
+    return await attach_profiles(db, items, _AUTHOR)
+
 
 @router.post("", response_model=dict)
 async def create_comment(
@@ -40,21 +189,66 @@ async def create_comment(
 ):
     """
     Expects: {"entity":"rfh", "entity_id":"uuid", "body":"text"}
+    Reply:   {"parent_id":"uuid", "body":"text"}   (entity is taken from the parent)
     """
+    parent_id = payload.get("parent_id")
     entity = payload.get("entity")
     entity_id = payload.get("entity_id")
     body = payload.get("body")
-    if not entity or not entity_id or not body:
+    if not body or (not parent_id and (not entity or not entity_id)):
         return {"ok": False, "detail": "missing fields"}
 
+    # one statement: resolve parent, insert with its path, bump parent + entity counters
     r = await db.execute(
         text("""
-            insert into public.comments (entity, entity_id, author_id, body)
-            values (:e, :id, :uid, :b)
-            returning id
+            with parent as (
+              select id, entity, entity_id, path, depth
+                from public.comments
+               where id = cast(:pid as uuid)
+            ),
+            target as (
+              select coalesce((select entity from parent), :e) as entity,
+                     coalesce((select entity_id from parent), cast(:eid as uuid))   as entity_id,
+                     (select path from parent) as parent_path,
+                     coalesce((select depth + 1 from parent), 0) as depth
+               where cast(:pid as uuid) is null or exists (select 1 from parent)
+            ),
+            new as (
+              select gen_random_uuid() as id, clock_timestamp() as ts
+            ),
+            ins as (
+              insert into public.comments (id, entity, entity_id, author_id, body, parent_id, path, depth, created_at)
+              select new.id, t.entity, t.entity_id, :uid, :b, cast(:pid as uuid),
+                     coalesce(t.parent_path || '.', '')
+                       || to_char(new.ts at time zone 'UTC', 'YYYYMMDDHH24MISSUS')
+                       || substr(replace(new.id::text, '-', ''), 1, 8),
+                     t.depth, new.ts
+                from target t, new
+               where t.depth <= :max_depth
+              returning id, entity, entity_id, parent_id
+            ),
+            bump_parent as (
+              update public.comments p
+                 set reply_count = p.reply_count + 1
+                from ins
+               where p.id = ins.parent_id
+            ),
+            bump_entity as (
+              insert into public.comment_counts (entity, entity_id, count)
+              select entity::text, entity_id, 1 from ins
+              on conflict (entity, entity_id) do update
+                 set count = public.comment_counts.count + 1,
+                     updated_at = now()
+            )
+            select id from ins
         """),
-        {"e": entity, "id": entity_id, "uid": user_id, "b": body},
+        {"e": entity, "eid": entity_id, "pid": parent_id, "uid": user_id, "b": body, "max_depth": MAX_DEPTH},
     )
     cid = r.scalar()
+    if cid is None:
+        await db.rollback()
+        if parent_id:
+            raise HTTPException(404, "parent comment not found or thread too deep")
+        return {"ok": False, "detail": "insert failed"}
     await db.commit()
     return {"ok": True, "id": str(cid)}
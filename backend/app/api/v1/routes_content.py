@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from ..deps import get_db, require_user_id         # fixed relative import
+from ...middleware.etag import make_etag, not_modified
 from ...schemas.content import ContentCreate
+from ...services.retrieval import retrieval_index
+from ...services.tags import clean_tags, record_tags, tag_index
 from ...utils.dbhelpers import row_to_dict
 
 router = APIRouter(prefix="/content", tags=["content"])
@@ -26,15 +29,11 @@ async def create_content(payload: ContentCreate, db: AsyncSession = Depends(get_
     r = await db.execute(csql, params)
     cid = r.scalar()
 
-    if payload.tags:
-        # --- SEÇENEK A: EKSİK TAG'LERİ OLUŞTUR (MVP için pratik)
-        # DİKKAT: RLS policy "admin-only insert" ise permission hatası alırsın (aşağıda seçenekler var)
-        await db.execute(text("""
-            insert into public.tags (slug, label)
-            select t, initcap(replace(t, '-', ' '))
-            from unnest(cast(:tags as text[])) as u(t)
-            on conflict (slug) do nothing
-        """), {"tags": payload.tags})
+    tags = clean_tags(payload.tags)
+    if tags:
+        # eksik tag'leri oluşturur + tag_counts (services/tags.py)
+        # DİKKAT: RLS policy "admin-only insert" ise permission hatası alırsın
+        await record_tags(db, "content", tags)
 
         # Content <-> Tags eşle
         await db.execute(text("""
@@ -42,11 +41,11 @@ async def create_content(payload: ContentCreate, db: AsyncSession = Depends(get_
             select :cid, tg.id
             from public.tags tg
             where tg.slug = any(cast(:tags as text[]))
-        """), {"cid": cid, "tags": payload.tags})
-
-        # --- Eğer SEÇENEK B'yi (tag eklememeyi) tercih edersen yukarıdaki insert into public.tags bloğunu kaldır.
+        """), {"cid": cid, "tags": tags})
 
     await db.commit()
+    tag_index.apply("content", tags)
+    await retrieval_index.refresh(db, "content", str(cid))
     return {"id": str(cid)}
 
 @router.get("", response_model=list[dict])
@@ -80,7 +79,19 @@ async def list_content(
     return [row_to_dict(row) for row in res.fetchall()]
 
 @router.get("/{content_id}", response_model=dict)
-async def get_content(content_id: str, db: AsyncSession = Depends(get_db)):
+async def get_content(content_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    ver = (await db.execute(text("""
+        select c.updated_at, c.version
+        from public.content c
+        where c.id = :id and c.is_published = true
+    """), {"id": content_id})).first()
+    if not ver:
+        raise HTTPException(status_code=404, detail="Not found")
+    etag = make_etag("content", content_id, *ver)
+    if (hit := not_modified(request, etag)):
+        return hit
+    response.headers["ETag"] = etag
+
     res = await db.execute(text("""
         select
           c.id, c.author_id, c.type, c.title, c.summary, c.body,
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...api.deps import get_db, require_user_id
+from ...middleware.auth import get_current_user_id
+from ...services.entries_feed import entries_head, fetch_entries, hydrate, public_entry
 from ...utils.dbhelpers import row_to_dict
+from ...utils.pagination import decode_cursor, page_of, parse_ts, set_next_cursor
 
 router = APIRouter()
 
@@ -18,22 +23,37 @@ async def create_entry(
         text("""
           insert into public.entries (author_id, body, images, anonymous)
           values (:uid, :body, coalesce(:imgs, array[]::text[]), :anon)
-          returning id
+          returning id, author_id, body, images, anonymous, created_at, visibility::text as visibility
         """),
         {"uid": user_id, "body": body, "imgs": images, "anon": anonymous},
     )
+    row = row_to_dict(r.first())
     await db.commit()
-    return {"id": str(r.scalar())}
+    if row.pop("visibility") == "public":
+        entries_head.push((await hydrate(db, [row]))[0])
+    return {"id": str(row["id"])}
 
 @router.get("", response_model=list[dict])
-async def list_entries(db: AsyncSession = Depends(get_db)):
-    res = await db.execute(
-        text("""
-          select e.id, e.author_id, e.body, e.images, e.anonymous, e.created_at
-          from public.entries e
-          where e.visibility='public'
-          order by e.created_at desc
-          limit 50
-        """)
-    )
-    return [row_to_dict(x) for x in res.fetchall()]
+async def list_entries(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    viewer: Optional[str] = Depends(get_current_user_id),
+):
+    """
+    Public entries, newest first; next page cursor in the X-Next-Cursor header.
+    Pages inside the in-memory head (services/entries_feed.py) skip Postgres.
+    Anonymous entries carry no author fields (author_id only for their author).
+    """
+    c = decode_cursor(cursor, 2)
+    after = (parse_ts(c[0]), str(c[1])) if c else None
+
+    await entries_head.load(db)
+    rows = entries_head.slice(after, limit + 1)
+    if rows is None:
+        rows = await fetch_entries(db, limit + 1, after)
+
+    items, next_cursor = page_of(rows, limit, "created_at", "id")
+    set_next_cursor(response, next_cursor)
+    return [public_entry(r, viewer) for r in items]
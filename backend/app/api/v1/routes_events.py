@@ -1,34 +1,232 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...api.deps import get_db, require_user_id
 from ...schemas.events import EventCreate
+from ...services.calendar import invalidate_user_feed
+from ...services.tags import clean_tags, record_tags, tag_index
 from ...utils.dbhelpers import row_to_dict
+from ...utils.pagination import decode_cursor, page_of, parse_ts, set_next_cursor
 
 router = APIRouter()
 
 @router.post("", response_model=dict)
 async def create_event(payload: EventCreate, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
+    tags = clean_tags(payload.tags)
     r = await db.execute(text("""
         insert into public.events (host_id, title, description, type, starts_at, ends_at, location, capacity, tags, visibility)
         values (:uid, :title, :description, :type, :starts_at, :ends_at, :location, :capacity, :tags, :visibility)
         returning id
-    """), {"uid": user_id, **payload.model_dump()})
+    """), {"uid": user_id, **payload.model_dump(), "tags": tags})
     eid = r.scalar()
+    await record_tags(db, "event", tags)
     await db.commit()
+    tag_index.apply("event", tags)
     return {"id": str(eid)}
 
 @router.get("", response_model=list[dict])
-async def list_events(db: AsyncSession = Depends(get_db)):
-    res = await db.execute(text("select id, host_id, title, type, starts_at, ends_at, location, tags, created_at from public.events order by starts_at asc limit 50"))
-    return [row_to_dict(r) for r in res.fetchall()]
+async def list_events(
+    response: Response,
+    from_: Optional[datetime] = Query(None, alias="from", description="starts_at >= from (default: now)"),
+    to: Optional[datetime] = Query(None, description="starts_at < to"),
+    tags: Optional[str] = Query(None, description="comma-separated; events carrying all of them"),
+    type: Optional[str] = Query(None, pattern="^(course|webinar|workshop)$"),
+    location: Optional[str] = Query(None, description="case-insensitive prefix, e.g. TR or TR-Istanbul"),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Public events by start time, soonest first; upcoming only unless `from` is given.
+    Next page cursor in the X-Next-Cursor header.
+    """
+    conds = ["e.visibility = 'public'", "e.starts_at >= coalesce(cast(:from_ as timestamptz), now())"]
+    args: dict = {"from_": from_, "lim": limit + 1}
+    if to:
+        conds.append("e.starts_at < :to")
+        args["to"] = to
+    tag_list = clean_tags((tags or "").split(","))
+    if tag_list:
+        conds.append("e.tags @> cast(:tags as text[])")
+        args["tags"] = tag_list
+    if type:
+        conds.append("e.type = cast(:type as content_type)")
+        args["type"] = type
+    if location:
+        conds.append("lower(e.location) like :loc")
+        args["loc"] = location.strip().lower().replace("%", r"\%").replace("_", r"\_") + "%"
+    c = decode_cursor(cursor, 2)
+    if c:
+        conds.append("(e.starts_at, e.id) > (:c_ts, cast(:c_id as uuid))")
+        args.update({"c_ts": parse_ts(c[0]), "c_id": c[1]})
+
+    res = await db.execute(
+        text(f"""
+          select e.id, e.host_id, e.title, e.type, e.starts_at, e.ends_at, e.location, e.tags, e.created_at,
+                 e.capacity, e.enrolled_count, e.waitlist_count,
+                 case when e.capacity is null then null else greatest(e.capacity - e.enrolled_count, 0) end as seats_left
+            from public.events e
+           where {" and ".join(conds)}
+        order by e.starts_at, e.id
+           limit :lim
+        """),
+        args,
+    )
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "starts_at", "id")
+    set_next_cursor(response, next_cursor)
+    return items
+
+
+# Enrollment: every statement takes the event row lock first (`ev ... for update`),
+# so the seat check, the enrollment row and the counters move together and
+# concurrent enrollments for one event queue up instead of overbooking it.
+
+_ENROLL_SQL = """
+    with ev as (
+      select e.id, (e.capacity is null or e.enrolled_count < e.capacity) as has_seat
+        from public.events e
+       where e.id = cast(:eid as uuid)
+         for update
+    ),
+    ins as (
+      insert into public.event_enrollments (event_id, user_id, status)
+      select ev.id, cast(:uid as uuid), case when ev.has_seat then 'going' else 'waitlisted' end
+        from ev
+      on conflict (event_id, user_id) do nothing
+      returning status
+    ),
+    upd as (
+      update public.events e
+         set enrolled_count = e.enrolled_count + (select count(*) from ins where status = 'going'),
+             waitlist_count = e.waitlist_count + (select count(*) from ins where status = 'waitlisted'),
+             updated_at = now()
+       where e.id = cast(:eid as uuid)
+         and exists (select 1 from ins)
+      returning e.capacity, e.enrolled_count, e.waitlist_count
+    )
+    select exists (select 1 from ev) as found,
+           (select status from ins) as status,
+           upd.capacity, upd.enrolled_count, upd.waitlist_count
+      from (select 1) one
+      left join upd on true
+"""
+
+# Un-enrolling reads the waitlist, so the lock is taken in a statement of its
+# own first: the next statement's snapshot then includes everything committed
+# while we waited (a plain CTE would pick from the pre-wait snapshot and two
+# concurrent un-enrolls could promote the same user).
+_LOCK_EVENT_SQL = "select id from public.events where id = cast(:eid as uuid) for update"
+
+_UNENROLL_SQL = """
+    with ev as (
+      select e.id, e.capacity, e.enrolled_count
+        from public.events e
+       where e.id = cast(:eid as uuid)
+         for update
+    ),
+    del as (
+      delete from public.event_enrollments x
+       using ev
+       where x.event_id = ev.id
+         and x.user_id = cast(:uid as uuid)
+      returning x.status
+    ),
+    nxt as (
+      select x.user_id
+        from public.event_enrollments x, ev
+       where x.event_id = ev.id
+         and x.status = 'waitlisted'
+         and exists (select 1 from del where coalesce(del.status, 'going') = 'going')
+         and (ev.capacity is null or ev.enrolled_count - 1 < ev.capacity)
+    order by x.created_at, x.user_id
+       limit 1
+    ),
+    prom as (
+      update public.event_enrollments x
+         set status = 'going'
+        from nxt
+       where x.event_id = cast(:eid as uuid)
+         and x.user_id = nxt.user_id
+         and x.status = 'waitlisted'
+      returning x.user_id
+    ),
+    note as (
+      insert into public.notifications (user_id, type, payload)
+      select prom.user_id, 'event_promoted', jsonb_build_object('event_id', cast(:eid as uuid))
+        from prom
+    ),
+    upd as (
+      update public.events e
+         set enrolled_count = greatest(e.enrolled_count
+               - (select count(*) from del where coalesce(status, 'going') = 'going')
+               + (select count(*) from prom), 0),
+             waitlist_count = greatest(e.waitlist_count
+               - (select count(*) from del where status = 'waitlisted')
+               - (select count(*) from prom), 0),
+             updated_at = now()
+       where e.id = cast(:eid as uuid)
+         and exists (select 1 from del)
+      returning e.capacity, e.enrolled_count, e.waitlist_count
+    )
+    select exists (select 1 from ev) as found,
+           exists (select 1 from del) as removed,
+           (select user_id from prom) as promoted_user_id,
+           upd.capacity, upd.enrolled_count, upd.waitlist_count
+      from (select 1) one
+      left join upd on true
+"""
+
+
+async def _counts(db: AsyncSession, event_id: str) -> dict:
+    res = await db.execute(
+        text("select capacity, enrolled_count, waitlist_count from public.events where id = cast(:eid as uuid)"),
+        {"eid": event_id},
+    )
+    return row_to_dict(res.first())
+
 
 @router.post("/{event_id}/enroll", response_model=dict)
 async def enroll_event(event_id: str, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
-    await db.execute(text("""
-        insert into public.event_enrollments (event_id, user_id, status)
-        values (:eid, :uid, 'going')
-        on conflict do nothing
-    """), {"eid": event_id, "uid": user_id})
+    """
+    Takes a seat if one is left, otherwise joins the waitlist (status "waitlisted").
+    Enrolling twice is a no-op that reports the current status.
+    """
+    r = (await db.execute(text(_ENROLL_SQL), {"eid": event_id, "uid": user_id})).first()
+    if not r.found:
+        await db.rollback()
+        raise HTTPException(404, "Event not found")
+    await db.commit()
+    invalidate_user_feed(user_id)
+    status = r.status
+    counts = {"capacity": r.capacity, "enrolled_count": r.enrolled_count, "waitlist_count": r.waitlist_count}
+    if status is None:  # already enrolled
+        cur = await db.execute(
+            text("select status from public.event_enrollments where event_id = cast(:eid as uuid) and user_id = cast(:uid as uuid)"),
+            {"eid": event_id, "uid": user_id},
+        )
+        status = cur.scalar() or "going"
+        counts = await _counts(db, event_id)
+    return {"enrolled": status == "going", "status": status, **counts}
+
+
+@router.delete("/{event_id}/enroll", response_model=dict)
+async def unenroll_event(event_id: str, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
+    """Leaves the event or its waitlist; a freed seat goes to the oldest waitlisted user."""
+    locked = (await db.execute(text(_LOCK_EVENT_SQL), {"eid": event_id})).first()
+    if not locked:
+        await db.rollback()
+        raise HTTPException(404, "Event not found")
+    r = (await db.execute(text(_UNENROLL_SQL), {"eid": event_id, "uid": user_id})).first()
+    if not r.removed:
+        await db.rollback()
+        raise HTTPException(404, "Not enrolled")
     await db.commit()
-    return {"enrolled": True}
+    invalidate_user_feed(user_id, r.promoted_user_id)
+    return {
+        "ok": True,
+        "promoted_user_id": str(r.promoted_user_id) if r.promoted_user_id else None,
+        "capacity": r.capacity, "enrolled_count": r.enrolled_count, "waitlist_count": r.waitlist_count,
+    }
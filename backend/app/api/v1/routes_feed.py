@@ -0,0 +1,113 @@
+# app/api/v1/routes_feed.py
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...api.deps import get_db
+from ...services.trending import heat
+from ...utils.dbhelpers import row_to_dict
+from ...utils.pagination import decode_cursor, page_of, set_next_cursor
+
+router = APIRouter()
+
+# minimal cards per kind, one batch query each; rows that are no longer public
+# simply drop out of the page (requester stays hidden on rfh cards)
+_CARDS = {
+    "rfh": """
+        select r.id, r.title, r.tags, r.status::text as status, r.region, r.created_at
+          from public.rfh r
+         where r.id = any(cast(:ids as uuid[]))
+    """,
+    "question": """
+        select q.id, q.title, q.tags, q.answer_count, q.accepted_answer_id, q.created_at
+          from public.questions q
+         where q.id = any(cast(:ids as uuid[]))
+           and q.visibility = 'public'
+    """,
+    "content": """
+        select c.id, c.type::text as type, c.title, c.summary, c.created_at
+          from public.content c
+         where c.id = any(cast(:ids as uuid[]))
+           and c.is_published = true
+           and c.visibility = 'public'
+    """,
+    "offer": """
+        select o.id, o.title, o.type, o.tags, o.fee_type, o.avg_stars, o.ratings_count, o.created_at
+          from public.offers o
+         where o.id = any(cast(:ids as uuid[]))
+    """,
+}
+
+
+@router.get("/trending", response_model=list[dict])
+async def trending(
+    response: Response,
+    entity: Optional[Literal["rfh", "question", "content", "offer"]] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Hottest first, mixed kinds unless `entity` is given. Served from
+    trending_scores (see services/trending.py); next page cursor in X-Next-Cursor.
+    Each item: {"entity", "id", "heat", "last_event_at", ...card}
+    """
+    conds: list[str] = []
+    args: dict = {"lim": limit + 1}
+    if entity:
+        conds.append("s.entity = :entity")
+        args["entity"] = entity
+    c = decode_cursor(cursor, 3)
+    if c:
+        try:
+            args["c_score"] = float(c[0])
+        except (TypeError, ValueError):
+            raise HTTPException(422, "invalid cursor")
+        # score desc, then (entity, entity_id) asc as the tie-break
+        conds.append("""(s.score < :c_score or (s.score = :c_score
+                          and (s.entity, s.entity_id) > (:c_entity, cast(:c_id as uuid))))""")
+        args.update({"c_entity": c[1], "c_id": c[2]})
+    where = f"where {' and '.join(conds)}" if conds else ""
+
+    res = await db.execute(
+        text(f"""
+          select s.entity, s.entity_id, s.score, s.last_event_at
+            from public.trending_scores s
+            {where}
+        order by s.score desc, s.entity, s.entity_id
+           limit :lim
+        """),
+        args,
+    )
+    ranked = [row_to_dict(r) for r in res.fetchall()]
+    page, next_cursor = page_of(ranked, limit, "score", "entity", "entity_id")
+    set_next_cursor(response, next_cursor)
+
+    by_kind: dict[str, list[str]] = {}
+    for r in page:
+        by_kind.setdefault(r["entity"], []).append(str(r["entity_id"]))
+    cards: dict[tuple[str, str], dict] = {}
+    for kind, ids in by_kind.items():
+        rows = await db.execute(text(_CARDS[kind]), {"ids": ids})
+        for row in rows.fetchall():
+            d = row_to_dict(row)
+            cards[(kind, str(d["id"]))] = d
+
+    now = datetime.now(timezone.utc)
+    out = []
+    for r in page:
+        card = cards.get((r["entity"], str(r["entity_id"])))
+        if card is None:
+            continue
+        out.append({
+            "entity": r["entity"],
+            **card,
+            "heat": round(heat(r["score"], now), 4),
+            "last_event_at": r["last_event_at"],
+        })
+    return out
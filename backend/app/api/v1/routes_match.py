@@ -1,49 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from ..deps import get_db                     # fixed relative import (from v1 -> api)
-from ...utils.dbhelpers import row_to_dict    # stays the same (api.v1 -> app.utils)
+from ...services.ranking import RankWeights, helper_ranker
 
 router = APIRouter(prefix="/match", tags=["match"])
 
 @router.get("/{rfh_id}", response_model=list[dict])
-async def match_helpers(rfh_id: str, db: AsyncSession = Depends(get_db)):
+async def match_helpers(
+    rfh_id: str,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
     rfh = await db.execute(
-        text("select tags, language, region from public.rfh_public where id=:id"),
+        text("select requester_id, tags, language, region from public.rfh_public where id=:id"),
         {"id": rfh_id},
     )
     r = rfh.first()
     if not r:
         raise HTTPException(status_code=404, detail="RFH not found")
+    R = r._mapping
 
-    tags = (r._mapping["tags"] or [])
-    if not tags:
-        res = await db.execute(
-            text(
-                "select id as helper_id, reputation::float as score "
-                "from public.profiles "
-                "order by reputation desc limit 10"
-            )
-        )
-        return [row_to_dict(x) for x in res.fetchall()]
-
-    # NOTE: asyncpg handles Python list -> Postgres text[] for :tags.
-    res = await db.execute(
-        text(
-            """
-            select id as helper_id,
-                   (
-                     select count(*)
-                     from unnest(offers) t(tag)
-                     where t.tag = any(:tags)
-                   )::float
-                   + reputation / 100.0 as score
-            from public.profiles
-            where array_length(offers, 1) is not null
-            order by score desc
-            limit 10
-            """
-        ),
-        {"tags": tags},
+    # Scored in-process against the cached helper matrix (see services/ranking.py).
+    matrix = await helper_ranker.ensure_loaded(db)
+    ranked = matrix.score(
+        tags=R["tags"] or [],
+        language=R["language"],
+        region=R["region"],
+        weights=RankWeights.from_settings(),
+        limit=limit,
+        exclude=[R["requester_id"]] if R["requester_id"] else (),
     )
-    return [row_to_dict(x) for x in res.fetchall()]
+    return [{"helper_id": hid, "score": score} for hid, score in ranked]
@@ -0,0 +1,82 @@
+# app/api/v1/routes_moderation.py
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...api.deps import get_db, require_moderator
+from ...schemas.common import BatchIds
+from ...schemas.reports import ModerationClaim, ModerationResolve
+from ...services import moderation
+from ...utils.pagination import decode_cursor, page_of, parse_ts, set_next_cursor
+
+router = APIRouter(prefix="/moderation", tags=["moderation"])
+
+
+@router.get("/queue", response_model=list[dict])
+async def queue(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(require_moderator),
+):
+    """Open items, highest priority first (read-only; use /claim to take work)."""
+    c = decode_cursor(cursor, 3)
+    after = None
+    if c:
+        try:
+            after = (float(c[0]), parse_ts(c[1]), str(c[2]))
+        except (TypeError, ValueError):
+            raise HTTPException(422, "invalid cursor")
+    rows = await moderation.peek(db, limit + 1, after)
+    items, next_cursor = page_of(rows, limit, "priority", "first_reported_at", "id")
+    set_next_cursor(response, next_cursor)
+    return items
+
+
+@router.post("/claim", response_model=list[dict])
+async def claim(
+    payload: ModerationClaim,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(require_moderator),
+):
+    """
+    Lease up to `n` top items (with their latest reports). Moderators never get
+    the same item; an unresolved claim returns to the queue when the lease ends.
+    """
+    items = await moderation.claim(db, user_id, payload.n)
+    await db.commit()
+    return items
+
+
+@router.post("/resolve", response_model=dict)
+async def resolve(
+    payload: ModerationResolve,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(require_moderator),
+):
+    """
+    Body: {"ids": [...], "resolution": "dismissed" | "actioned", "note"?: "..."}
+    Resolves the caller's claimed items and their reports in one transaction;
+    ids not claimed by the caller are returned under "skipped".
+    """
+    ids = payload.keys()
+    done = await moderation.resolve(db, user_id, ids, payload.resolution, payload.note)
+    await db.commit()
+    resolved = set(done)
+    return {"resolved": done, "skipped": [i for i in ids if i not in resolved]}
+
+
+@router.post("/release", response_model=dict)
+async def release(
+    payload: BatchIds,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(require_moderator),
+):
+    """Body: {"ids": [...]} - give claimed items back to the queue."""
+    done = await moderation.release(db, user_id, payload.keys())
+    await db.commit()
+    return {"released": done}
@@ -2,15 +2,36 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...api.deps import get_db, require_user_id
+from ...schemas.common import BatchIds
 from ...schemas.profiles import Profile, ProfileUpdate
+from ...services.profiles import invalidate_profile, resolve_profile_id
+from ...services.ranking import helper_ranker
 from ...utils.dbhelpers import row_to_dict
+from ...utils.projections import Projection
 from datetime import date
+from typing import Optional
 
 router = APIRouter()
 
+PROFILE_FIELDS = Projection(
+    columns={c: f"p.{c}" for c in (
+        "id", "username", "display_name", "full_name", "avatar_url", "bio", "languages",
+        "timezone", "country", "region", "roles", "reputation", "offers", "needs", "anon_allowed",
+    )},
+    presets={
+        "card": ["username", "display_name", "avatar_url", "region", "languages", "reputation"],
+    },
+    default="card",
+)
+
 @router.get("/me", response_model=Profile | dict)
-async def get_me(db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
-    q = await db.execute(text("select * from public.profiles where id=:uid"), {"uid": user_id})
+async def get_me(
+    fields: Optional[str] = Query(None, description="card | comma-separated field names (default: all)"),
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(require_user_id),
+):
+    cols = PROFILE_FIELDS.select(fields)[0] if fields else "p.*"
+    q = await db.execute(text(f"select {cols} from public.profiles p where p.id=:uid"), {"uid": user_id})
     row = q.first()
     if not row:
         raise HTTPException(404, "Profile not found")
@@ -26,111 +47,94 @@ async def update_me(payload: ProfileUpdate, db: AsyncSession = Depends(get_db),
     sql = text(f"update public.profiles set {sets}, updated_at=now() where id=:uid")
     await db.execute(sql, fields)
     await db.commit()
+    invalidate_profile(user_id)
+    await helper_ranker.refresh_helper(db, user_id)
     return {"updated": True}
 
-@router.get("/{id_or_username}", response_model=dict)
-async def get_public_profile(
-    id_or_username: str,
+@router.post("/batch", response_model=dict)
+async def profiles_batch(
+    payload: BatchIds,
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(require_user_id),
 ):
-    # resolve by id first, then username
-    q = await db.execute(text("""
-      with prof as (
-        select p.*
-          from public.profiles p
-         where p.id::text = :key
-            or p.username = :key
-         limit 1
-      ),
-      stats as (
-        select
-          (select count(*)::int from public.engagements e
-            where e.practitioner_id = (select id from prof) and e.state='completed') as completed_engagements,
-          (select coalesce(avg(r.stars)::float,0.0) from public.ratings r
-            where r.entity::text='offer'
-              and r.entity_id in (select id from public.offers where owner_id=(select id from prof))) as avg_stars,
-          (select coalesce(count(*)::int,0) from public.ratings r
-            where r.entity::text='offer'
-              and r.entity_id in (select id from public.offers where owner_id=(select id from prof))) as ratings_count
-      )
-      select json_build_object(
-        'profile', (select row_to_json(prof.*) from prof),
-        'stats',   (select row_to_json(stats.*) from stats),
-        'offers',  (select coalesce(json_agg(row_to_json(o.*)), '[]'::json)
-                    from public.offer_public o where o.owner_id = (select id from prof))
-      )
-    """), {"key": id_or_username})
-    row = q.first()
-    if not row or not row[0]:
-        raise HTTPException(404, "Profile not found")
-    return row[0]
-
-
+    """
+    Body: {"ids": [uuid, ...<=300]}
+    Returns {profile_id: public card + stats} for the ids that exist, in one query.
+    """
+    res = await db.execute(text("""
+      select p.id, p.username, p.display_name, p.full_name, p.avatar_url, p.bio,
+             p.languages, p.region, p.country, p.reputation, p.specialties, p.offers,
+             coalesce(st.completed_engagements, 0) as completed_engagements,
+             coalesce(st.avg_stars, 0.0) as avg_stars,
+             coalesce(st.ratings_count, 0) as ratings_count
+        from public.profiles p
+        left join public.practitioner_stats st on st.practitioner_id = p.id
+       where p.id = any(cast(:ids as uuid[]))
+    """), {"ids": payload.keys()})
+    return {str(r._mapping["id"]): row_to_dict(r) for r in res.fetchall()}
 
 @router.get("/{id_or_username}", response_model=dict)
 async def get_public_profile(
     id_or_username: str,
     include_next_slots: bool = Query(False),
     limit_slots: int = Query(3, ge=0, le=12),
+    fields: Optional[str] = Query(None, description="profile fields: card | comma-separated (default: all)"),
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(require_user_id),
 ):
-    q = await db.execute(text(f"""
-      with prof as (
-        select p.*
-          from public.profiles p
-         where p.id::text = :key
-            or p.username = :key
-         limit 1
-      ),
-      stats as (
-        select
-          (select count(*)::int from public.engagements e
-            where e.practitioner_id = (select id from prof) and e.state='completed') as completed_engagements,
-          (select coalesce(avg(r.stars)::float,0.0) from public.ratings r
-            where r.entity::text='offer'
-              and r.entity_id in (select id from public.offers where owner_id=(select id from prof))) as avg_stars,
-          (select coalesce(count(*)::int,0) from public.ratings r
-            where r.entity::text='offer'
-              and r.entity_id in (select id from public.offers where owner_id=(select id from prof))) as ratings_count
-      ),
-      offers as (
-        select o.*
+    profile_cols = PROFILE_FIELDS.select(fields)[0] if fields else "p.*"
+
+    # uuid -> PK lookup, anything else -> username index
+    pid = await resolve_profile_id(db, id_or_username)
+    if not pid:
+        raise HTTPException(404, "Profile not found")
+
+    # stats come from practitioner_stats (maintained on completion / review insert)
+    offers_sql = """
+        select coalesce(json_agg(row_to_json(o.*)), '[]'::json)
         from public.offer_public o
-        where o.owner_id = (select id from prof)
-      ),
-      offers_with_next as (
-        select
-          o.*,
-          (
-            select coalesce(json_agg(json_build_object('start_at', s.start_at, 'end_at', s.end_at)
-                                     order by s.start_at)
-                            , '[]'::json)
-            from (
-              select start_at, end_at
-              from public.offer_slots s
-              where s.offer_id = o.id
-                and s.status='open'
-                and s.reserved < s.capacity
-                and s.start_at >= now()
-              order by s.start_at
-              limit :limit_slots
-            ) s
-          ) as next_slots
-        from offers o
-      )
+        where o.owner_id = cast(:pid as uuid)
+    """
+    if include_next_slots:
+        offers_sql = """
+        select coalesce(json_agg(row_to_json(ow.*)), '[]'::json)
+        from (
+          select
+            o.*,
+            (
+              select coalesce(json_agg(json_build_object('start_at', s.start_at, 'end_at', s.end_at)
+                                       order by s.start_at)
+                              , '[]'::json)
+              from (
+                select start_at, end_at
+                from public.offer_slots s
+                where s.offer_id = o.id
+                  and s.status='open'
+                  and s.reserved < s.capacity
+                  and s.start_at >= now()
+                order by s.start_at
+                limit :limit_slots
+              ) s
+            ) as next_slots
+          from public.offer_public o
+          where o.owner_id = cast(:pid as uuid)
+        ) ow
+        """
+
+    q = await db.execute(text(f"""
       select json_build_object(
-        'profile', (select row_to_json(prof.*) from prof),
-        'stats',   (select row_to_json(stats.*) from stats),
-        'offers',  (select coalesce(
-                      case when :inc then json_agg(row_to_json(ow.*))
-                           else json_agg(row_to_json(o.*))
-                      end, '[]'::json)
-                    from (select * from offers_with_next) ow
-                    full join (select * from offers) o on false)
+        'profile', (select row_to_json(pp) from (
+                      select {profile_cols} from public.profiles p where p.id = cast(:pid as uuid)
+                    ) pp),
+        'stats',   (select json_build_object(
+                      'completed_engagements', coalesce(st.completed_engagements, 0),
+                      'avg_stars',             coalesce(st.avg_stars, 0.0),
+                      'ratings_count',         coalesce(st.ratings_count, 0))
+                    from (select 1) one
+                    left join public.practitioner_stats st on st.practitioner_id = cast(:pid as uuid)),
+        'offers',  ({offers_sql})
       )
-    """), {"key": id_or_username, "inc": include_next_slots, "limit_slots": limit_slots})
+    """), {"pid": pid, "limit_slots": limit_slots})
     row = q.first()
     if not row or not row[0]:
       raise HTTPException(404, "Profile not found")
@@ -146,12 +150,10 @@ async def profile_availability_by_day(
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(require_user_id),
 ):
+    pid = await resolve_profile_id(db, id_or_username)
+    if not pid:
+        return []
     sql = text("""
-      with prof as (
-        select id from public.profiles
-         where id::text = :key or username = :key
-         limit 1
-      )
       select
         (date_trunc('day', s.start_at))::date as day,
         json_agg(
@@ -166,7 +168,7 @@ async def profile_availability_by_day(
         ) as slots
       from public.offer_slots s
       join public.offers o on o.id = s.offer_id
-      where o.owner_id = (select id from prof)
+      where o.owner_id = cast(:pid as uuid)
         and s.status='open'
         and s.reserved < s.capacity
         and s.start_at >= cast(:from as date)
@@ -174,5 +176,5 @@ async def profile_availability_by_day(
       group by 1
       order by 1
     """)
-    rows = (await db.execute(sql, {"key": id_or_username, "from": from_.isoformat(), "to": to_.isoformat()})).mappings().all()
+    rows = (await db.execute(sql, {"pid": pid, "from": from_.isoformat(), "to": to_.isoformat()})).mappings().all()
     return [{"day": r["day"].isoformat(), "slots": r["slots"] or []} for r in rows]
\ No newline at end of file
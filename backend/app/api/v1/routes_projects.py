@@ -1,28 +1,154 @@
-from fastapi import APIRouter, Depends
+from typing import Iterable, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...api.deps import get_db, require_user_id
 from ...schemas.projects import ProjectCreate, ProjectApply
+from ...services.profiles import attach_profiles
+from ...services.tags import clean_tags, record_tags, tag_index
 from ...utils.dbhelpers import row_to_dict
+from ...utils.pagination import decode_cursor, page_of, parse_ts, set_next_cursor
 
 router = APIRouter()
 
+_CARD = "p.id, p.owner_id, p.title, p.description, p.needed_roles, p.region, p.tags, p.created_at"
+
+# "projects for me": share of the project's roles the caller covers, plus a
+# small bonus for the same region
+REGION_BONUS = 0.25
+
+
+def role_keys(roles: Optional[Iterable[str]]) -> list[str]:
+    """Match keys for needed_roles / specialties (see migrations/014)."""
+    return sorted({r.strip().lower() for r in (roles or []) if r and r.strip()})
+
+
+def _csv(value: Optional[str]) -> list[str]:
+    return [v for v in (value or "").split(",") if v.strip()]
+
 @router.post("", response_model=dict)
 async def create_project(payload: ProjectCreate, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
+    tags = clean_tags(payload.tags)
     r = await db.execute(text("""
-        insert into public.projects (owner_id, title, description, needed_roles, region, tags, visibility)
-        values (:uid, :title, :description, :needed_roles, :region, :tags, :visibility)
+        insert into public.projects (owner_id, title, description, needed_roles, role_keys, region, tags, visibility)
+        values (:uid, :title, :description, :needed_roles, :role_keys, :region, :tags, :visibility)
         returning id
-    """), {"uid": user_id, "title": payload.title, "description": payload.description, "needed_roles": payload.needed_roles, "region": payload.region, "tags": payload.tags, "visibility": payload.visibility})
+    """), {"uid": user_id, "title": payload.title, "description": payload.description, "needed_roles": payload.needed_roles, "role_keys": role_keys(payload.needed_roles), "region": payload.region, "tags": tags, "visibility": payload.visibility})
     pid = r.scalar()
     await db.execute(text("insert into public.project_members (project_id, user_id, role) values (:pid, :uid, 'owner') on conflict do nothing"), {"pid": pid, "uid": user_id})
+    await record_tags(db, "project", tags)
     await db.commit()
+    tag_index.apply("project", tags)
     return {"id": str(pid)}
 
 @router.get("", response_model=list[dict])
-async def list_projects(db: AsyncSession = Depends(get_db)):
-    res = await db.execute(text("select id, owner_id, title, description, needed_roles, tags, created_at from public.projects order by created_at desc limit 50"))
-    return [row_to_dict(r) for r in res.fetchall()]
+async def list_projects(
+    response: Response,
+    roles: Optional[str] = Query(None, description="comma-separated; projects needing any of them"),
+    tags: Optional[str] = Query(None, description="comma-separated; projects carrying all of them"),
+    region: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Public projects, newest first; next page cursor in the X-Next-Cursor header."""
+    conds = ["p.visibility = 'public'"]
+    args: dict = {"lim": limit + 1}
+    if (keys := role_keys(_csv(roles))):
+        conds.append("p.role_keys && cast(:roles as text[])")
+        args["roles"] = keys
+    if (tag_list := clean_tags(_csv(tags))):
+        conds.append("p.tags @> cast(:tags as text[])")
+        args["tags"] = tag_list
+    if region:
+        conds.append("p.region = :region")
+        args["region"] = region
+    c = decode_cursor(cursor, 2)
+    if c:
+        conds.append("(p.created_at, p.id) < (:c_ts, cast(:c_id as uuid))")
+        args.update({"c_ts": parse_ts(c[0]), "c_id": c[1]})
+    res = await db.execute(
+        text(f"""
+          select {_CARD}
+            from public.projects p
+           where {" and ".join(conds)}
+        order by p.created_at desc, p.id desc
+           limit :lim
+        """),
+        args,
+    )
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "created_at", "id")
+    set_next_cursor(response, next_cursor)
+    return items
+
+@router.get("/for-me", response_model=list[dict])
+async def projects_for_me(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(require_user_id),
+):
+    """
+    Public projects whose needed roles overlap my profile's specialties / offers,
+    best match first: score = matched roles / needed roles (+0.25 same region).
+    Skips my own projects and ones I already belong to; `applied` marks ones I applied to.
+    """
+    args: dict = {"uid": user_id, "lim": limit + 1, "bonus": REGION_BONUS}
+    after = ""
+    c = decode_cursor(cursor, 3)
+    if c:
+        try:
+            args["c_score"] = float(c[0])
+        except (TypeError, ValueError):
+            raise HTTPException(422, "invalid cursor")
+        after = "where (m.score, m.created_at, m.id) < (:c_score, :c_ts, cast(:c_id as uuid))"
+        args.update({"c_ts": parse_ts(c[1]), "c_id": c[2]})
+    res = await db.execute(
+        text(f"""
+          with me as (
+            select array(
+                     select distinct lower(btrim(x))
+                       from unnest(coalesce(pr.specialties, '{{}}') || coalesce(pr.offers, '{{}}')) x
+                      where btrim(x) <> ''
+                   ) as roles,
+                   pr.region
+              from public.profiles pr
+             where pr.id = cast(:uid as uuid)
+          ),
+          m as (
+            select {_CARD},
+                   array(select unnest(p.role_keys) intersect select unnest(me.roles)) as matched_roles,
+                   (
+                     cardinality(array(select unnest(p.role_keys) intersect select unnest(me.roles)))::float8
+                       / greatest(cardinality(p.role_keys), 1)
+                     + case when p.region is not null and p.region = me.region then :bonus else 0 end
+                   ) as score
+              from public.projects p, me
+             where p.visibility = 'public'
+               and p.role_keys && me.roles
+               and p.owner_id <> cast(:uid as uuid)
+               and not exists (
+                 select 1 from public.project_members pm
+                  where pm.project_id = p.id and pm.user_id = cast(:uid as uuid)
+               )
+          )
+          select m.*,
+                 exists (
+                   select 1 from public.project_applications a
+                    where a.applicant_id = cast(:uid as uuid) and a.project_id = m.id
+                 ) as applied
+            from m
+            {after}
+        order by m.score desc, m.created_at desc, m.id desc
+           limit :lim
+        """),
+        args,
+    )
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "score", "created_at", "id")
+    set_next_cursor(response, next_cursor)
+    return items
 
 @router.post("/{project_id}/apply", response_model=dict)
 async def apply_project(project_id: str, payload: ProjectApply, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
@@ -33,3 +159,49 @@ async def apply_project(project_id: str, payload: ProjectApply, db: AsyncSession
     aid = r.scalar()
     await db.commit()
     return {"application_id": str(aid)}
+
+@router.get("/{project_id}/applications", response_model=list[dict])
+async def list_applications(
+    project_id: str,
+    response: Response,
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(require_user_id),
+):
+    """Owner's inbox for one project, newest first; next page cursor in X-Next-Cursor."""
+    own = await db.execute(
+        text("select owner_id from public.projects where id = cast(:pid as uuid)"), {"pid": project_id}
+    )
+    owner = own.scalar()
+    if owner is None:
+        raise HTTPException(404, "Project not found")
+    if str(owner) != str(user_id):
+        raise HTTPException(403, "Only the owner can see applications")
+
+    conds = ["a.project_id = cast(:pid as uuid)"]
+    args: dict = {"pid": project_id, "lim": limit + 1}
+    if status:
+        conds.append("a.status = :status")
+        args["status"] = status
+    c = decode_cursor(cursor, 2)
+    if c:
+        conds.append("(a.created_at, a.id) < (:c_ts, cast(:c_id as uuid))")
+        args.update({"c_ts": parse_ts(c[0]), "c_id": c[1]})
+    res = await db.execute(
+        text(f"""
+          select a.id, a.project_id, a.applicant_id, a.message, a.status, a.created_at
+            from public.project_applications a
+           where {" and ".join(conds)}
+        order by a.created_at desc, a.id desc
+           limit :lim
+        """),
+        args,
+    )
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "created_at", "id")
+    set_next_cursor(response, next_cursor)
+    return await attach_profiles(db, items, {"applicant_id": {
+        "username": "applicant_username", "display_name": "applicant_display_name",
+        "avatar_url": "applicant_avatar_url",
+    }})
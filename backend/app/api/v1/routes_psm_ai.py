@@ -1,41 +1,199 @@
 # app/api/v1/routes_psm_ai.py
-from fastapi import APIRouter, Depends
+from decimal import Decimal
+from typing import AsyncIterator, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from loguru import logger
 from sqlalchemy import text
+from starlette.types import Receive, Scope, Send
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...api.deps import get_db, require_user_id
+from ...services.inference import DISCLAIMER, SlotsBusy, answer_service, question_key
+from ...services.retrieval import retrieval_index
 
 router = APIRouter(prefix="/psm", tags=["psm-ai"])
 
-@router.post("/ai/answer", response_model=dict)
-async def ai_answer(payload: dict, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
-    """
-    Body: {"question":"...", "topic_tag":"legal|psychological|career|other"}
-    Returns: templated 'AI (beta)' text + 3 verified orgs (offers) as handoff.
-    """
-    q = (payload.get("question") or "").strip()
-    topic = (payload.get("topic_tag") or "other").lower()
 
-    # very simple curated response
-    answer = (
-        "AI (beta): This is general information, not professional advice. "
-        "For sensitive cases, please connect with verified organizations below."
-    )
-    # pick 3 top-rated offers by type
+async def _hydrate_offers(db: AsyncSession, ids: list[str]) -> list[dict]:
+    if not ids:
+        return []
     res = await db.execute(
         text("""
           select id, title, region, avg_stars, ratings_count
           from public.offer_public
-          where type = :t
-          order by avg_stars desc, ratings_count desc nulls last
-          limit 3
+          where id = any(cast(:ids as uuid[]))
         """),
-        {"t": topic},
+        {"ids": ids},
     )
-    orgs = [dict(r._mapping) for r in res.fetchall()]
+    by_id = {str(r._mapping["id"]): dict(r._mapping) for r in res.fetchall()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+async def _hydrate_sources(db: AsyncSession, hits: list[tuple[str, str, float]]) -> list[dict]:
+    content_ids = [i for k, i, _ in hits if k == "content"]
+    answer_ids = [i for k, i, _ in hits if k == "answer"]
+    found: dict[str, dict] = {}
+    if content_ids:
+        res = await db.execute(
+            text("select id, title from public.content where id = any(cast(:ids as uuid[]))"),
+            {"ids": content_ids},
+        )
+        for r in res.fetchall():
+            found[str(r.id)] = {"kind": "content", "id": str(r.id), "title": r.title}
+    if answer_ids:
+        res = await db.execute(
+            text("""
+              select a.id, a.question_id, q.title
+              from public.answers a
+              join public.questions q on q.id = a.question_id
+              where a.id = any(cast(:ids as uuid[]))
+            """),
+            {"ids": answer_ids},
+        )
+        for r in res.fetchall():
+            found[str(r.id)] = {
+                "kind": "answer", "id": str(r.id),
+                "question_id": str(r.question_id), "title": r.title,
+            }
+    return [found[i] for _, i, _ in hits if i in found]
+
+
+def _parse(payload: dict) -> tuple[str, str, Optional[str]]:
+    q = (payload.get("question") or "").strip()
+    topic = (payload.get("topic_tag") or "other").lower()
+    lang = (payload.get("lang") or "").lower() or None
+    return q, topic, lang
+
+
+async def _ground(db: AsyncSession, q: str, topic: str, lang: Optional[str]) -> tuple[list[dict], list[dict]]:
+    """Retrieval step shared by both endpoints -> (verified_orgs, sources)."""
+    offer_hits = retrieval_index.search(q, lang=lang, kinds=("offer",), where={"type": topic}, limit=3)
+    orgs = await _hydrate_offers(db, [i for _, i, _ in offer_hits])
+    if not orgs:
+        # nothing relevant in the index: fall back to top-rated offers by type
+        res = await db.execute(
+            text("""
+              select o.id, o.title, o.region, ob.avg_stars, ob.ratings_count
+              from public.offers ob
+              join public.offer_public o on o.id = ob.id
+              where ob.type = :t
+              order by ob.avg_stars desc, ob.ratings_count desc
+              limit 3
+            """),
+            {"t": topic},
+        )
+        orgs = [dict(r._mapping) for r in res.fetchall()]
+
+    source_hits = retrieval_index.search(q, lang=lang, kinds=("content", "answer"), limit=3)
+    sources = await _hydrate_sources(db, source_hits)
+    if not sources:
+        sources = [{"title": "General safety note", "url": "https://example.org/safety"}]
+    return orgs, sources
+
+
+@router.post("/ai/answer", response_model=dict)
+async def ai_answer(payload: dict, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
+    """
+    Body: {"question":"...", "topic_tag":"legal|psychological|career|other", "lang"?: "en|tr"}
+    Returns: 'AI (beta)' answer + 3 verified orgs (offers) as handoff,
+    ranked by BM25 relevance to the question (services/retrieval.py).
+    Answers come from the configured inference backend and are cached by
+    normalized question (services/inference.py).
+    """
+    q, topic, lang = _parse(payload)
+    orgs, sources = await _ground(db, q, topic, lang)
+    answer = DISCLAIMER
+    if q:
+        try:
+            answer = await answer_service.complete(question_key(q, topic, lang), q, sources)
+        except SlotsBusy:
+            raise HTTPException(503, "AI is busy, try again shortly", headers={"Retry-After": "5"})
+
     return {
         "answer": answer,
         "badge": "AI (beta)",
-        "sources": [{"title": "General safety note", "url": "https://example.org/safety"}],
+        "sources": sources,
+        "handoff_note": "These verified offers may help:",
+        "verified_orgs": orgs,
+    }
+
+
+def _json_default(o):
+    if isinstance(o, Decimal):
+        return float(o)
+    raise TypeError
+
+
+def _sse(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data, default=_json_default) + b"\n\n"
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """Releases the inference slot once the response is over, whether or not the body ran."""
+
+    def __init__(self, *args, holds_slot: bool, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.holds_slot = holds_slot
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.holds_slot:
+                self.holds_slot = False
+                answer_service.release()
+
+
+@router.post("/ai/answer/stream")
+async def ai_answer_stream(payload: dict, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
+    """
+    Same body as /ai/answer; responds with text/event-stream:
+      event: meta   data: {badge, sources, handoff_note, verified_orgs, cached}
+      event: token  data: "<text chunk>"        (repeated)
+      event: done   data: {}
+    Retrieval runs before the first byte; tokens follow as the backend produces them.
+    """
+    q, topic, lang = _parse(payload)
+    if not q:
+        raise HTTPException(422, "question required")
+    orgs, sources = await _ground(db, q, topic, lang)
+    key = question_key(q, topic, lang)
+    cached = answer_service.cache.get(key)
+
+    if cached is None:
+        try:
+            await answer_service.acquire()
+        except SlotsBusy:
+            raise HTTPException(503, "AI is busy, try again shortly", headers={"Retry-After": "5"})
+
+    meta = {
+        "badge": "AI (beta)",
+        "sources": sources,
         "handoff_note": "These verified offers may help:",
         "verified_orgs": orgs,
+        "cached": cached is not None,
     }
+
+    async def events() -> AsyncIterator[bytes]:
+        if cached is not None:
+            yield _sse("meta", meta)
+            yield _sse("token", cached)
+            yield _sse("done", {})
+            return
+        try:
+            yield _sse("meta", meta)
+            async for piece in answer_service.stream(key, q, sources):
+                yield _sse("token", piece)
+            yield _sse("done", {})
+        except Exception:
+            logger.exception("ai answer stream failed")
+            yield _sse("error", {"detail": "AI answer failed, try again shortly"})
+
+    return _SlotStreamingResponse(
+        events(),
+        holds_slot=cached is None,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,23 +1,33 @@
 # app/api/v1/routes_psm_engagements.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 import json
 from ...api.deps import get_db, require_user_id
+from ...services.calendar import invalidate_offer_feed, invalidate_user_feed
+from ...services.profiles import attach_profiles
+from ...services.ranking import helper_ranker
+from ...services.transitions import engagement_transition
 from ...utils.dbhelpers import row_to_dict
+from ...utils.pagination import decode_cursor, page_of, parse_ts, set_next_cursor
 
 router = APIRouter(prefix="/psm", tags=["psm"])
 
+# get_engagement inlines this many of the latest events as `audit` (the timeline)
+AUDIT_PREVIEW = 50
+
+def _event_dict(r: dict) -> dict:
+    """engagement_events row -> the old audit item shape ({at, actor, action, ...data})"""
+    return {"at": r["at"], "actor": r["actor_id"], "action": r["action"], **(r["data"] or {})}
+
 @router.get("/engagements/{eid}", response_model=dict)
 async def get_engagement(eid: str, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
     res = await db.execute(
         text("""
-          select e.*, rq.message as request_message,
-                 pra.username as practitioner_username, reqp.username as requester_username
+          select e.*, rq.message as request_message
           from public.engagements e
           join public.offer_requests rq on rq.id = e.request_id
-          left join public.profiles pra on pra.id = e.practitioner_id
-          left join public.profiles reqp on reqp.id = e.requester_id
           where e.id=:id
         """),
         {"id": eid},
@@ -29,74 +39,90 @@ async def get_engagement(eid: str, db: AsyncSession = Depends(get_db), user_id:
     # (optional) ensure party
     if str(E["practitioner_id"]) != str(user_id) and str(E["requester_id"]) != str(user_id):
         raise HTTPException(403, "not a party")
+    ev = await db.execute(
+        text("""
+          select at, actor_id, action, data from (
+            select id, at, actor_id, action, data
+              from public.engagement_events
+             where engagement_id = cast(:id as uuid)
+             order by at desc, id desc
+             limit :lim
+          ) t
+          order by at, id
+        """),
+        {"id": eid, "lim": AUDIT_PREVIEW},
+    )
+    E["audit"] = [_event_dict(r) for r in ev.mappings()]
+    await attach_profiles(db, [E], {
+        "practitioner_id": {"username": "practitioner_username"},
+        "requester_id": {"username": "requester_username"},
+    })
     return E
 
+@router.get("/engagements/{eid}/events", response_model=list[dict])
+async def engagement_events(
+    eid: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(require_user_id),
+):
+    """Full history, oldest first; next page cursor in the X-Next-Cursor header."""
+    party = await db.execute(
+        text("select practitioner_id, requester_id from public.engagements where id = cast(:id as uuid)"),
+        {"id": eid},
+    )
+    P = party.first()
+    if not P:
+        raise HTTPException(404, "Engagement not found")
+    if str(user_id) not in (str(P.practitioner_id), str(P.requester_id)):
+        raise HTTPException(403, "not a party")
+
+    args: dict = {"id": eid, "lim": limit + 1}
+    after = ""
+    c = decode_cursor(cursor, 2)
+    if c:
+        after = "and (at, id) > (:c_ts, cast(:c_id as bigint))"
+        args.update({"c_ts": parse_ts(c[0]), "c_id": c[1]})
+    res = await db.execute(
+        text(f"""
+          select id, at, actor_id, action, data
+            from public.engagement_events
+           where engagement_id = cast(:id as uuid) {after}
+           order by at, id
+           limit :lim
+        """),
+        args,
+    )
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "at", "id")
+    set_next_cursor(response, next_cursor)
+    return items
+
 @router.patch("/engagements/{eid}", response_model=dict)
 async def update_engagement(eid: str, payload: dict, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
     """
     schedule: {"action":"schedule","scheduled_at":"2025-01-15T18:00:00Z"}
     complete: {"action":"complete"}
     cancel:   {"action":"cancel","reason":"..."}
+    Any action may carry "version" (from the engagement row); 409 if it moved since.
     """
     action = (payload.get("action") or "").lower()
-    if action not in {"schedule","complete","cancel"}:
-        raise HTTPException(422, "invalid action")
-
-    res = await db.execute(text("select * from public.engagements where id=:id"), {"id": eid})
-    row = res.first()
-    if not row:
-        raise HTTPException(404, "not found")
-    E = row._mapping
-
-    # role checks
-    if action in {"schedule","complete"} and str(E["practitioner_id"]) != str(user_id):
-        raise HTTPException(403, "only practitioner can schedule/complete")
-    if action == "cancel" and (str(E["practitioner_id"]) != str(user_id) and str(E["requester_id"]) != str(user_id)):
-        raise HTTPException(403, "only parties can cancel")
-
-    if action == "schedule":
-        sch = payload.get("scheduled_at")
-        if not sch:
-            raise HTTPException(422, "scheduled_at required")
-        await db.execute(
-            text("""
-              update public.engagements
-              set state='scheduled',
-                  scheduled_at=:sch,
-                  audit = coalesce(audit,'[]'::jsonb) || jsonb_build_object('at', now(), 'actor', :actor, 'action','schedule','scheduled_at',:sch)
-              where id=:id
-            """),
-            {"id": eid, "sch": sch, "actor": user_id},
-        )
-    elif action == "complete":
-        await db.execute(
-            text("""
-              update public.engagements
-              set state='completed', completed_at=now(),
-                  audit = coalesce(audit,'[]'::jsonb) || jsonb_build_object('at', now(), 'actor', :actor, 'action','complete')
-              where id=:id
-            """),
-            {"id": eid, "actor": user_id},
-        )
-    elif action == "cancel":
-        reason = payload.get("reason") or ""
-        await db.execute(text("""
-             with upd as (
-               update public.engagements
-               set state='cancelled', cancellation_reason=:r,
-                   audit = coalesce(audit,'[]'::jsonb) || jsonb_build_object('at', now(), 'actor', :actor, 'action','cancel','reason',:r)
-               where id=:id
-               returning slot_id
-             )
-             update public.offer_slots s
-             set reserved = greatest(s.reserved - 1, 0),
-                 status = case when s.status='full' and s.reserved - 1 < s.capacity then 'open' else s.status end,
-                 updated_at = now()
-             from upd
-             where s.id = upd.slot_id and upd.slot_id is not null
-           """),
-            {"id": eid, "actor": user_id, "r": reason},
-        )
+    version = payload.get("version")
+    if version is not None and not isinstance(version, int):
+        raise HTTPException(422, "version must be an integer")
 
+    # one statement per transition (see services/transitions.py)
+    out = await engagement_transition(
+        db, eid, action, user_id,
+        version=version,
+        scheduled_at=payload.get("scheduled_at"),
+        reason=payload.get("reason"),
+    )
     await db.commit()
-    return {"ok": True}
+    invalidate_user_feed(out["practitioner_id"], out["requester_id"])
+    if action == "cancel":
+        invalidate_offer_feed(out["offer_id"])   # the slot seat was released
+    if action == "complete":
+        helper_ranker.matrix.bump_completed(str(out["practitioner_id"]))
+    return {"ok": True, "state": out["state"], "version": out["version"]}
@@ -1,15 +1,50 @@
 # app/api/v1/routes_psm_offers.py
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import json
 from datetime import date
 from ...api.deps import get_db, require_user_id
+from ...schemas.common import BatchIds
+from ...services.profiles import attach_profiles
+from ...services.ranking import helper_ranker
+from ...services.retrieval import retrieval_index
+from ...services.tags import clean_tags, record_tags, tag_index
+from ...middleware.etag import make_etag, not_modified
 from ...utils.dbhelpers import row_to_dict
+from ...utils.projections import Projection
 
 router = APIRouter(prefix="/psm", tags=["psm"])
 
+_OWNER = {"owner_username": "username", "owner_avatar_url": "avatar_url"}
+
+# rating columns come from the offers row (ob), maintained on review insert
+# (migrations/006), so rating sorts walk offers_rating_idx / offers_rating_score_idx
+OFFER_FIELDS = Projection(
+    columns={
+        **{c: f"o.{c}" for c in (
+            "id", "type", "title", "description", "tags", "fee_type", "languages", "region",
+            "availability", "views", "owner_id", "created_at",
+        )},
+        **{c: f"ob.{c}" for c in ("avg_stars", "ratings_count", "rating_score")},
+    },
+    presets={
+        "card": ["type", "title", "tags", "fee_type", "region", "avg_stars", "ratings_count",
+                 "owner_id", "created_at", "owner_username", "owner_avatar_url"],
+        "full": ["type", "title", "description", "tags", "fee_type", "languages", "region",
+                 "availability", "avg_stars", "ratings_count", "views", "owner_id", "created_at",
+                 "owner_username", "owner_avatar_url"],
+    },
+    default="full",
+    virtual={k: "owner_id" for k in _OWNER},
+)
+
+
+def _owner_spec(virtual: list[str]) -> dict:
+    fields = {_OWNER[v]: v for v in virtual}
+    return {"owner_id": fields} if fields else {}
+
 # ---- Create/Update offer (owner) - optional but handy for demo ----
 @router.post("/offers", response_model=dict)
 async def create_offer(
@@ -30,6 +65,7 @@ async def create_offer(
       "availability": {...}   # json
     }
     """
+    tags = clean_tags(payload.get("tags"))
     r = await db.execute(
         text("""
             insert into public.offers
@@ -43,7 +79,7 @@ async def create_offer(
             "type": payload.get("type"),
             "title": payload.get("title"),
             "desc": payload.get("description"),
-            "tags": payload.get("tags") or [],
+            "tags": tags,
             "fee": payload.get("fee_type"),
             "langs": payload.get("languages") or [],
             "region": payload.get("region"),
@@ -53,7 +89,11 @@ async def create_offer(
     )
 
     oid = r.scalar()
+    await record_tags(db, "offer", tags)
     await db.commit()
+    tag_index.apply("offer", tags)
+    await helper_ranker.refresh_helper(db, user_id)
+    await retrieval_index.refresh(db, "offer", str(oid))
     return {"id": str(oid)}
 
 # ---- Browse offers (PSM-01) ----
@@ -65,18 +105,20 @@ async def list_offers(
     fee: Optional[str] = None,
     region: Optional[str] = None,
     lang: Optional[str] = None,
-    sort: str = Query("new", pattern="^(new|rating|popular)$"),
+    sort: str = Query("new", pattern="^(new|rating|score|popular)$"),
     page: int = 1,
     page_size: int = 20,
+    fields: Optional[str] = Query(None, description="card | full | comma-separated field names"),
     db: AsyncSession = Depends(get_db),
 ):
+    cols, virtual = OFFER_FIELDS.select(fields)
     page = max(1, page)
     page_size = max(1, min(page_size, 50))
     offset = (page - 1) * page_size
 
     base = """
       from public.offer_public o
-      left join public.profiles p on p.id = o.owner_id
+      join public.offers ob on ob.id = o.id
       where 1=1
     """
     args = {}
@@ -101,18 +143,16 @@ async def list_offers(
 
     sort_sql = "o.created_at desc"
     if sort == "rating":
-        sort_sql = "o.avg_stars desc, o.ratings_count desc nulls last"
+        sort_sql = "ob.avg_stars desc, ob.ratings_count desc, ob.created_at desc"
+    elif sort == "score":
+        # Bayesian average, see migrations/006_offer_rating_aggregates.sql
+        sort_sql = "ob.rating_score desc, ob.created_at desc"
     elif sort == "popular":
-        sort_sql = "o.views desc, o.ratings_count desc nulls last"
+        sort_sql = "o.views desc, ob.ratings_count desc"
 
     count_sql = f"select count(*) {base}"
     rows_sql = f"""
-      select
-        o.id, o.type, o.title, o.description, o.tags, o.fee_type,
-        o.languages, o.region, o.availability,
-        o.avg_stars, o.ratings_count, o.views,
-        o.owner_id, coalesce(p.username, '') as owner_username, coalesce(p.avatar_url, '') as owner_avatar_url,
-        o.created_at
+      select {cols}
       {base}
       order by {sort_sql}
       limit :limit offset :offset
@@ -122,16 +162,62 @@ async def list_offers(
     total = (await db.execute(text(count_sql), args)).scalar() or 0
     res = await db.execute(text(rows_sql), args_rows)
     items = [row_to_dict(r) for r in res.fetchall()]
+    await attach_profiles(db, items, _owner_spec(virtual), default="")
     return {"items": items, "page": page, "page_size": page_size, "total": int(total)}
 
-@router.get("/offers/{offer_id}", response_model=dict)
-async def get_offer(offer_id: str, db: AsyncSession = Depends(get_db)):
+@router.post("/offers/batch", response_model=dict)
+async def offers_batch(payload: BatchIds, db: AsyncSession = Depends(get_db)):
+    """
+    Body: {"ids": [uuid, ...<=300]}
+    Returns {offer_id: offer} for the ids that exist; one query + cached owner summaries.
+    """
+    ids = payload.keys()
     res = await db.execute(
+        text("select o.* from public.offer_public o where o.id = any(cast(:ids as uuid[]))"),
+        {"ids": ids},
+    )
+    items = [row_to_dict(r) for r in res.fetchall()]
+    await attach_profiles(db, items, {"owner_id": {"username": "owner_username", "avatar_url": "owner_avatar_url"}})
+    return {str(o["id"]): o for o in items}
+
+@router.get("/offers/{offer_id}", response_model=dict)
+async def get_offer(
+    offer_id: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="card | full | comma-separated field names"),
+    db: AsyncSession = Depends(get_db),
+):
+    # row version: everything the payload is derived from -- the offer row incl.
+    # its rating aggregates, the view count and the owner's hydrated summary;
+    # primary-key lookups only (maintained view_counts, migrations/016)
+    ver = (await db.execute(
         text("""
-            select
-              o.*, p.username as owner_username, p.avatar_url as owner_avatar_url
-            from public.offer_public o
+            select o.updated_at, o.ratings_count, o.stars_sum, vc.count as n_views,
+                   p.username, p.avatar_url
+            from public.offers o
             left join public.profiles p on p.id = o.owner_id
+            left join public.view_counts vc on vc.entity = 'offer' and vc.entity_id = o.id
+            where o.id = cast(:id as uuid)
+        """),
+        {"id": offer_id},
+    )).first()
+    if not ver:
+        raise HTTPException(404, "Offer not found")
+    etag = make_etag("offer", offer_id, fields, *ver)
+    if (hit := not_modified(request, etag)):
+        return hit
+    response.headers["ETag"] = etag
+
+    if fields:
+        cols, virtual = OFFER_FIELDS.select(fields)
+    else:
+        cols, virtual = "o.*", list(_OWNER)
+    res = await db.execute(
+        text(f"""
+            select {cols}
+            from public.offer_public o
+            join public.offers ob on ob.id = o.id
             where o.id = :id
         """),
         {"id": offer_id},
@@ -139,7 +225,9 @@ async def get_offer(offer_id: str, db: AsyncSession = Depends(get_db)):
     row = res.first()
     if not row:
         raise HTTPException(404, "Offer not found")
-    return row_to_dict(row)
+    item = row_to_dict(row)
+    await attach_profiles(db, [item], _owner_spec(virtual))
+    return item
 
 @router.get("/offers/{offer_id}/gifts/available", response_model=dict)
 async def gifts_available(offer_id: str, db: AsyncSession = Depends(get_db)):
@@ -191,7 +279,9 @@ def _build_where(q: Optional[str], type_: Optional[str], tag: Optional[str],
 def _order_clause(sort: str) -> str:
     s = (sort or "new").lower()
     if s == "rating":
-        return "o.avg_stars DESC NULLS LAST, o.ratings_count DESC, o.created_at DESC"
+        return "ob.avg_stars DESC, ob.ratings_count DESC, ob.created_at DESC"
+    if s == "score":
+        return "ob.rating_score DESC, ob.created_at DESC"
     if s == "popular":
         return "o.views DESC NULLS LAST, o.created_at DESC"
     # default
@@ -235,6 +325,7 @@ async def offers_with_next_slots(
           o.*,
           ns.next_slots
         FROM public.offer_public o
+        JOIN public.offers ob ON ob.id = o.id
         LEFT JOIN LATERAL (
           SELECT COALESCE(
             json_agg(
@@ -299,12 +390,10 @@ async def offers_availability_by_day(
           o.id AS offer_id,
           o.title AS offer_title,
           o.owner_id,
-          p.username AS owner_username,
           s.start_at, s.end_at, s.capacity, s.reserved,
           o.region
         FROM public.offer_slots s
         JOIN public.offer_public o ON o.id = s.offer_id
-        LEFT JOIN public.profiles p ON p.id = o.owner_id
         WHERE s.status = 'open'
           AND s.reserved < s.capacity
           AND s.start_at >= CAST(:from AS date)
@@ -318,7 +407,6 @@ async def offers_availability_by_day(
             'offer_id', offer_id,
             'offer_title', offer_title,
             'owner_id', owner_id,
-            'owner_username', owner_username,
             'start_at', start_at,
             'end_at', end_at,
             'capacity', capacity,
@@ -332,4 +420,6 @@ async def offers_availability_by_day(
       ORDER BY day
     """)
     rows = (await db.execute(sql, params)).mappings().all()
-    return [{"day": r["day"].isoformat(), "slots": r["slots"] or []} for r in rows]
\ No newline at end of file
+    days = [{"day": r["day"].isoformat(), "slots": r["slots"] or []} for r in rows]
+    await attach_profiles(db, [s for d in days for s in d["slots"]], {"owner_id": {"username": "owner_username"}})
+    return days
\ No newline at end of file
@@ -4,15 +4,22 @@ from __future__ import annotations
 import json
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.deps import get_db, require_user_id
+from ...services.calendar import invalidate_offer_feed, invalidate_user_feed
+from ...services.exports import ExportFormat, export_response
+from ...services.profiles import attach_profiles
+from ...services.transitions import REQUEST_COUNTS_CTE, request_transition
 from ...utils.dbhelpers import row_to_dict
+from ...utils.pagination import decode_cursor, page_of, parse_ts, set_next_cursor
 
 router = APIRouter(prefix="/psm", tags=["psm"])
 
+REQUEST_STATUSES = ("open", "accepted", "declined", "withdrawn")
+
 
 @router.post("/requests", response_model=dict)
 async def create_request(payload: dict, db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
@@ -61,57 +68,104 @@ async def create_request(payload: dict, db: AsyncSession = Depends(get_db), user
             raise HTTPException(status_code=409, detail="No sponsored seats available")
 
     r = await db.execute(
-        text("""
-          insert into public.offer_requests
-            (offer_id, requester_id, message, preferred_times)
-          values
-            (:offer, :uid, :msg, CAST(:ptimes AS jsonb))
-          returning id
+        text(f"""
+          with moved as (
+            insert into public.offer_requests
+              (offer_id, offer_owner_id, requester_id, message, preferred_times)
+            select o.id, o.owner_id, :uid, :msg, CAST(:ptimes AS jsonb)
+              from public.offers o
+             where o.id = cast(:offer as uuid)
+            returning id, requester_id, offer_owner_id, null::text as old_status, status as new_status
+          ),
+          {REQUEST_COUNTS_CTE}
+          select id from moved
         """),
         {"offer": offer_id, "uid": user_id, "msg": message, "ptimes": json.dumps(preferred_times)},
     )
     rid = r.scalar()
+    if rid is None:
+        await db.rollback()
+        raise HTTPException(404, "offer not found")
     await db.commit()
     return {"id": str(rid)}
 
 
 @router.get("/requests/mine", response_model=list[dict])
 async def my_requests(
+    response: Response,
     box: str = Query("sent", pattern="^(sent|received)$"),
+    status: Optional[str] = Query(None, pattern="^(open|accepted|declined|withdrawn)$"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(require_user_id),
 ):
     """
     sent: requests created by me
     received: requests sent to my offers
+    Newest first; next page cursor in the X-Next-Cursor header.
     """
+    who = "r.requester_id" if box == "sent" else "r.offer_owner_id"
+    conds = [f"{who} = cast(:uid as uuid)"]
+    args: dict = {"uid": user_id, "lim": limit + 1}
+    if status:
+        conds.append("r.status = :status")
+        args["status"] = status
+    c = decode_cursor(cursor, 2)
+    if c:
+        conds.append("(r.created_at, r.id) < (:c_ts, cast(:c_id as uuid))")
+        args.update({"c_ts": parse_ts(c[0]), "c_id": c[1]})
+
+    res = await db.execute(
+        text(f"""
+          select r.*, o.title as offer_title, o.owner_id
+            from public.offer_requests r
+            join public.offers o on o.id = r.offer_id
+           where {" and ".join(conds)}
+        order by r.created_at desc, r.id desc
+           limit :lim
+        """),
+        args,
+    )
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "created_at", "id")
+    set_next_cursor(response, next_cursor)
     if box == "sent":
-        res = await db.execute(
-            text("""
-              select r.*, o.title as offer_title, o.owner_id,
-                     p.username as owner_username
-                from public.offer_requests r
-                join public.offers o on o.id = r.offer_id
-           left join public.profiles p on p.id = o.owner_id
-               where r.requester_id = :uid
-            order by r.created_at desc
-            """),
-            {"uid": user_id},
-        )
-    else:
-        res = await db.execute(
-            text("""
-              select r.*, o.title as offer_title, o.owner_id,
-                     pr.username as requester_username
-                from public.offer_requests r
-                join public.offers o on o.id = r.offer_id
-           left join public.profiles pr on pr.id = r.requester_id
-               where o.owner_id = :uid
-            order by r.created_at desc
-            """),
-            {"uid": user_id},
-        )
-    return [row_to_dict(r) for r in res.fetchall()]
+        return await attach_profiles(db, items, {"owner_id": {"username": "owner_username"}})
+    return await attach_profiles(db, items, {"requester_id": {"username": "requester_username"}})
+
+
+@router.get("/requests/mine/counts", response_model=dict)
+async def my_request_counts(db: AsyncSession = Depends(get_db), user_id: str = Depends(require_user_id)):
+    """Tab badges: {"sent": {"open": 2, ...}, "received": {"open": 5, ...}}"""
+    out = {box: {s: 0 for s in REQUEST_STATUSES} for box in ("sent", "received")}
+    res = await db.execute(
+        text("select box, status, count from public.request_counts where user_id = cast(:uid as uuid)"),
+        {"uid": user_id},
+    )
+    for r in res.fetchall():
+        out[r.box][r.status] = int(r.count)
+    return out
+
+
+@router.get("/requests/mine/export")
+async def export_my_requests(
+    box: str = Query("sent", pattern="^(sent|received)$"),
+    format: ExportFormat = Query("ndjson"),
+    user_id: str = Depends(require_user_id),
+):
+    """Same rows as /requests/mine, streamed as NDJSON or CSV; usernames joined in SQL."""
+    who = "r.requester_id" if box == "sent" else "r.offer_owner_id"
+    sql = f"""
+      select r.*, o.title as offer_title, o.owner_id,
+             po.username as owner_username, pr.username as requester_username
+        from public.offer_requests r
+        join public.offers o on o.id = r.offer_id
+        left join public.profiles po on po.id = o.owner_id
+        left join public.profiles pr on pr.id = r.requester_id
+       where {who} = cast(:uid as uuid)
+    order by r.created_at desc
+    """
+    return export_response(sql, {"uid": user_id}, format, f"requests-{box}")
 
 
 @router.patch("/requests/{request_id}", response_model=dict)
@@ -125,170 +179,32 @@ async def update_request(
     Accept : {"action":"accept",  "slot_id"?: uuid, "use_gift"?: true}
     Decline: {"action":"decline", "reason"?: "..."}
     Withdraw (by requester): {"action":"withdraw"}
+    Any action may carry "version" (from the request row); 409 if it moved since.
     """
     action = (payload.get("action") or "").lower()
-    if action not in {"accept", "decline", "withdraw"}:
-        raise HTTPException(422, "invalid action")
+    version = payload.get("version")
+    if version is not None and not isinstance(version, int):
+        raise HTTPException(422, "version must be an integer")
 
-    # Load request + offer + participants
-    rq = await db.execute(
-        text("""
-          select r.*, o.owner_id as offer_owner
-            from public.offer_requests r
-            join public.offers o on o.id = r.offer_id
-           where r.id = :id
-        """),
-        {"id": request_id},
-    )
-    row = rq.first()
-    if not row:
-        raise HTTPException(404, "request not found")
-    R = row._mapping  # keys: id, offer_id, requester_id, status, offer_owner, ...
-
-    if action in {"accept", "decline"} and str(R["offer_owner"]) != str(user_id):
-        raise HTTPException(403, "only offer owner can accept/decline")
-    if action == "withdraw" and str(R["requester_id"]) != str(user_id):
-        raise HTTPException(403, "only requester can withdraw")
-
-    # ---- ACCEPT -------------------------------------------------------------
+    # one statement per transition (see services/transitions.py)
     if action == "accept":
-        slot_id: Optional[str] = payload.get("slot_id")
-        use_gift: bool = bool(payload.get("use_gift"))
-        scheduled_at = None
-        gift_id = None
-
-        # If a slot is chosen on accept, reserve atomically (no double booking)
-        if slot_id:
-            took = await db.execute(
-                text("""
-                  update public.offer_slots s
-                     set reserved = reserved + 1,
-                         status   = case
-                                      when reserved + 1 >= capacity then 'full'
-                                      else status
-                                    end,
-                         updated_at = now()
-                   where s.id = :sid
-                     and s.offer_id = :oid
-                     and s.status <> 'cancelled'
-                     and s.reserved < s.capacity
-               returning s.start_at
-                """),
-                {"sid": slot_id, "oid": R["offer_id"]},
-            )
-            trow = took.first()
-            if not trow:
-                raise HTTPException(409, "slot not available")
-            scheduled_at = trow._mapping["start_at"]
-
-        # Optionally consume a donated unit (FIFO, skip locked)
-        if use_gift:
-            dec = await db.execute(
-                text("""
-                  with picked as (
-                      select id
-                        from public.offer_gifts
-                       where offer_id = :oid
-                         and status = 'active'
-                         and units_remaining > 0
-                         and (valid_until is null or valid_until > now())
-                       order by created_at asc
-                       for update skip locked
-                       limit 1
-                  )
-                  update public.offer_gifts g
-                     set units_remaining = g.units_remaining - 1,
-                         status = case
-                                   when g.units_remaining - 1 <= 0 then 'exhausted'
-                                   else 'active'
-                                  end,
-                         updated_at = now()
-                    from picked
-                   where g.id = picked.id
-               returning g.id
-                """),
-                {"oid": R["offer_id"]},
-            )
-            grow = dec.first()
-            if grow:
-                gift_id = grow._mapping["id"]
-
-        # mark request accepted
-        await db.execute(
-            text("update public.offer_requests set status='accepted', updated_at=now() where id=:id"),
-            {"id": request_id},
+        out = await request_transition(
+            db, request_id, action, user_id,
+            version=version,
+            slot_id=payload.get("slot_id"),
+            use_gift=bool(payload.get("use_gift")),
         )
-
-        # create engagement with optional slot & scheduled time; record audit
-        # compute state in python to avoid ambiguous parameter typing on :sch
-        # --- after you optionally reserve the slot and set `scheduled_at` ---
-
-        state = "scheduled" if scheduled_at is not None else "accepted"
-
-        # Create engagement with explicit casts for every ambiguous param
-        e = await db.execute(
-            text("""
-              insert into public.engagements
-                (request_id, practitioner_id, requester_id, state, scheduled_at, slot_id, audit)
-              values
-                (
-                  CAST(:rid   AS uuid),
-                  CAST(:prac  AS uuid),
-                  CAST(:req   AS uuid),
-                  CAST(:state AS text),
-                  CAST(:sch   AS timestamptz),
-                  CAST(:slot  AS uuid),
-                  jsonb_build_array(
-                    jsonb_build_object(
-                      'at', now(),
-                      'actor',   CAST(:actor AS uuid),
-                      'action',  'accept',
-                      'slot_id', CAST(:slot AS uuid)
-                    )
-                  )
-                )
-              returning id
-            """),
-            {
-                "rid": str(request_id),
-                "prac": str(R["offer_owner"]),
-                "req": str(R["requester_id"]),
-                "state": state,
-                "sch": scheduled_at,  # None or tz-aware datetime from DB
-                "slot": slot_id,  # None or UUID/str
-                "actor": str(user_id),  # <— THIS was ambiguous; cast to uuid above
-            },
-        )
-
-        eid = e.scalar()
         await db.commit()
-        return {"ok": True, "engagement_id": str(eid), "scheduled_at": scheduled_at}
-
-
-    # ---- DECLINE ------------------------------------------------------------
-    if action == "decline":
-        reason = payload.get("reason") or ""
-        await db.execute(
-            text("""
-              update public.offer_requests
-                 set status='declined',
-                     decline_reason=:r,
-                     updated_at=now()
-               where id=:id
-            """),
-            {"id": request_id, "r": reason},
-        )
-        await db.commit()
-        return {"ok": True}
-
-    # ---- WITHDRAW -----------------------------------------------------------
-    if action == "withdraw":
-        await db.execute(
-            text("update public.offer_requests set status='withdrawn', updated_at=now() where id=:id"),
-            {"id": request_id},
-        )
-        await db.commit()
-        return {"ok": True}
-
-    # Should not reach here
-    raise HTTPException(400, "unhandled")
+        invalidate_user_feed(out["requester_id"], out["offer_owner_id"])
+        invalidate_offer_feed(out["offer_id"])
+        return {
+            "ok": True,
+            "engagement_id": str(out["engagement_id"]),
+            "scheduled_at": out["scheduled_at"],
+            "version": out["version"],
+        }
+
+    reason = (payload.get("reason") or "") if action == "decline" else None
+    out = await request_transition(db, request_id, action, user_id, version=version, reason=reason)
+    await db.commit()
+    return {"ok": True, "version": out["version"]}
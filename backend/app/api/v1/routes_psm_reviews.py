@@ -1,16 +1,28 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Literal, Optional, Union
 from pydantic import BaseModel, UUID4
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 
 from ...api.deps import get_db, require_user_id
+from ...core.config import settings
+from ...services.profiles import add_review_stars, attach_profiles
+from ...services.ranking import helper_ranker
+from ...utils.cache import TTLCache
+from ...utils.pagination import decode_cursor, page_of, parse_ts, set_next_cursor
 
 router = APIRouter()
 
+# first REVIEWS_HEAD reviews + summary per offer; popped on new review,
+# other workers converge within REVIEWS_CACHE_TTL
+REVIEWS_HEAD = 100
+_heads: TTLCache[dict] = TTLCache(maxsize=settings.REVIEWS_CACHE_SIZE, ttl=settings.REVIEWS_CACHE_TTL)
+
+_REVIEWER = {"reviewer_id": {"username": "reviewer_username"}}
+
 
 # ---------- Schemas ----------
 class ReviewCreate(BaseModel):
@@ -21,14 +33,15 @@ class ReviewCreate(BaseModel):
 # ---------- Helpers ----------
 async def _load_engagement_bundle(db: AsyncSession, eng_id: str):
     """
-    Returns dict with: {state, offer_id, requester_id}
+    Returns dict with: {state, offer_id, requester_id, practitioner_id}
     """
     q = await db.execute(
         text("""
             select
               e.state,
               r.offer_id,
-              e.requester_id
+              e.requester_id,
+              e.practitioner_id
             from public.engagements e
             join public.offer_requests r on r.id = e.request_id
             where e.id = cast(:eid as uuid)
@@ -40,31 +53,114 @@ async def _load_engagement_bundle(db: AsyncSession, eng_id: str):
     return dict(row) if row else None
 
 
+async def _fetch_reviews(db: AsyncSession, offer_id: str, n: int, after: Optional[list] = None) -> list[dict]:
+    """n newest reviews (after a (created_at, id) cursor), reviewer usernames attached."""
+    args = {"oid": offer_id, "n": n}
+    cond = ""
+    if after:
+        cond = "and (r.created_at, r.id) < (:c_ts, cast(:c_id as uuid))"
+        args.update({"c_ts": parse_ts(after[0]), "c_id": after[1]})
+    rs = await db.execute(
+        text(f"""
+            select r.id, r.stars, r.comment, r.created_at, r.reviewer_id
+            from public.offer_reviews r
+            where r.offer_id = cast(:oid as uuid) {cond}
+            order by r.created_at desc, r.id desc
+            limit :n
+        """),
+        args,
+    )
+    items = [dict(x) for x in rs.mappings().all()]
+    return await attach_profiles(db, items, _REVIEWER)
+
+
+async def _head(db: AsyncSession, offer_id: str) -> Optional[dict]:
+    """{"rows": first REVIEWS_HEAD + 1 reviews, "summary": {...}} or None for an unknown offer."""
+    hit = _heads.get(offer_id)
+    if hit is not None:
+        return hit
+    s = await db.execute(
+        text("""
+            select ratings_count, avg_stars, rating_score, stars_hist
+            from public.offers
+            where id = cast(:oid as uuid)
+        """),
+        {"oid": offer_id},
+    )
+    srow = s.mappings().first()
+    if not srow:
+        return None
+    hist = list(srow["stars_hist"] or [0] * 5)
+    head = {
+        "rows": await _fetch_reviews(db, offer_id, REVIEWS_HEAD + 1) if srow["ratings_count"] else [],
+        "summary": {
+            "ratings_count": srow["ratings_count"],
+            "avg_stars": srow["avg_stars"],
+            "rating_score": srow["rating_score"],
+            "histogram": {str(i + 1): int(hist[i]) for i in range(5)},
+        },
+    }
+    _heads.set(offer_id, head)
+    return head
+
+
+async def _reviews_page(
+    db: AsyncSession, offer_id: str, limit: int, cursor: Optional[str]
+) -> tuple[list[dict], Optional[str], Optional[dict]]:
+    """-> (items, next cursor, summary). The first page comes from the cache."""
+    after = decode_cursor(cursor, 2)
+    if after is None:
+        head = await _head(db, offer_id)
+        if head is None:
+            return [], None, None
+        items, nxt = page_of(head["rows"][: limit + 1], limit, "created_at", "id")
+        return items, nxt, head["summary"]
+    rows = await _fetch_reviews(db, offer_id, limit + 1, after)
+    items, nxt = page_of(rows, limit, "created_at", "id")
+    return items, nxt, None
+
+
 # ---------- Endpoints ----------
 
-@router.get("/psm/offers/{offer_id}/reviews", response_model=list[dict])
+@router.get("/psm/offers/{offer_id}/reviews", response_model=Union[list[dict], dict])
 async def list_offer_reviews(
     offer_id: UUID4,
-    limit: int = Query(20, ge=1, le=100),
+    response: Response,
+    limit: int = Query(20, ge=1, le=REVIEWS_HEAD),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    include: Optional[Literal["summary"]] = None,
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(require_user_id),
 ):
-    sql = text("""
-        select
-          r.stars,
-          r.comment,
-          r.created_at,
-          r.reviewer_id,
-          p.username as reviewer_username
-        from public.offer_reviews r
-        join public.profiles p on p.id = r.reviewer_id
-        where r.offer_id = cast(:oid as uuid)
-        order by r.created_at desc
-        limit :lim offset :off
-    """)
-    rs = await db.execute(sql, {"oid": str(offer_id), "lim": limit, "off": offset})
-    return [dict(x) for x in rs.mappings().all()]
+    """
+    Newest first; next page cursor in the X-Next-Cursor header (offset is kept for old clients).
+    With ?include=summary the offer page comes in one call:
+      {"items": [...],
+       "summary": {"ratings_count", "avg_stars", "rating_score", "histogram": {"1".."5": n}}}
+    summary is only filled on the first page (no cursor), null after that.
+    """
+    if offset and not cursor and not include:
+        rs = await db.execute(
+            text("""
+                select r.id, r.stars, r.comment, r.created_at, r.reviewer_id
+                from public.offer_reviews r
+                where r.offer_id = cast(:oid as uuid)
+                order by r.created_at desc, r.id desc
+                limit :lim offset :off
+            """),
+            {"oid": str(offer_id), "lim": limit, "off": offset},
+        )
+        items = [dict(x) for x in rs.mappings().all()]
+        return await attach_profiles(db, items, _REVIEWER)
+
+    items, next_cursor, summary = await _reviews_page(db, str(offer_id), limit, cursor)
+    set_next_cursor(response, next_cursor)
+    if not include:
+        return items
+    if cursor is None and summary is None:
+        raise HTTPException(404, "offer not found")
+    return {"items": items, "summary": summary}
 
 
 @router.post("/psm/engagements/{eng_id}/reviews", response_model=dict)
@@ -95,14 +191,26 @@ async def create_review_for_engagement(
         raise HTTPException(403, "only the requester can review this engagement")
 
     # insert review (unique on (engagement_id) and (offer_id, reviewer_id))
+    # + the offer's rating aggregates in the same statement
     try:
         ins = await db.execute(
             text("""
-                insert into public.offer_reviews
-                    (offer_id, engagement_id, reviewer_id, stars, comment)
-                values
-                    (cast(:oid as uuid), cast(:eid as uuid), cast(:rid as uuid), :stars, :comment)
-                returning id, created_at
+                with ins as (
+                  insert into public.offer_reviews
+                      (offer_id, engagement_id, reviewer_id, stars, comment)
+                  values
+                      (cast(:oid as uuid), cast(:eid as uuid), cast(:rid as uuid), :stars, :comment)
+                  returning id, created_at, offer_id, stars
+                ),
+                agg as (
+                  update public.offers o
+                     set ratings_count = o.ratings_count + 1,
+                         stars_sum     = o.stars_sum + ins.stars,
+                         stars_hist[ins.stars] = o.stars_hist[ins.stars] + 1
+                    from ins
+                   where o.id = ins.offer_id
+                )
+                select id, created_at from ins
             """),
             {
                 "oid": str(bundle["offer_id"]),
@@ -113,12 +221,16 @@ async def create_review_for_engagement(
             },
         )
         row = ins.mappings().first()
+        await add_review_stars(db, str(bundle["practitioner_id"]), stars)
         await db.commit()
     except IntegrityError:
         # already reviewed (unique constraint)
         await db.rollback()
         raise HTTPException(409, "review already exists for this engagement / offer")
 
+    _heads.pop(str(bundle["offer_id"]))
+    await helper_ranker.refresh_helper(db, str(bundle["practitioner_id"]))
+
     return {
         "id": str(row["id"]),
         "offer_id": str(bundle["offer_id"]),
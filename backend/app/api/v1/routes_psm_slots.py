@@ -10,6 +10,8 @@ from sqlalchemy import text
 from fastapi import APIRouter, Depends, HTTPException, Query
 
 from ..deps import get_db, auth_user  # adjust import to your project
+from ...services.calendar import invalidate_offer_feed
+from ...services.exports import ExportFormat, export_response
 
 router = APIRouter()
 
@@ -58,6 +60,7 @@ async def create_slot(
         r = await db.execute(q, params)
         new_id = r.scalar_one()
         await db.commit()
+        invalidate_offer_feed(offer_id)
         return {"id": str(new_id)}
     except Exception as e:
         await db.rollback()
@@ -80,6 +83,30 @@ async def list_slots(
     rows = r.mappings().all()
     return [dict(row) for row in rows]
 
+# --- Export all slots of an offer (owner only) ---
+@router.get("/psm/offers/{offer_id}/slots/export")
+async def export_slots(
+    offer_id: UUID4,
+    format: ExportFormat = Query("csv"),
+    db: AsyncSession = Depends(get_db),
+    user = Depends(auth_user),
+):
+    r = await db.execute(
+        text("select owner_id from public.offers where id = :oid"), {"oid": str(offer_id)}
+    )
+    owner = r.scalar()
+    if owner is None:
+        raise HTTPException(status_code=404, detail="offer not found")
+    if str(owner) != str(user):
+        raise HTTPException(status_code=403, detail="only the offer owner can export slots")
+    sql = """
+        select id, offer_id, start_at, end_at, capacity, reserved, status, note
+        from public.offer_slots
+        where offer_id = cast(:offer_id as uuid)
+        order by start_at asc
+    """
+    return export_response(sql, {"offer_id": str(offer_id)}, format, f"slots-{offer_id}")
+
 # --- Cancel a slot (soft cancel) ---
 @router.delete("/psm/offers/{offer_id}/slots/{slot_id}")
 async def cancel_slot(
@@ -101,6 +128,7 @@ async def cancel_slot(
     if not row:
         raise HTTPException(status_code=404, detail="slot not found")
     await db.commit()
+    invalidate_offer_feed(offer_id)
     return {"ok": True}
 
 
@@ -176,4 +204,5 @@ async def cancel_slot_patch(
     if not r.first():
         raise HTTPException(404, "slot not found")
     await db.commit()
+    invalidate_offer_feed(offer_id)
     return {"ok": True}
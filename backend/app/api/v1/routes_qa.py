@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy import text, bindparam
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -6,10 +6,51 @@ from typing import Optional
 from pydantic import BaseModel, Field
 
 from ...api.deps import get_db, require_user_id
+from ...middleware.etag import make_etag, not_modified
+from ...services.retrieval import retrieval_index
+from ...services.tags import clean_tags, record_tags, tag_index
 from ...utils.dbhelpers import row_to_dict
+from ...utils.pagination import decode_cursor, page_of, parse_ts, set_next_cursor
+from ...utils.projections import Projection
 
 router = APIRouter()
 
+# card skips the per-row views/ratings subqueries
+QUESTION_FIELDS = Projection(
+    columns={
+        "id": "q.id", "asker_id": "q.asker_id", "title": "q.title", "body": "q.body",
+        "tags": "q.tags", "visibility": "q.visibility", "sources": "q.sources",
+        "created_at": "q.created_at", "updated_at": "q.updated_at",
+        # maintained on answer insert / accept (migrations/008)
+        "answer_count": "q.answer_count", "accepted_answer_id": "q.accepted_answer_id",
+        "last_activity_at": "q.last_activity_at",
+        "views": """coalesce((
+            select count(*)::int from public.views v
+            where v.entity='question' and v.entity_id=q.id
+          ), 0)""",
+        "avg_stars": """coalesce((
+            select avg(rt.stars)::float from public.ratings rt
+            where rt.entity='question' and rt.entity_id=q.id
+          ), 0.0)""",
+        "ratings_count": """coalesce((
+            select count(*)::int from public.ratings rt2
+            where rt2.entity='question' and rt2.entity_id=q.id
+          ), 0)""",
+        "comments_count": """coalesce((
+            select cc.count from public.comment_counts cc
+            where cc.entity='question' and cc.entity_id=q.id
+          ), 0)""",
+    },
+    presets={
+        "card": ["asker_id", "title", "tags", "created_at", "answer_count", "accepted_answer_id",
+                 "last_activity_at", "comments_count"],
+        "full": ["asker_id", "title", "body", "tags", "visibility", "sources", "created_at",
+                 "updated_at", "answer_count", "accepted_answer_id", "last_activity_at",
+                 "views", "avg_stars", "ratings_count", "comments_count"],
+    },
+    default="full",
+)
+
 # ---------- Schemas ----------
 class QuestionCreate(BaseModel):
     title: str
@@ -33,6 +74,7 @@ async def create_question(
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(require_user_id),
 ):
+    tags = clean_tags(payload.tags)
     stmt = text("""
         insert into public.questions (asker_id, title, body, tags, visibility, sources)
         values (:uid, :title, :body, :tags, :visibility, coalesce(:sources, '[]'::jsonb))
@@ -47,73 +89,129 @@ async def create_question(
             "uid": user_id,
             "title": payload.title,
             "body": payload.body,
-            "tags": payload.tags,         # text[] is fine with a Python list
+            "tags": tags,                 # text[] is fine with a Python list
             "visibility": payload.visibility,
             "sources": payload.sources or [],  # Python list is OK now
         },
     )
     qid = r.scalar()
+    await record_tags(db, "question", tags)
     await db.commit()
+    tag_index.apply("question", tags)
     return {"id": str(qid)}
 
 @router.get("/questions", response_model=list[dict])
 async def list_questions(
+    response: Response,
     q: Optional[str] = None,
     tag: Optional[str] = None,
+    sort: str = Query("new", pattern="^(new|activity)$"),
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="card | full | comma-separated field names"),
     db: AsyncSession = Depends(get_db),
 ):
-    base = """
-        select
-          q.id, q.asker_id, q.title, q.body, q.tags, q.visibility,
-          q.sources,
-          q.created_at, q.updated_at,
-          coalesce((
-            select count(*)::int from public.views v
-            where v.entity='question' and v.entity_id=q.id
-          ), 0) as views,
-          coalesce((
-            select avg(rt.stars)::float from public.ratings rt
-            where rt.entity='question' and rt.entity_id=q.id
-          ), 0.0) as avg_stars,
-          coalesce((
-            select count(*)::int from public.ratings rt2
-            where rt2.entity='question' and rt2.entity_id=q.id
-          ), 0) as ratings_count
+    """
+    Newest (sort=new) or most recently active (sort=activity) public questions.
+    Next page cursor in the X-Next-Cursor header.
+    """
+    key = "created_at" if sort == "new" else "last_activity_at"
+    cols, _ = QUESTION_FIELDS.resolve(fields)
+    cols = list(dict.fromkeys(cols + [key]))
+    base = f"""
+        select {QUESTION_FIELDS.sql(cols)}
         from public.questions q
         where q.visibility='public'
     """
-    args: dict = {}
+    args: dict = {"lim": limit + 1}
     if q:
         base += " and (q.title ilike :q or q.body ilike :q)"
         args["q"] = f"%{q}%"
     if tag:
         base += " and :t = any(q.tags)"
         args["t"] = tag
-    base += " order by q.created_at desc limit 100"
+    c = decode_cursor(cursor, 2)
+    if c:
+        base += f" and (q.{key}, q.id) < (:c_ts, cast(:c_id as uuid))"
+        args.update({"c_ts": parse_ts(c[0]), "c_id": c[1]})
+    base += f" order by q.{key} desc, q.id desc limit :lim"
 
     res = await db.execute(text(base), args)
-    return [row_to_dict(r) for r in res.fetchall()]
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, key, "id")
+    set_next_cursor(response, next_cursor)
+    return items
 
-@router.get("/questions/{qid}", response_model=dict)
-async def get_question(qid: str, db: AsyncSession = Depends(get_db)):
+@router.get("/questions/unanswered", response_model=list[dict])
+async def unanswered_questions(
+    response: Response,
+    tag: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="card | full | comma-separated field names"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Helpers' triage queue: public questions without answers, oldest first.
+    Served from questions_unanswered_idx; the default card projection has no per-row aggregates.
+    """
+    cols, _ = QUESTION_FIELDS.resolve(fields, default="card")
+    cols = list(dict.fromkeys(cols + ["created_at"]))
+    conds = ["q.visibility='public'", "q.answer_count = 0"]
+    args: dict = {"lim": limit + 1}
+    if tag:
+        conds.append(":t = any(q.tags)")
+        args["t"] = tag
+    c = decode_cursor(cursor, 2)
+    if c:
+        conds.append("(q.created_at, q.id) > (:c_ts, cast(:c_id as uuid))")
+        args.update({"c_ts": parse_ts(c[0]), "c_id": c[1]})
     res = await db.execute(
+        text(f"""
+            select {QUESTION_FIELDS.sql(cols)}
+            from public.questions q
+            where {" and ".join(conds)}
+            order by q.created_at, q.id
+            limit :lim
+        """),
+        args,
+    )
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "created_at", "id")
+    set_next_cursor(response, next_cursor)
+    return items
+
+@router.get("/questions/{qid}", response_model=dict)
+async def get_question(
+    qid: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="card | full | comma-separated field names"),
+    db: AsyncSession = Depends(get_db),
+):
+    cols, _ = QUESTION_FIELDS.select(fields)
+    # row version: everything the payload is derived from, without reading body/sources;
+    # counters are maintained rows (migrations/002, 016), so this is pk lookups only
+    ver = (await db.execute(
         text("""
-            select
-              q.id, q.asker_id, q.title, q.body, q.tags, q.visibility,
-              q.sources,
-              q.created_at, q.updated_at,
-              coalesce((
-                select count(*)::int from public.views v
-                where v.entity='question' and v.entity_id=q.id
-              ), 0) as views,
-              coalesce((
-                select avg(rt.stars)::float from public.ratings rt
-                where rt.entity='question' and rt.entity_id=q.id
-              ), 0.0) as avg_stars,
-              coalesce((
-                select count(*)::int from public.ratings rt2
-                where rt2.entity='question' and rt2.entity_id=q.id
-              ), 0) as ratings_count
+            select q.updated_at, q.answer_count, q.accepted_answer_id,
+                   vc.count as n_views, rc.count as n_ratings, rc.stars_sum, cc.count as n_comments
+            from public.questions q
+            left join public.view_counts vc on vc.entity = 'question' and vc.entity_id = q.id
+            left join public.rating_counts rc on rc.entity = 'question' and rc.entity_id = q.id
+            left join public.comment_counts cc on cc.entity = 'question' and cc.entity_id = q.id
+            where q.id=:id
+        """),
+        {"id": qid},
+    )).first()
+    if not ver:
+        raise HTTPException(404, "Not found")
+    etag = make_etag("question", qid, fields, *ver)
+    if (hit := not_modified(request, etag)):
+        return hit
+    response.headers["ETag"] = etag
+
+    res = await db.execute(
+        text(f"""
+            select {cols}
             from public.questions q
             where q.id=:id
         """),
@@ -140,8 +238,11 @@ async def delete_question(
     if str(row._mapping["asker_id"]) != str(user_id):
         raise HTTPException(403, "Only owner can delete the question")
 
-    await db.execute(text("delete from public.questions where id=:id"), {"id": qid})
+    res = await db.execute(text("delete from public.questions where id=:id returning tags"), {"id": qid})
+    tags = clean_tags(res.scalar())
+    await record_tags(db, "question", removed=tags)
     await db.commit()
+    tag_index.apply("question", removed=tags)
     return
 
 # ===================== ANSWERS =====================
@@ -153,9 +254,19 @@ async def create_answer(
     user_id: str = Depends(require_user_id),
 ):
     stmt = text("""
-        insert into public.answers (question_id, author_id, body, evidence, sources)
-        values (:qid, :uid, :body, :evidence, coalesce(:sources, '[]'::jsonb))
-        returning id
+        with ins as (
+          insert into public.answers (question_id, author_id, body, evidence, sources)
+          values (:qid, :uid, :body, :evidence, coalesce(:sources, '[]'::jsonb))
+          returning id, question_id, created_at
+        ),
+        bump as (
+          update public.questions q
+             set answer_count = q.answer_count + 1,
+                 last_activity_at = ins.created_at
+            from ins
+           where q.id = ins.question_id
+        )
+        select id from ins
     """).bindparams(
         bindparam("sources", type_=JSONB)  # 👈 JSONB binding
     )
@@ -175,18 +286,34 @@ async def create_answer(
     return {"id": str(aid)}
 
 @router.get("/questions/{qid}/answers", response_model=list[dict])
-async def list_answers(qid: str, db: AsyncSession = Depends(get_db)):
+async def list_answers(
+    qid: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Oldest first; next page cursor in the X-Next-Cursor header."""
+    args: dict = {"qid": qid, "lim": limit + 1}
+    after = ""
+    c = decode_cursor(cursor, 2)
+    if c:
+        after = "and (created_at, id) > (:c_ts, cast(:c_id as uuid))"
+        args.update({"c_ts": parse_ts(c[0]), "c_id": c[1]})
     res = await db.execute(
-        text("""
+        text(f"""
             select id, question_id, author_id, body, evidence, sources,
                    is_accepted, created_at, updated_at
             from public.answers
-            where question_id=:qid
-            order by created_at asc
+            where question_id=:qid {after}
+            order by created_at asc, id asc
+            limit :lim
         """),
-        {"qid": qid},
+        args,
     )
-    return [row_to_dict(r) for r in res.fetchall()]
+    items, next_cursor = page_of([row_to_dict(r) for r in res.fetchall()], limit, "created_at", "id")
+    set_next_cursor(response, next_cursor)
+    return items
 
 @router.post("/questions/{qid}/accept/{aid}", status_code=204)
 async def accept_answer(
@@ -196,7 +323,7 @@ async def accept_answer(
     user_id: str = Depends(require_user_id),
 ):
     owner = await db.execute(
-        text("select asker_id from public.questions where id=:id"),
+        text("select asker_id, accepted_answer_id from public.questions where id=:id"),
         {"id": qid},
     )
     row = owner.first()
@@ -204,10 +331,22 @@ async def accept_answer(
         raise HTTPException(404, "Question not found")
     if str(row._mapping["asker_id"]) != str(user_id):
         raise HTTPException(403, "Only question owner can accept an answer")
+    previous = row._mapping["accepted_answer_id"]
 
     await db.execute(
         text("select public.accept_answer(:qid, :aid, :actor)"),
         {"qid": qid, "aid": aid, "actor": user_id},
     )
+    await db.execute(
+        text("""
+            update public.questions
+               set accepted_answer_id = cast(:aid as uuid), last_activity_at = now()
+             where id = cast(:qid as uuid)
+        """),
+        {"qid": qid, "aid": aid},
+    )
     await db.commit()
+    await retrieval_index.refresh(db, "answer", aid)
+    if previous is not None and str(previous) != str(aid):
+        await retrieval_index.refresh(db, "answer", str(previous))   # no longer accepted -> dropped
     return
@@ -21,11 +21,30 @@ async def rate(
     if not entity or not entity_id or not isinstance(stars, int) or not (1 <= stars <= 5):
         return {"ok": False, "detail": "bad payload"}
 
+    # rating_counts (migrations/016) moves in the same statement: a new rating
+    # counts once (xmax = 0 <=> the upsert inserted), a changed one moves stars_sum
     await db.execute(
         text("""
-            insert into public.ratings (entity, entity_id, rater_id, stars)
-            values (:e, :id, :uid, :s)
-            on conflict (entity, entity_id, rater_id) do update set stars = excluded.stars
+            with prev as (
+              select stars from public.ratings
+               where entity = :e and entity_id = :id and rater_id = :uid
+            ),
+            up as (
+              insert into public.ratings (entity, entity_id, rater_id, stars)
+              values (:e, :id, :uid, :s)
+              on conflict (entity, entity_id, rater_id) do update set stars = excluded.stars
+              returning entity, entity_id, stars, (xmax = 0) as inserted
+            )
+            insert into public.rating_counts (entity, entity_id, count, stars_sum)
+            select up.entity::text, up.entity_id,
+                   case when up.inserted then 1 else 0 end,
+                   up.stars - case when up.inserted then 0
+                                   else coalesce((select stars from prev), up.stars) end
+              from up
+            on conflict (entity, entity_id) do update
+               set count     = public.rating_counts.count + excluded.count,
+                   stars_sum = public.rating_counts.stars_sum + excluded.stars_sum,
+                   updated_at = now()
         """),
         {"e": entity, "id": entity_id, "uid": user_id, "s": stars},
     )
@@ -1,14 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from ...api.deps import get_db, require_user_id
 from ...schemas.rfh import RFHCreate
+from ...services.tags import clean_tags, record_tags, tag_index
 from ...utils.dbhelpers import row_to_dict
+from ...utils.projections import Projection
 
 router = APIRouter()
 
+# requester_id is always the masked expression, whatever the projection
+RFH_FIELDS = Projection(
+    columns={
+        "id": "r.id",
+        "requester_id": """case
+            when r.anonymous and r.requester_id <> auth.uid()
+              and not exists (
+                select 1 from public.profiles p
+                where p.id = auth.uid() and ('admin' = any(p.roles))
+              )
+            then null
+            else r.requester_id
+          end""",
+        "is_owner": "(r.requester_id = auth.uid())",
+        **{c: f"r.{c}" for c in (
+            "title", "body", "tags", "sensitivity", "anonymous", "status",
+            "region", "language", "created_at", "updated_at",
+        )},
+        # metrics (tablolar yoksa 0 döner)
+        "views": """coalesce((
+            select count(*)::int from public.views v
+            where v.entity='rfh' and v.entity_id=r.id
+          ), 0)""",
+        "avg_stars": """coalesce((
+            select avg(rt.stars)::float from public.ratings rt
+            where rt.entity='rfh' and rt.entity_id=r.id
+          ), 0.0)""",
+        "ratings_count": """coalesce((
+            select count(*)::int from public.ratings rt2
+            where rt2.entity='rfh' and rt2.entity_id=r.id
+          ), 0)""",
+        "comments_count": """coalesce((
+            select cc.count from public.comment_counts cc
+            where cc.entity='rfh' and cc.entity_id=r.id
+          ), 0)""",
+    },
+    presets={
+        "card": ["requester_id", "title", "tags", "sensitivity", "anonymous", "status",
+                 "region", "language", "created_at", "comments_count"],
+        "full": ["requester_id", "title", "body", "tags", "sensitivity", "anonymous", "status",
+                 "region", "language", "created_at", "updated_at",
+                 "views", "avg_stars", "ratings_count", "comments_count"],
+        "detail": ["requester_id", "is_owner", "title", "body", "tags", "sensitivity", "anonymous",
+                   "status", "region", "language", "created_at", "updated_at",
+                   "views", "avg_stars", "ratings_count", "comments_count"],
+    },
+    default="full",
+)
+
 @router.post("", response_model=dict)
 async def create_rfh(
     payload: RFHCreate,
@@ -20,11 +71,12 @@ async def create_rfh(
         values (:uid, :title, :body, :tags, :sensitivity, :anonymous, :region, :language)
         returning id
     """)
+    tags = clean_tags(payload.tags)
     params = {
         "uid": user_id,
         "title": payload.title,
         "body": payload.body,
-        "tags": payload.tags,
+        "tags": tags,
         "sensitivity": payload.sensitivity,
         "anonymous": payload.anonymous,
         "region": payload.region,
@@ -32,46 +84,26 @@ async def create_rfh(
     }
     r = await db.execute(sql, params)
     new_id = r.scalar()
+    await record_tags(db, "rfh", tags)
     await db.commit()
+    tag_index.apply("rfh", tags)
     return {"id": str(new_id)}
 
 @router.get("", response_model=list[dict])
 async def list_rfh(
     q: Optional[str] = None,
     tag: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="card | full | comma-separated field names"),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Maskeli public liste (anon ise owner/admin değilse requester_id gizlenir).
     Ayrıca basit metrikler (views/avg_stars/ratings_count) varsa döndürür.
+    `fields=card` metrik alt sorgularını atlar.
     """
-    base = """
-        select
-          r.id,
-          case 
-            when r.anonymous and r.requester_id <> auth.uid()
-              and not exists (
-                select 1 from public.profiles p
-                where p.id = auth.uid() and ('admin' = any(p.roles))
-              )
-            then null
-            else r.requester_id
-          end as requester_id,
-          r.title, r.body, r.tags, r.sensitivity, r.anonymous, r.status,
-          r.region, r.language, r.created_at, r.updated_at,
-          -- metrics (tablolar yoksa 0 döner)
-          coalesce((
-            select count(*)::int from public.views v
-            where v.entity='rfh' and v.entity_id=r.id
-          ), 0) as views,
-          coalesce((
-            select avg(rt.stars)::float from public.ratings rt
-            where rt.entity='rfh' and rt.entity_id=r.id
-          ), 0.0) as avg_stars,
-          coalesce((
-            select count(*)::int from public.ratings rt2
-            where rt2.entity='rfh' and rt2.entity_id=r.id
-          ), 0) as ratings_count
+    cols, _ = RFH_FIELDS.select(fields)
+    base = f"""
+        select {cols}
         from public.rfh r
     """
     conds = []
@@ -91,38 +123,18 @@ async def list_rfh(
     return [row_to_dict(r) for r in rows]
 
 @router.get("/{rfh_id}", response_model=dict)
-async def get_rfh(rfh_id: str, db: AsyncSession = Depends(get_db)):
+async def get_rfh(
+    rfh_id: str,
+    fields: Optional[str] = Query(None, description="card | detail | comma-separated field names"),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Detay: requester_id masking + is_owner bilgisi.
     Metrikler de ekli (varsa).
     """
-    res = await db.execute(text("""
-        select
-          r.id,
-          case 
-            when r.anonymous and r.requester_id <> auth.uid()
-              and not exists (
-                select 1 from public.profiles p
-                where p.id = auth.uid() and ('admin' = any(p.roles))
-              )
-            then null
-            else r.requester_id
-          end as requester_id,
-          (r.requester_id = auth.uid()) as is_owner,
-          r.title, r.body, r.tags, r.sensitivity, r.anonymous, r.status,
-          r.region, r.language, r.created_at, r.updated_at,
-          coalesce((
-            select count(*)::int from public.views v
-            where v.entity='rfh' and v.entity_id=r.id
-          ), 0) as views,
-          coalesce((
-            select avg(rt.stars)::float from public.ratings rt
-            where rt.entity='rfh' and rt.entity_id=r.id
-          ), 0.0) as avg_stars,
-          coalesce((
-            select count(*)::int from public.ratings rt2
-            where rt2.entity='rfh' and rt2.entity_id=r.id
-          ), 0) as ratings_count
+    cols, _ = RFH_FIELDS.select(fields, default="detail")
+    res = await db.execute(text(f"""
+        select {cols}
         from public.rfh r
         where r.id=:id
     """), {"id": rfh_id})
@@ -148,6 +160,9 @@ async def delete_rfh(
     if str(row._mapping["requester_id"]) != str(user_id):
         raise HTTPException(403, "Only owner can delete the RFH")
 
-    await db.execute(text("delete from public.rfh where id=:id"), {"id": rfh_id})
+    res = await db.execute(text("delete from public.rfh where id=:id returning tags"), {"id": rfh_id})
+    tags = clean_tags(res.scalar())
+    await record_tags(db, "rfh", removed=tags)
     await db.commit()
+    tag_index.apply("rfh", removed=tags)
     return
@@ -0,0 +1,36 @@
+# app/api/v1/routes_tags.py
+from __future__ import annotations
+
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Query
+
+from ...services.tags import tag_index
+
+router = APIRouter()
+
+TagKind = Literal["rfh", "question", "content", "offer", "project", "event"]
+
+
+@router.get("/autocomplete", response_model=list[dict])
+async def autocomplete(
+    q: str = Query("", max_length=64),
+    kind: Optional[TagKind] = None,
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Tag picker completions from the in-memory index (services/tags.py).
+    Matches slug or label prefixes, case/diacritic-insensitive; most used first.
+    With `kind`, ranks by (and only returns tags used on) that entity type.
+    [{"slug", "label", "count"}]
+    """
+    return tag_index.complete(q, limit, kind)
+
+
+@router.get("/facets", response_model=list[dict])
+async def facets(
+    kind: Optional[TagKind] = None,
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Most used tags overall or per entity type: [{"slug", "label", "count"}]"""
+    return tag_index.facets(kind, limit)
@@ -19,10 +19,19 @@ async def add_view(
     if not entity or not entity_id:
         return {"ok": False, "detail": "missing entity/entity_id"}
 
+    # view_counts (migrations/016) moves in the same statement
     await db.execute(
         text("""
-            insert into public.views (entity, entity_id, viewer_id)
-            values (:e, :id, :uid)
+            with ins as (
+              insert into public.views (entity, entity_id, viewer_id)
+              values (:e, :id, :uid)
+              returning entity, entity_id
+            )
+            insert into public.view_counts (entity, entity_id, count)
+            select entity::text, entity_id, 1 from ins
+            on conflict (entity, entity_id) do update
+               set count = public.view_counts.count + 1,
+                   updated_at = now()
         """),
         {"e": entity, "id": entity_id, "uid": user_id},
     )
@@ -21,6 +21,97 @@ class Settings(BaseSettings):
     # 🔽 ekledik
     DB_SSL_MODE: Literal["strict", "os", "relax"] = "strict"
 
+    # Helper matching (app/services/ranking.py)
+    MATCH_REFRESH_SECONDS: int = 900
+    MATCH_W_TAGS: float = 1.0
+    MATCH_W_LANGUAGES: float = 0.5
+    MATCH_W_REGION: float = 0.5
+    MATCH_W_REPUTATION: float = 0.01
+    MATCH_W_COMPLETED: float = 0.25
+    MATCH_W_STARS: float = 0.2
+
+    # BM25 retrieval index (app/services/retrieval.py)
+    RETRIEVAL_SNAPSHOT_PATH: str = ".cache/retrieval.snapshot.json"
+    RETRIEVAL_SNAPSHOT_EVERY: int = 200   # save after this many incremental writes
+    RETRIEVAL_CATCHUP_INTERVAL: int = 60  # seconds between catch-ups (other workers' writes); 0 = boot only
+    RETRIEVAL_RECONCILE_INTERVAL: int = 21600  # full live-id diff (hard deletes); 0 = boot only
+
+    # AI answers (app/services/inference.py)
+    AI_BACKEND: Literal["template", "openai_compat"] = "template"
+    AI_BASE_URL: str = ""                 # e.g. http://127.0.0.1:8080 (llama.cpp server)
+    AI_MODEL: str = "local"
+    AI_TIMEOUT: float = 60.0
+    AI_MAX_TOKENS: int = 384
+    AI_MAX_CONCURRENCY: int = 2           # concurrent inference slots per worker
+    AI_QUEUE_TIMEOUT: float = 5.0         # wait this long for a slot, then 503
+    AI_CACHE_SIZE: int = 2048
+    AI_CACHE_TTL: int = 3600
+
+    # Profile summary loader (app/services/profiles.py)
+    PROFILE_CACHE_SIZE: int = 20000
+    PROFILE_CACHE_TTL: int = 300
+
+    # Response compression (app/middleware/compression.py)
+    HTTP_COMPRESS_MIN_SIZE: int = 1024    # bytes; smaller bodies go out as-is
+    HTTP_GZIP_LEVEL: int = 6
+    HTTP_BROTLI_QUALITY: int = 4
+
+    # Offer review listings (app/api/v1/routes_psm_reviews.py)
+    REVIEWS_CACHE_SIZE: int = 5000        # offers whose first page + histogram is cached
+    REVIEWS_CACHE_TTL: int = 30
+
+    # Trending feed (app/services/trending.py)
+    TRENDING_INTERVAL: int = 60           # seconds between batches; 0 disables the updater
+    TRENDING_LAG_SECONDS: int = 5         # leave in-flight transactions to the next batch
+    TRENDING_HALF_LIFE_HOURS: float = 24.0
+    TRENDING_W_VIEW: float = 1.0
+    TRENDING_W_RATING: float = 3.0
+    TRENDING_W_COMMENT: float = 4.0
+    TRENDING_W_ANSWER: float = 6.0
+    TRENDING_W_REVIEW: float = 5.0
+    TRENDING_W_REQUEST: float = 3.0
+
+    # Tag autocomplete / facets (app/services/tags.py)
+    TAGS_RELOAD_INTERVAL: int = 300       # seconds; picks up other workers' writes, 0 = load once
+
+    # Entries feed (app/services/entries_feed.py)
+    ENTRIES_HEAD_SIZE: int = 200          # newest public entries kept in memory per worker
+    ENTRIES_HEAD_TTL: float = 10.0        # reload after this long (other workers' posts)
+
+    # iCalendar feeds (app/services/calendar.py)
+    CALENDAR_FEED_SECRET: str = ""        # HMAC key for per-user feed URLs; empty disables them
+    CALENDAR_CACHE_SIZE: int = 10000
+    CALENDAR_CACHE_TTL: int = 300
+    CALENDAR_PAST_DAYS: int = 30          # keep recent past items in user feeds
+    CALENDAR_DEFAULT_MINUTES: int = 60    # duration when there is no end time
+
+    # Moderation queue (app/services/moderation.py)
+    MODERATOR_ROLES: str = "moderator,admin"   # profiles.roles values allowed in /moderation
+    MODERATION_LEASE_SECONDS: int = 600
+
+    # Rate limiting (app/middleware/ratelimit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    # "METHOD /path user=N/S ip=N/S; ..." relative to API_PREFIX; N tokens refilled over S seconds.
+    # Paths match exactly ("/comments" leaves "/comments/batch" alone); "/path/*" covers the subtree
+    RATE_LIMIT_RULES: str = (
+        "POST /comments user=30/60 ip=120/60;"
+        "POST /views user=120/60 ip=600/60;"
+        "POST /ratings user=20/60 ip=80/60;"
+        "POST /reports user=10/60 ip=40/60;"
+        "POST /psm/requests user=10/60 ip=40/60"
+    )
+    RATE_LIMIT_AUTH: str = "user=600/60 ip=1200/60"   # any request with a bearer token
+    RATE_LIMIT_BACKEND: Literal["memory", "redis"] = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100000                  # memory backend
+    RATE_LIMIT_REDIS_URL: str = "redis://127.0.0.1:6379/0"
+    RATE_LIMIT_REDIS_POOL: int = 8
+    RATE_LIMIT_REDIS_TIMEOUT: float = 0.25
+    RATE_LIMIT_REDIS_RETRY: float = 30.0               # seconds on the memory backend after a redis failure
+    RATE_LIMIT_TRUST_FORWARDED: bool = False           # key ips on X-Forwarded-For (behind a proxy)
+
+    # Streaming exports (app/services/exports.py)
+    EXPORT_CHUNK_ROWS: int = 1000
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -1,17 +1,60 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import ORJSONResponse
 
 from .core.config import settings
+from .middleware.compression import CompressionMiddleware
+from .middleware.etag import ETagMiddleware
+from .middleware.ratelimit import RateLimitMiddleware, rate_limit_backend
 from .utils.logger import setup_logging
 from .api.v1 import router as api_router
+from .services.retrieval import retrieval_index
+from .services.tags import tag_index
+from .services.trending import trending_updater
 
 setup_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await retrieval_index.startup()
+    await tag_index.startup()
+    await trending_updater.startup()
+    yield
+    await trending_updater.shutdown()
+    await tag_index.shutdown()
+    await retrieval_index.shutdown()
+    await rate_limit_backend.close()
+
+
 app = FastAPI(
     title=getattr(settings, "APP_NAME", "BenefiSocial API"),
     default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+api_prefix = getattr(settings, "API_PREFIX", "/api")
+if not api_prefix.startswith("/"):
+    api_prefix = f"/{api_prefix}"
+
+# ETag/304 sees the plain body, compression wraps it, rate limiting rejects
+# before any of it (or a DB session) runs, CORS stays outermost so 429s carry it
+app.add_middleware(ETagMiddleware)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.HTTP_COMPRESS_MIN_SIZE,
+    gzip_level=settings.HTTP_GZIP_LEVEL,
+    brotli_quality=settings.HTTP_BROTLI_QUALITY,
 )
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        prefix=api_prefix,
+        rules=settings.RATE_LIMIT_RULES,
+        auth=settings.RATE_LIMIT_AUTH,
+    )
 
 # CORS
 origins = [o.strip() for o in getattr(settings, "CORS_ORIGINS", "").split(",") if o.strip()]
@@ -25,7 +68,4 @@ app.add_middleware(
 )
 
 # API
-api_prefix = getattr(settings, "API_PREFIX", "/api")
-if not api_prefix.startswith("/"):
-    api_prefix = f"/{api_prefix}"
 app.include_router(api_router, prefix=api_prefix)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# CompressionMiddleware appends these inside the quotes of a strong tag
+ENCODING_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+# headers a 304 may carry (RFC 9110 15.4.5)
+_KEEP_ON_304 = ("etag", "cache-control", "vary", "expires", "content-location", "date")
+
+
+def make_etag(*parts: Any) -> str:
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return '"' + hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest() + '"'
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _strip_suffix(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIX.values():
+        if tag.endswith(suffix + '"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_strip_suffix(t) == etag for t in if_none_match.split(","))
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    For detail routes that can compute a row-version tag up front:
+        tag = make_etag("offer", id, updated_at, ...)
+        if (r := not_modified(request, tag)): return r
+    Returns the 304 to send, or None to go on and build the body.
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+class ETagMiddleware:
+    """
+    Strong ETag (hash of the body) on buffered 200 GET/HEAD responses that the
+    route did not tag itself, and If-None-Match -> 304. Saves bandwidth only;
+    routes that want to skip the query use `not_modified` with a row-version tag.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        if_none_match = Headers(scope=scope).get("if-none-match")
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def wrapped(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            assert start is not None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if start["status"] != 200 or message.get("more_body", False):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            etag = headers.get("etag") or body_etag(body)
+            headers["etag"] = etag
+            if etag_matches(if_none_match, etag):
+                kept = [(k, v) for k, v in start["headers"] if k.decode("latin-1").lower() in _KEEP_ON_304]
+                await send({"type": "http.response.start", "status": 304, "headers": kept})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, wrapped)
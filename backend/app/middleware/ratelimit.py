@@ -0,0 +1,432 @@
+# app/middleware/ratelimit.py
+"""
+Token-bucket rate limiting, enforced in front of the app.
+
+Rules (RATE_LIMIT_RULES, relative to API_PREFIX) look like
+
+    POST /comments user=30/60 ip=90/60; POST /psm/requests/* ip=60/60
+
+"N/S" is a bucket of N tokens refilled over S seconds. A rule path matches
+exactly; a trailing "/*" makes it cover the path and everything below it ("*"
+as the method matches any method). Every matching rule applies, plus
+RATE_LIMIT_AUTH for any request that carries a bearer token, since each of
+those pays for a JWT verification. A request takes one token from each of its
+buckets or from none, and is answered 429 + Retry-After when one is empty.
+
+This runs before routing, so a throttled request never reaches a dependency
+and never checks out a DB connection -- which also means the token is not
+verified yet. User buckets are therefore keyed on a hash of the raw bearer
+token, never on its claims: a forged token with someone else's `sub` lands in
+a bucket of its own and cannot drain theirs. Minting fresh tokens only buys
+fresh user buckets; the ip buckets of the same rules still hold.
+
+Backends:
+  - memory: per-process dict in LRU order. Buckets idle long enough to be full
+            again are dropped (a dropped bucket and a full one are the same),
+            and RATE_LIMIT_MAX_KEYS caps the rest
+  - redis : shared buckets via one EVALSHA per request over a small RESP
+            connection pool, so anything speaking the Redis protocol can serve
+            it. If the server is unreachable the memory backend takes over
+            until the next retry
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+from urllib.parse import unquote, urlparse
+
+import orjson
+from loguru import logger
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..core.config import settings
+
+# (key, capacity, refill per second)
+Bucket = tuple[str, float, float]
+
+
+@dataclass(frozen=True)
+class Limit:
+    capacity: float
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+
+@dataclass(frozen=True)
+class Rule:
+    method: str
+    path: str
+    user: Optional[Limit]
+    ip: Optional[Limit]
+    subtree: bool = False
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.method != "*" and self.method != method:
+            return False
+        if path == self.path:
+            return True
+        if not self.subtree:
+            return False
+        return self.path == "/" or path.startswith(self.path + "/")
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.path.rstrip('/')}/*" if self.subtree else f"{self.method} {self.path}"
+
+
+def _limit(spec: str) -> Limit:
+    n, _, s = spec.partition("/")
+    limit = Limit(float(n), float(s or 1))
+    if limit.capacity < 1 or limit.period <= 0:
+        raise ValueError(f"bad rate limit {spec!r}")
+    return limit
+
+
+def _limits(parts: Sequence[str]) -> dict[str, Limit]:
+    out: dict[str, Limit] = {}
+    for p in parts:
+        scope, _, spec = p.partition("=")
+        if scope not in ("user", "ip") or not spec:
+            raise ValueError(f"bad rate limit {p!r} (want user=N/S or ip=N/S)")
+        out[scope] = _limit(spec)
+    return out
+
+
+def parse_rules(spec: str) -> list[Rule]:
+    rules: list[Rule] = []
+    for chunk in spec.split(";"):
+        parts = chunk.split()
+        if not parts:
+            continue
+        if len(parts) < 3:
+            raise ValueError(f"bad rate limit rule {chunk.strip()!r}")
+        lim = _limits(parts[2:])
+        path, subtree = parts[1], False
+        if path == "*" or path.endswith("/*"):
+            path, subtree = path[:-1], True
+        path = "/" + path.strip("/")
+        rules.append(Rule(parts[0].upper(), path, lim.get("user"), lim.get("ip"), subtree))
+    return rules
+
+
+def parse_auth_rule(spec: str) -> Optional[Rule]:
+    parts = spec.split()
+    if not parts:
+        return None
+    lim = _limits(parts)
+    return Rule("*", "/", lim.get("user"), lim.get("ip"), subtree=True)
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class MemoryBackend:
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        # key -> [tokens, updated_at, full_at]
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float) -> None:
+        b = self._buckets
+        # LRU order is close to full_at order; stop at the first live bucket
+        while b:
+            key, state = next(iter(b.items()))
+            if state[2] > now and len(b) <= self.max_keys:
+                break
+            b.popitem(last=False)
+
+    async def take(self, buckets: Sequence[Bucket], now: Optional[float] = None) -> float:
+        """0 when a token was taken from every bucket, else seconds until there will be one."""
+        now = time.monotonic() if now is None else now
+        b = self._buckets
+        levels: list[float] = []
+        wait = 0.0
+        for key, cap, rate in buckets:
+            state = b.get(key)
+            tokens = cap if state is None else min(cap, state[0] + (now - state[1]) * rate)
+            levels.append(tokens)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate)
+        if wait > 0:
+            return wait
+        for (key, cap, rate), tokens in zip(buckets, levels):
+            tokens -= 1
+            b[key] = [tokens, now, now + (cap - tokens) / rate]
+            b.move_to_end(key)
+        self._evict(now)
+        return 0.0
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+
+# same all-or-nothing semantics as MemoryBackend.take; times are ms on the
+# caller's wall clock, values are returned as strings (Lua numbers truncate)
+_TAKE_LUA = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i = 1, #KEYS do
+  local cap = tonumber(ARGV[2 * i])
+  local rate = tonumber(ARGV[2 * i + 1])
+  local v = redis.call('HMGET', KEYS[i], 't', 'ts')
+  local tokens = cap
+  if v[1] then
+    tokens = math.min(cap, tonumber(v[1]) + math.max(0, now - tonumber(v[2])) * rate)
+  end
+  levels[i] = tokens
+  if tokens < 1 then
+    wait = math.max(wait, (1 - tokens) / rate)
+  end
+end
+if wait > 0 then
+  return tostring(wait)
+end
+for i = 1, #KEYS do
+  local cap = tonumber(ARGV[2 * i])
+  local rate = tonumber(ARGV[2 * i + 1])
+  local tokens = levels[i] - 1
+  redis.call('HSET', KEYS[i], 't', tostring(tokens), 'ts', tostring(now))
+  redis.call('PEXPIRE', KEYS[i], math.ceil((cap - tokens) / rate) + 1000)
+end
+return '0'
+"""
+
+
+class RedisError(Exception):
+    pass
+
+
+class _RespConnection:
+    """One RESP2 connection; requests on it are serialised by the pool."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def _encode(args: Sequence[Any]) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            b = a if isinstance(a, bytes) else str(a).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+        return b"".join(out)
+
+    async def _read(self) -> Any:
+        line = await self.reader.readuntil(b"\r\n")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(body.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            n = int(body)
+            if n < 0:
+                return None
+            data = await self.reader.readexactly(n + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            n = int(body)
+            return None if n < 0 else [await self._read() for _ in range(n)]
+        raise ConnectionError(f"unexpected RESP reply {line[:32]!r}")
+
+    async def command(self, *args: Any) -> Any:
+        self.writer.write(self._encode(args))
+        await self.writer.drain()
+        return await self._read()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class RedisBackend:
+    def __init__(self, url: str, pool_size: int, timeout: float, fallback: MemoryBackend) -> None:
+        u = urlparse(url)
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 6379
+        self.username = unquote(u.username) if u.username else None
+        self.password = unquote(u.password) if u.password else None
+        self.db = int((u.path or "/0").lstrip("/") or 0)
+        self.timeout = timeout
+        self.fallback = fallback
+        self._sem = asyncio.Semaphore(pool_size)
+        self._idle: list[_RespConnection] = []
+        self._sha: Optional[str] = None
+        self._down_until = 0.0
+
+    async def _connect(self) -> _RespConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        conn = _RespConnection(reader, writer)
+        try:
+            if self.password:
+                auth = (self.username, self.password) if self.username else (self.password,)
+                await conn.command("AUTH", *auth)
+            if self.db:
+                await conn.command("SELECT", self.db)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    async def _eval(self, conn: _RespConnection, keys: list[str], argv: list[Any]) -> Any:
+        if self._sha is not None:
+            try:
+                return await conn.command("EVALSHA", self._sha, len(keys), *keys, *argv)
+            except RedisError as e:
+                if not str(e).startswith("NOSCRIPT"):
+                    raise
+        self._sha = await conn.command("SCRIPT", "LOAD", _TAKE_LUA)
+        return await conn.command("EVALSHA", self._sha, len(keys), *keys, *argv)
+
+    async def _take(self, buckets: Sequence[Bucket]) -> float:
+        keys = [f"rl:{key}" for key, _, _ in buckets]
+        argv: list[Any] = [int(time.time() * 1000)]
+        for _, cap, rate in buckets:
+            argv += [cap, rate / 1000.0]
+        async with self._sem:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            try:
+                reply = await self._eval(conn, keys, argv)
+            except RedisError:
+                self._idle.append(conn)   # server answered; the connection is fine
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            self._idle.append(conn)
+        return float(reply) / 1000.0
+
+    async def take(self, buckets: Sequence[Bucket]) -> float:
+        if time.monotonic() < self._down_until:
+            return await self.fallback.take(buckets)
+        try:
+            return await asyncio.wait_for(self._take(buckets), self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RedisError, ValueError) as e:
+            logger.warning("rate limit redis unavailable ({}); using in-process buckets", e)
+            self._down_until = time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY
+            return await self.fallback.take(buckets)
+
+    async def close(self) -> None:
+        for conn in self._idle:
+            conn.close()
+        self._idle.clear()
+
+
+def make_backend() -> MemoryBackend | RedisBackend:
+    memory = MemoryBackend(settings.RATE_LIMIT_MAX_KEYS)
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisBackend(
+            settings.RATE_LIMIT_REDIS_URL,
+            settings.RATE_LIMIT_REDIS_POOL,
+            settings.RATE_LIMIT_REDIS_TIMEOUT,
+            memory,
+        )
+    return memory
+
+
+rate_limit_backend = make_backend()
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+def _bearer(headers: Headers) -> Optional[str]:
+    auth = headers.get("authorization", "")
+    if auth[:7].lower() == "bearer ":
+        return auth[7:].strip() or None
+    return None
+
+
+def _user_key(headers: Headers, token: Optional[str]) -> Optional[str]:
+    if token:
+        # the token is unverified here: key on the whole token, never on its claims
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+    if settings.DEV_ALLOW_UNVERIFIED:
+        # dev only, where the auth dependency trusts this header as well
+        dev = headers.get("x-dev-user-id")
+        return f"dev:{dev}" if dev else None
+    return None
+
+
+def _client_ip(scope: Scope, headers: Headers) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        fwd = headers.get("x-forwarded-for")
+        if fwd:
+            return fwd.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "-"
+
+
+class RateLimitMiddleware:
+    """429 + Retry-After once any bucket of the request is empty."""
+
+    def __init__(self, app: ASGIApp, prefix: str = "", rules: str = "", auth: str = "", backend: Any = None) -> None:
+        self.app = app
+        self.prefix = prefix.rstrip("/")
+        self.rules = parse_rules(rules)
+        self.auth = parse_auth_rule(auth)
+        self.backend = backend if backend is not None else rate_limit_backend
+
+    def buckets(self, scope: Scope) -> list[Bucket]:
+        path: str = scope["path"]
+        if self.prefix:
+            if path != self.prefix and not path.startswith(self.prefix + "/"):
+                return []
+            path = path[len(self.prefix):] or "/"
+        method = scope["method"]
+        rules = [r for r in self.rules if r.matches(method, path)]
+        headers = Headers(scope=scope)
+        token = _bearer(headers)
+        if token and self.auth is not None:
+            rules.append(self.auth)
+        if not rules:
+            return []
+
+        user = _user_key(headers, token)
+        ip = _client_ip(scope, headers)
+        out: list[Bucket] = []
+        for r in rules:
+            if r.user and user:
+                out.append((f"u:{user}:{r.name}", r.user.capacity, r.user.rate))
+            if r.ip:
+                out.append((f"i:{ip}:{r.name}", r.ip.capacity, r.ip.rate))
+        return out
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        buckets = self.buckets(scope)
+        wait = await self.backend.take(buckets) if buckets else 0.0
+        if wait <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        retry = max(1, math.ceil(wait))
+        body = orjson.dumps({"detail": "Too many requests", "retry_after": retry})
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(retry).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,5 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Any, List, Optional
+from uuid import UUID
+
+MAX_BATCH_IDS = 300
 
 class Msg(BaseModel):
     message: str
@@ -7,3 +10,10 @@ class Msg(BaseModel):
 class Paginated(BaseModel):
     items: list[Any]
     total: int
+
+class BatchIds(BaseModel):
+    ids: list[UUID] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+
+    def keys(self) -> list[str]:
+        # de-duplicated, order preserved
+        return list(dict.fromkeys(str(i) for i in self.ids))
@@ -1,7 +1,18 @@
-from pydantic import BaseModel
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from .common import BatchIds
 
 class ReportCreate(BaseModel):
     entity: str
     entity_id: str
     reason: str | None = None
     severity: int = 1
+
+class ModerationClaim(BaseModel):
+    n: int = Field(1, ge=1, le=20)
+
+class ModerationResolve(BatchIds):
+    resolution: Literal["dismissed", "actioned"]
+    note: Optional[str] = None
@@ -0,0 +1,230 @@
+# app/services/calendar.py
+"""
+iCalendar (RFC 5545) subscription feeds.
+
+  - user feed : the user's scheduled engagements (either side) + events they are
+                going to; the URL carries an HMAC token instead of a bearer
+                header, which calendar clients can't send
+  - offer feed: an offer's upcoming open slots (public)
+
+Rows are streamed from a server-side cursor straight into the rendered body;
+the rendered feed, its ETag and Last-Modified are cached per feed for
+CALENDAR_CACHE_TTL. Writers call `invalidate_user_feed` / `invalidate_offer_feed`
+after commit (other workers converge within the TTL), and concurrent misses for
+one feed share a single render. Last-Modified only moves when the body does.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..middleware.etag import body_etag
+from ..utils.cache import TTLCache
+
+PRODID = "-//BenefiSocial//Calendar//EN"
+UID_DOMAIN = "benefisocial"
+
+_feeds: TTLCache[dict] = TTLCache(maxsize=settings.CALENDAR_CACHE_SIZE, ttl=settings.CALENDAR_CACHE_TTL)
+_inflight: dict[tuple[str, str], asyncio.Future] = {}
+
+
+# ---------------------------------------------------------------------------
+# Feed tokens
+# ---------------------------------------------------------------------------
+
+def feed_token(user_id: str) -> Optional[str]:
+    """None when CALENDAR_FEED_SECRET is unset (user feeds disabled)."""
+    if not settings.CALENDAR_FEED_SECRET:
+        return None
+    mac = hmac.new(settings.CALENDAR_FEED_SECRET.encode("utf-8"), f"cal:{user_id}".encode("utf-8"), hashlib.sha256)
+    return base64.urlsafe_b64encode(mac.digest()[:18]).decode("ascii")
+
+
+def check_feed_token(user_id: str, token: str) -> bool:
+    expected = feed_token(user_id)
+    return expected is not None and hmac.compare_digest(expected, token or "")
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+def _escape(value: Any) -> str:
+    s = "" if value is None else str(value)
+    return (s.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+             .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """Lines over 75 octets continue on the next line after a space."""
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line + "\r\n"
+    out, chunk, size = [], [], 0
+    for ch in line:
+        n = len(ch.encode("utf-8"))
+        if size + n > (75 if not out else 74):
+            out.append("".join(chunk))
+            chunk, size = [], 0
+        chunk.append(ch)
+        size += n
+    out.append("".join(chunk))
+    return "\r\n ".join(out) + "\r\n"
+
+
+def _ts(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def vevent(
+    uid: str, start: datetime, end: Optional[datetime], summary: str, *,
+    stamp: Optional[datetime] = None, description: Optional[str] = None,
+    location: Optional[str] = None, status: str = "CONFIRMED",
+) -> str:
+    end = end or start + timedelta(minutes=settings.CALENDAR_DEFAULT_MINUTES)
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@{UID_DOMAIN}",
+        f"DTSTAMP:{_ts(stamp or start)}",
+        f"DTSTART:{_ts(start)}",
+        f"DTEND:{_ts(end)}",
+        f"SUMMARY:{_escape(summary)}",
+    ]
+    if description:
+        lines.append(f"DESCRIPTION:{_escape(description)}")
+    if location:
+        lines.append(f"LOCATION:{_escape(location)}")
+    lines += [f"STATUS:{status}", "END:VEVENT"]
+    return "".join(_fold(x) for x in lines)
+
+
+def _calendar(name: str, events: Iterable[str]) -> bytes:
+    head = "".join(_fold(x) for x in (
+        "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH", f"X-WR-CALNAME:{_escape(name)}",
+    ))
+    return (head + "".join(events) + _fold("END:VCALENDAR")).encode("utf-8")
+
+
+_USER_SQL = """
+    select 'engagement' as kind, e.id, e.scheduled_at as start_at, s.end_at,
+           o.title, e.practitioner_id = cast(:uid as uuid) as hosting, null::text as location,
+           e.updated_at
+      from public.engagements e
+      join public.offer_requests r on r.id = e.request_id
+      join public.offers o on o.id = r.offer_id
+      left join public.offer_slots s on s.id = e.slot_id
+     where (e.practitioner_id = cast(:uid as uuid) or e.requester_id = cast(:uid as uuid))
+       and e.state = 'scheduled'
+       and e.scheduled_at >= now() - make_interval(days => :past)
+    union all
+    select 'event', ev.id, ev.starts_at, ev.ends_at,
+           ev.title, ev.host_id = cast(:uid as uuid), ev.location, ev.updated_at
+      from public.event_enrollments x
+      join public.events ev on ev.id = x.event_id
+     where x.user_id = cast(:uid as uuid)
+       and coalesce(x.status, 'going') = 'going'
+       and ev.starts_at >= now() - make_interval(days => :past)
+    order by 3
+"""
+
+_OFFER_SQL = """
+    select s.id, s.start_at, s.end_at, s.capacity - s.reserved as free, s.note, s.updated_at, o.title
+      from public.offer_slots s
+      join public.offers o on o.id = s.offer_id
+     where s.offer_id = cast(:oid as uuid)
+       and s.status = 'open'
+       and s.start_at >= now()
+     order by s.start_at
+"""
+
+
+async def _render_user(db: AsyncSession, user_id: str) -> bytes:
+    result = await db.stream(text(_USER_SQL), {"uid": user_id, "past": settings.CALENDAR_PAST_DAYS})
+    events: list[str] = []
+    async for r in result:
+        if r.kind == "engagement":
+            summary = f"{r.title} ({'session' if r.hosting else 'appointment'})"
+        else:
+            summary = r.title
+        events.append(vevent(f"{r.kind}-{r.id}", r.start_at, r.end_at, summary,
+                             stamp=r.updated_at, location=r.location))
+    return _calendar("BenefiSocial", events)
+
+
+async def _render_offer(db: AsyncSession, offer_id: str) -> bytes:
+    result = await db.stream(text(_OFFER_SQL), {"oid": offer_id})
+    events: list[str] = []
+    title = "Offer"
+    async for r in result:
+        title = r.title
+        desc = f"{r.free} place(s) left" + (f"\n{r.note}" if r.note else "")
+        events.append(vevent(f"slot-{r.id}", r.start_at, r.end_at, f"Open: {r.title}",
+                             stamp=r.updated_at, description=desc, status="TENTATIVE"))
+    return _calendar(title, events)
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+async def _cached(key: tuple[str, str], render: Callable[[], Awaitable[bytes]]) -> dict:
+    hit = _feeds.get(key)
+    if hit is not None and not hit.get("stale"):
+        return hit
+    fut = _inflight.get(key)
+    if fut is not None:
+        return await asyncio.shield(fut)
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
+    try:
+        body = await render()
+        etag = body_etag(body)
+        if hit is not None and hit["etag"] == etag:
+            last_modified = hit["last_modified"]
+        else:
+            last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        entry = {"body": body, "etag": etag, "last_modified": last_modified}
+        _feeds.set(key, entry)
+        fut.set_result(entry)
+        return entry
+    except BaseException as e:
+        fut.set_exception(e)
+        fut.exception()   # consumed here; waiters re-raise it
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+def _invalidate(key: tuple[str, str]) -> None:
+    # keep the old entry (marked stale) so an identical re-render keeps Last-Modified
+    hit = _feeds.get(key)
+    if hit is not None:
+        _feeds.set(key, {**hit, "stale": True})
+
+
+async def user_feed(db: AsyncSession, user_id: str) -> dict:
+    return await _cached(("user", str(user_id)), lambda: _render_user(db, str(user_id)))
+
+
+async def offer_feed(db: AsyncSession, offer_id: str) -> dict:
+    return await _cached(("offer", str(offer_id)), lambda: _render_offer(db, str(offer_id)))
+
+
+def invalidate_user_feed(*user_ids: Any) -> None:
+    for uid in user_ids:
+        if uid:
+            _invalidate(("user", str(uid)))
+
+
+def invalidate_offer_feed(offer_id: Any) -> None:
+    if offer_id:
+        _invalidate(("offer", str(offer_id)))
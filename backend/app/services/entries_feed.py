@@ -0,0 +1,129 @@
+# app/services/entries_feed.py
+"""
+Community entries feed.
+
+Pages are keyset on (created_at desc, id desc) over public entries. Each worker
+keeps the newest ENTRIES_HEAD_SIZE of them, author summaries already attached,
+in `entries_head`:
+
+  - create_entry pushes the new row in after commit, so the author sees it at
+    once; other workers pick it up when their copy is older than
+    ENTRIES_HEAD_TTL and gets reloaded (one query, single-flight)
+  - any page that lies inside the head is cut from memory; the request's
+    session never checks out a connection
+
+Anonymous entries are never hydrated; `public_entry` drops author_id unless
+the viewer wrote the entry.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..utils.dbhelpers import row_to_dict
+from .profiles import attach_profiles
+
+_AUTHOR = {"author_id": {
+    "username": "author_username",
+    "display_name": "author_display_name",
+    "avatar_url": "author_avatar_url",
+}}
+
+_SELECT = """
+    select e.id, e.author_id, e.body, e.images, e.anonymous, e.created_at
+      from public.entries e
+     where e.visibility = 'public' {after}
+  order by e.created_at desc, e.id desc
+     limit :lim
+"""
+
+
+async def hydrate(db: AsyncSession, rows: list[dict]) -> list[dict]:
+    """Attach author summaries to the non-anonymous rows; blanks for the rest."""
+    for r in rows:
+        for key in _AUTHOR["author_id"].values():
+            r[key] = None
+    await attach_profiles(db, [r for r in rows if not r.get("anonymous")], _AUTHOR)
+    return rows
+
+
+async def fetch_entries(db: AsyncSession, n: int, after: Optional[tuple[datetime, str]] = None) -> list[dict]:
+    args: dict[str, Any] = {"lim": n}
+    cond = ""
+    if after:
+        cond = "and (e.created_at, e.id) < (:c_ts, cast(:c_id as uuid))"
+        args.update({"c_ts": after[0], "c_id": after[1]})
+    res = await db.execute(text(_SELECT.format(after=cond)), args)
+    return await hydrate(db, [row_to_dict(r) for r in res.fetchall()])
+
+
+def public_entry(row: dict, viewer: Optional[str]) -> dict:
+    out = dict(row)
+    mine = viewer is not None and str(row.get("author_id")) == str(viewer)
+    if out.get("anonymous") and not mine:
+        out["author_id"] = None
+    out["is_mine"] = mine
+    return out
+
+
+def _key(row: dict) -> tuple[datetime, str]:
+    return row["created_at"], str(row["id"])
+
+
+class EntryHead:
+    """Newest public entries, newest first."""
+
+    def __init__(self, size: int, ttl: float) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.items: list[dict] = []
+        self.complete = False          # the head holds every public entry
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def load(self, db: AsyncSession) -> list[dict]:
+        if self.fresh():
+            return self.items
+        async with self._lock:
+            if not self.fresh():
+                items = await fetch_entries(db, self.size)
+                self.items, self.complete = items, len(items) < self.size
+                self._loaded_at = time.monotonic()
+        return self.items
+
+    def push(self, row: dict) -> None:
+        """Prepend a committed entry (no-op until the head has been loaded)."""
+        if self._loaded_at is None or any(str(r["id"]) == str(row["id"]) for r in self.items):
+            return
+        items = [row, *self.items]
+        items.sort(key=_key, reverse=True)
+        if len(items) > self.size:
+            items, self.complete = items[: self.size], False
+        self.items = items
+
+    def slice(self, after: Optional[tuple[datetime, str]], n: int) -> Optional[list[dict]]:
+        """
+        Up to `n` rows following `after` (or from the top) when the head can
+        answer on its own, else None: the rows run past the head's end.
+        """
+        items = self.items
+        start = 0
+        if after:
+            while start < len(items) and _key(items[start]) >= after:
+                start += 1
+        rows = items[start: start + n]
+        if len(rows) == n or self.complete:
+            return rows
+        return None
+
+
+entries_head = EntryHead(settings.ENTRIES_HEAD_SIZE, settings.ENTRIES_HEAD_TTL)
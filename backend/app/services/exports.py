@@ -0,0 +1,88 @@
+# app/services/exports.py
+"""
+Streaming exports (NDJSON / CSV).
+
+Rows come from a server-side cursor (`AsyncConnection.stream`, which asyncpg
+serves with a portal inside a read-only transaction) in EXPORT_CHUNK_ROWS
+partitions and are encoded chunk by chunk, so worker memory stays flat however
+many rows match.
+
+The export opens its own connection: FastAPI closes `get_db` sessions before
+a StreamingResponse body is sent. Routes still do their auth/ownership checks
+with the request session first and only hand a finished query to `export_response`.
+"""
+from __future__ import annotations
+
+import csv
+import io
+from decimal import Decimal
+from typing import Any, AsyncIterator, Literal, Mapping
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+
+from ..core.config import settings
+from ..db.session import engine
+
+ExportFormat = Literal["ndjson", "csv"]
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _default(v: Any) -> Any:
+    if isinstance(v, Decimal):
+        return float(v)
+    return str(v)
+
+
+def _csv_value(v: Any) -> Any:
+    if v is None:
+        return ""
+    if isinstance(v, (list, dict)):
+        return orjson.dumps(v, default=_default).decode("utf-8")
+    if hasattr(v, "isoformat"):
+        return v.isoformat()
+    return v
+
+
+async def _partitions(sql: str, params: Mapping[str, Any]) -> AsyncIterator[tuple[list[str], list[Any]]]:
+    async with engine.connect() as conn:
+        await conn.execute(text("set transaction read only"))
+        result = await conn.stream(text(sql), dict(params))
+        keys = list(result.keys())
+        empty = True
+        async for rows in result.partitions(settings.EXPORT_CHUNK_ROWS):
+            empty = False
+            yield keys, rows
+        if empty:
+            yield keys, []
+
+
+async def _ndjson(sql: str, params: Mapping[str, Any]) -> AsyncIterator[bytes]:
+    async for keys, rows in _partitions(sql, params):
+        if rows:
+            yield b"".join(
+                orjson.dumps(dict(zip(keys, r)), default=_default) + b"\n" for r in rows
+            )
+
+
+async def _csv(sql: str, params: Mapping[str, Any]) -> AsyncIterator[bytes]:
+    header_sent = False
+    async for keys, rows in _partitions(sql, params):
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        if not header_sent:
+            w.writerow(keys)
+            header_sent = True
+        w.writerows([_csv_value(v) for v in r] for r in rows)
+        yield buf.getvalue().encode("utf-8")
+
+
+def export_response(sql: str, params: Mapping[str, Any], fmt: ExportFormat, filename: str) -> StreamingResponse:
+    body = _ndjson(sql, params) if fmt == "ndjson" else _csv(sql, params)
+    return StreamingResponse(
+        body,
+        media_type=_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,150 @@
+# app/services/inference.py
+"""
+Pluggable answer generation for /psm/ai/answer.
+
+- `InferenceBackend` is the interface: `stream(prompt)` yields text chunks.
+- `TemplateBackend` is the local stand-in (no model; grounded template text).
+- `OpenAICompatBackend` streams from any OpenAI-compatible /v1/completions
+  server (llama.cpp, vLLM, Ollama, ...).
+- `AnswerService` adds a normalized-question cache and a bounded number of
+  concurrent inference slots in front of whichever backend is configured.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import AsyncIterator, Optional, Protocol
+
+import httpx
+import orjson
+
+from ..core.config import settings
+from ..utils.cache import TTLCache
+from .retrieval import analyze
+
+DISCLAIMER = (
+    "AI (beta): This is general information, not professional advice. "
+    "For sensitive cases, please connect with verified organizations below."
+)
+
+
+class InferenceBackend(Protocol):
+    name: str
+
+    def stream(self, prompt: str, *, max_tokens: int) -> AsyncIterator[str]:
+        ...
+
+
+class TemplateBackend:
+    """Stand-in model: deterministic, grounded in the retrieved source titles."""
+
+    name = "template"
+
+    def __init__(self, source_titles: Optional[list[str]] = None) -> None:
+        self.source_titles = source_titles or []
+
+    async def stream(self, prompt: str, *, max_tokens: int) -> AsyncIterator[str]:
+        parts = [DISCLAIMER]
+        titles = [t for t in self.source_titles if t]
+        if titles:
+            parts.append("Related material from our community: " + "; ".join(titles) + ".")
+        words = " ".join(parts).split(" ")
+        for i, w in enumerate(words[:max_tokens]):
+            yield w if i == 0 else " " + w
+            await asyncio.sleep(0)
+
+
+class OpenAICompatBackend:
+    name = "openai_compat"
+
+    def __init__(self, base_url: str, model: str, timeout: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+
+    async def stream(self, prompt: str, *, max_tokens: int) -> AsyncIterator[str]:
+        body = {"model": self.model, "prompt": prompt, "max_tokens": max_tokens, "stream": True}
+        async with httpx.AsyncClient(timeout=self.timeout) as c:
+            async with c.stream("POST", f"{self.base_url}/v1/completions", json=body) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = orjson.loads(data)
+                    piece = (chunk.get("choices") or [{}])[0].get("text") or ""
+                    if piece:
+                        yield piece
+
+
+def build_prompt(question: str, sources: list[dict]) -> str:
+    lines = [
+        "You are a cautious community assistant. Give general information only,",
+        "never professional advice, and point to the sources below when relevant.",
+        "",
+        "Sources:",
+    ]
+    for i, s in enumerate(sources, 1):
+        lines.append(f"[{i}] {s.get('title') or ''}")
+    lines += ["", f"Question: {question}", "Answer:"]
+    return "\n".join(lines)
+
+
+def question_key(question: str, topic: str, lang: Optional[str]) -> str:
+    """Normalized cache key: analyzed term set, so casing/order/stopwords/suffixes don't matter."""
+    terms = sorted(set(analyze(question, lang)))
+    raw = f"{topic}|{lang or '*'}|{' '.join(terms)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SlotsBusy(Exception):
+    pass
+
+
+class AnswerService:
+    def __init__(self) -> None:
+        self.cache: TTLCache[str] = TTLCache(maxsize=settings.AI_CACHE_SIZE, ttl=settings.AI_CACHE_TTL)
+        self.slots = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+
+    def backend_for(self, sources: list[dict]) -> InferenceBackend:
+        if settings.AI_BACKEND == "openai_compat" and settings.AI_BASE_URL:
+            return OpenAICompatBackend(settings.AI_BASE_URL, settings.AI_MODEL, settings.AI_TIMEOUT)
+        return TemplateBackend([s.get("title") for s in sources])
+
+    async def acquire(self) -> None:
+        """Take an inference slot or raise SlotsBusy after AI_QUEUE_TIMEOUT seconds."""
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=settings.AI_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise SlotsBusy()
+
+    def release(self) -> None:
+        self.slots.release()
+
+    async def stream(self, key: str, question: str, sources: list[dict]) -> AsyncIterator[str]:
+        """
+        Yields answer chunks. Caller must hold a slot (acquire/release).
+        The full answer is cached only if the stream ran to completion.
+        """
+        backend = self.backend_for(sources)
+        prompt = build_prompt(question, sources)
+        out: list[str] = []
+        async for piece in backend.stream(prompt, max_tokens=settings.AI_MAX_TOKENS):
+            out.append(piece)
+            yield piece
+        self.cache.set(key, "".join(out))
+
+    async def complete(self, key: str, question: str, sources: list[dict]) -> str:
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        await self.acquire()
+        try:
+            return "".join([p async for p in self.stream(key, question, sources)])
+        finally:
+            self.release()
+
+
+answer_service = AnswerService()
@@ -0,0 +1,214 @@
+# app/services/moderation.py
+"""
+Moderation queue.
+
+Reports on the same entity fold into one `moderation_items` row (migrations/015)
+in the report's transaction, so queue size tracks reported entities, not
+reports, and a spam wave against one post is one row getting hotter:
+
+    reporter weight = 1 + ln(1 + clamp(reputation, 0, 10000) / 100)
+    priority        = 2 * max severity + 3 * ln(1 + sum of weights)
+
+(a reporter counts once per item). Moderators claim the top of the open
+partial index with FOR UPDATE SKIP LOCKED, so concurrent claims never wait on
+each other; a claim is a lease (MODERATION_LEASE_SECONDS) and expired leases
+go back to open on the next claim. Resolve/release act on the caller's own
+claims in one statement each. Callers commit.
+"""
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..utils.dbhelpers import row_to_dict
+
+W_SEVERITY = 2.0
+W_REPORTERS = 3.0
+REQUEUE_BATCH = 100
+RECENT_REPORTS = 5
+
+_WEIGHT_SQL = "1 + ln(1 + least(greatest(coalesce(p.reputation, 0), 0), 10000) / 100.0)"
+
+_ITEM_COLUMNS = """m.id, m.entity, m.entity_id, m.state, m.report_count, m.severity_max,
+                   m.priority, m.first_reported_at, m.last_reported_at, m.claimed_by, m.lease_until"""
+
+# `fresh` is 0 when the reporter already reported this (live) item, so the
+# excluded row carries the deltas: report_count 0/1, reporter_weight 0/weight.
+# :sev is one bind parameter used twice -- cast at both uses so Postgres
+# deduces a single type for it
+_UPSERT_ITEM_SQL = f"""
+    with rep as (
+      select coalesce(max({_WEIGHT_SQL}), 1) as weight,
+             case when exists (
+               select 1
+                 from public.moderation_items mi
+                 join public.reports r on r.item_id = mi.id
+                where mi.entity = cast(:entity as text)
+                  and mi.entity_id = cast(:eid as uuid)
+                  and mi.state <> 'resolved'
+                  and r.reporter_id = cast(:uid as uuid)
+             ) then 0 else 1 end as fresh
+        from public.profiles p
+       where p.id = cast(:uid as uuid)
+    )
+    insert into public.moderation_items as m
+      (entity, entity_id, report_count, severity_max, reporter_weight, priority)
+    select cast(:entity as text), cast(:eid as uuid), rep.fresh, cast(:sev as integer), rep.fresh * rep.weight,
+           {W_SEVERITY} * cast(:sev as integer) + {W_REPORTERS} * ln(1 + rep.fresh * rep.weight)
+      from rep
+    on conflict (entity, entity_id) where state <> 'resolved' do update
+       set report_count     = m.report_count + excluded.report_count,
+           reporter_weight  = m.reporter_weight + excluded.reporter_weight,
+           severity_max     = greatest(m.severity_max, excluded.severity_max),
+           priority         = {W_SEVERITY} * greatest(m.severity_max, excluded.severity_max)
+                              + {W_REPORTERS} * ln(1 + m.reporter_weight + excluded.reporter_weight),
+           last_reported_at = now()
+    returning m.id
+"""
+
+
+async def file_report(
+    db: AsyncSession, reporter_id: str, entity: str, entity_id: str,
+    reason: Optional[str], severity: int,
+) -> str:
+    sev = max(1, min(int(severity or 1), 5))
+    item = await db.execute(
+        text(_UPSERT_ITEM_SQL), {"uid": reporter_id, "entity": entity, "eid": entity_id, "sev": sev}
+    )
+    item_id = item.scalar()
+    r = await db.execute(
+        text("""
+          insert into public.reports (reporter_id, entity, entity_id, reason, severity, item_id)
+          values (:uid, :entity, :eid, :reason, :severity, :item) returning id
+        """),
+        {"uid": reporter_id, "entity": entity, "eid": entity_id, "reason": reason, "severity": sev, "item": item_id},
+    )
+    return str(r.scalar())
+
+
+async def claim(db: AsyncSession, moderator_id: str, n: int) -> list[dict]:
+    # expired leases back to open (only the expired rows are touched)
+    await db.execute(
+        text("""
+          update public.moderation_items m
+             set state = 'open', claimed_by = null, lease_until = null
+            from (
+              select id from public.moderation_items
+               where state = 'claimed' and lease_until < now()
+               order by lease_until
+               limit :batch
+                 for update skip locked
+            ) x
+           where m.id = x.id
+        """),
+        {"batch": REQUEUE_BATCH},
+    )
+    res = await db.execute(
+        text(f"""
+          with picked as (
+            select id from public.moderation_items
+             where state = 'open'
+             order by priority desc, first_reported_at, id
+             limit :n
+               for update skip locked
+          )
+          update public.moderation_items m
+             set state = 'claimed',
+                 claimed_by = cast(:uid as uuid),
+                 lease_until = now() + make_interval(secs => :lease)
+            from picked
+           where m.id = picked.id
+          returning {_ITEM_COLUMNS}
+        """),
+        {"uid": moderator_id, "n": n, "lease": settings.MODERATION_LEASE_SECONDS},
+    )
+    items = sorted((row_to_dict(r) for r in res.fetchall()), key=lambda d: -d["priority"])
+    if items:
+        recent = await db.execute(
+            text("""
+              select x.item_id, x.id, x.reporter_id, x.reason, x.severity, x.created_at
+                from unnest(cast(:ids as uuid[])) as i(id)
+                cross join lateral (
+                  select r.item_id, r.id, r.reporter_id, r.reason, r.severity, r.created_at
+                    from public.reports r
+                   where r.item_id = i.id
+                   order by r.created_at desc
+                   limit :k
+                ) x
+            """),
+            {"ids": [str(i["id"]) for i in items], "k": RECENT_REPORTS},
+        )
+        by_item: dict[str, list[dict]] = {}
+        for r in recent.fetchall():
+            d = row_to_dict(r)
+            by_item.setdefault(str(d.pop("item_id")), []).append(d)
+        for i in items:
+            i["reports"] = by_item.get(str(i["id"]), [])
+    return items
+
+
+async def resolve(
+    db: AsyncSession, moderator_id: str, ids: Sequence[str], resolution: str, note: Optional[str],
+) -> list[str]:
+    """Resolve the caller's claimed items (and their reports); returns the ids resolved."""
+    res = await db.execute(
+        text("""
+          with done as (
+            update public.moderation_items m
+               set state = 'resolved', resolution = :res, note = :note,
+                   resolved_by = cast(:uid as uuid), resolved_at = now(), lease_until = null
+             where m.id = any(cast(:ids as uuid[]))
+               and m.state = 'claimed'
+               and m.claimed_by = cast(:uid as uuid)
+            returning m.id
+          ),
+          reps as (
+            update public.reports r
+               set state = 'resolved', updated_at = now()
+              from done
+             where r.item_id = done.id
+          )
+          select id from done
+        """),
+        {"uid": moderator_id, "ids": list(ids), "res": resolution, "note": note},
+    )
+    return [str(r[0]) for r in res.fetchall()]
+
+
+async def release(db: AsyncSession, moderator_id: str, ids: Sequence[str]) -> list[str]:
+    """Hand the caller's claimed items back to the queue."""
+    res = await db.execute(
+        text("""
+          update public.moderation_items
+             set state = 'open', claimed_by = null, lease_until = null
+           where id = any(cast(:ids as uuid[]))
+             and state = 'claimed'
+             and claimed_by = cast(:uid as uuid)
+          returning id
+        """),
+        {"uid": moderator_id, "ids": list(ids)},
+    )
+    return [str(r[0]) for r in res.fetchall()]
+
+
+async def peek(db: AsyncSession, limit: int, after: Optional[tuple[float, object, str]] = None) -> list[dict]:
+    """Open items in claim order, without claiming."""
+    cond, args = "", {"lim": limit}
+    if after:
+        cond = """and (m.priority < :c_p
+                   or (m.priority = :c_p and (m.first_reported_at, m.id) > (:c_ts, cast(:c_id as uuid))))"""
+        args.update({"c_p": after[0], "c_ts": after[1], "c_id": after[2]})
+    res = await db.execute(
+        text(f"""
+          select {_ITEM_COLUMNS}
+            from public.moderation_items m
+           where m.state = 'open' {cond}
+        order by m.priority desc, m.first_reported_at, m.id
+           limit :lim
+        """),
+        args,
+    )
+    return [row_to_dict(r) for r in res.fetchall()]
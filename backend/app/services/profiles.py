@@ -0,0 +1,121 @@
+# app/services/profiles.py
+"""
+Profile lookups shared by several routers.
+
+- `resolve_profile_id`: UUID keys hit the primary key, anything else the
+  unique username index (never `id::text = :key or username = :key`).
+- `add_review_stars`: keeps public.practitioner_stats in step with
+  offer_reviews. Call it inside the writer's transaction, before commit
+  (completions are counted by the `complete` transition itself, see
+  services/transitions.py). Profile stars come from engagement reviews only;
+  offer ratings posted through POST /ratings are still stored but no longer
+  feed the profile summary.
+- `attach_profiles`: dataloader for username / display_name / avatar_url.
+  One `id = any(:ids)` query per page for cache misses, LRU for the rest;
+  `invalidate_profile` drops an entry after the owner edits it (other
+  workers converge within PROFILE_CACHE_TTL).
+"""
+from __future__ import annotations
+
+import uuid
+from typing import Any, Iterable, Mapping, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..utils.cache import TTLCache
+
+
+def as_uuid(key: str) -> Optional[str]:
+    try:
+        return str(uuid.UUID(str(key)))
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+async def resolve_profile_id(db: AsyncSession, key: str) -> Optional[str]:
+    uid = as_uuid(key)
+    if uid:
+        res = await db.execute(
+            text("select id from public.profiles where id = cast(:id as uuid)"), {"id": uid}
+        )
+    else:
+        res = await db.execute(
+            text("select id from public.profiles where username = :u"), {"u": key}
+        )
+    pid = res.scalar()
+    return str(pid) if pid else None
+
+
+async def add_review_stars(db: AsyncSession, practitioner_id: str, stars: int) -> None:
+    await db.execute(
+        text("""
+          insert into public.practitioner_stats (practitioner_id, ratings_count, stars_sum)
+          values (cast(:pid as uuid), 1, :s)
+          on conflict (practitioner_id) do update
+             set ratings_count = public.practitioner_stats.ratings_count + 1,
+                 stars_sum     = public.practitioner_stats.stars_sum + :s,
+                 updated_at    = now()
+        """),
+        {"pid": str(practitioner_id), "s": int(stars)},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Profile summary loader
+# ---------------------------------------------------------------------------
+
+_summaries: TTLCache[dict] = TTLCache(maxsize=settings.PROFILE_CACHE_SIZE, ttl=settings.PROFILE_CACHE_TTL)
+
+
+def invalidate_profile(user_id: str) -> None:
+    _summaries.pop(str(user_id))
+
+
+async def load_profile_summaries(db: AsyncSession, ids: Iterable[Any]) -> dict[str, dict]:
+    """{id: {username, display_name, avatar_url}} for every id that exists."""
+    wanted = {str(i) for i in ids if i}
+    out: dict[str, dict] = {}
+    missing: list[str] = []
+    for i in wanted:
+        hit = _summaries.get(i)
+        if hit is None:
+            missing.append(i)
+        else:
+            out[i] = hit
+    if missing:
+        res = await db.execute(
+            text("""
+              select id, username, display_name, avatar_url
+                from public.profiles
+               where id = any(cast(:ids as uuid[]))
+            """),
+            {"ids": missing},
+        )
+        for r in res.mappings():
+            summary = {"username": r["username"], "display_name": r["display_name"], "avatar_url": r["avatar_url"]}
+            _summaries.set(str(r["id"]), summary)
+            out[str(r["id"])] = summary
+    return out
+
+
+async def attach_profiles(
+    db: AsyncSession,
+    rows: list[dict],
+    spec: Mapping[str, Mapping[str, str]],
+    default: Any = None,
+) -> list[dict]:
+    """
+    In-place hydration. spec maps an id column to {summary_field: output_key}, e.g.
+        {"owner_id": {"username": "owner_username", "avatar_url": "owner_avatar_url"}}
+    """
+    ids = [r.get(col) for r in rows for col in spec]
+    found = await load_profile_summaries(db, ids)
+    for r in rows:
+        for col, fields in spec.items():
+            summary = found.get(str(r.get(col))) or {}
+            for field, key in fields.items():
+                value = summary.get(field)
+                r[key] = default if value is None else value
+    return rows
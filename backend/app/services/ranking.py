@@ -0,0 +1,314 @@
+# app/services/ranking.py
+"""
+Helper ranking: keeps a feature matrix of every helper profile in memory and
+scores an RFH against all helpers in a single vectorized pass.
+
+Features:
+  - tags       : profiles.offers ∪ offers.tags  (sparse; tag -> row ids)
+  - languages  : profiles.languages             (sparse; lang -> row ids)
+  - region     : profiles.region                (int code, -1 = none)
+  - reputation : profiles.reputation
+  - completed  : completed engagements
+  - avg_stars  : mean of offer_reviews.stars
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+
+
+@dataclass(frozen=True)
+class RankWeights:
+    tags: float = 1.0
+    languages: float = 0.5
+    region: float = 0.5
+    reputation: float = 0.01      # legacy score: reputation / 100
+    completed: float = 0.25       # multiplied by log1p(completed)
+    stars: float = 0.2            # multiplied by avg_stars (0..5)
+
+    @classmethod
+    def from_settings(cls) -> "RankWeights":
+        return cls(
+            tags=settings.MATCH_W_TAGS,
+            languages=settings.MATCH_W_LANGUAGES,
+            region=settings.MATCH_W_REGION,
+            reputation=settings.MATCH_W_REPUTATION,
+            completed=settings.MATCH_W_COMPLETED,
+            stars=settings.MATCH_W_STARS,
+        )
+
+
+class _Vocab:
+    """str <-> int encoder that also keeps the row set per code (inverted index)."""
+
+    def __init__(self) -> None:
+        self.codes: dict[str, int] = {}
+        self.rows: list[set[int]] = []
+        self._arrays: dict[int, np.ndarray] = {}
+
+    def code(self, value: str) -> int:
+        c = self.codes.get(value)
+        if c is None:
+            c = len(self.rows)
+            self.codes[value] = c
+            self.rows.append(set())
+        return c
+
+    def add(self, values: Iterable[str], row: int) -> list[int]:
+        out = []
+        for v in values:
+            c = self.code(v)
+            self.rows[c].add(row)
+            self._arrays.pop(c, None)
+            out.append(c)
+        return out
+
+    def discard(self, codes: Iterable[int], row: int) -> None:
+        for c in codes:
+            self.rows[c].discard(row)
+            self._arrays.pop(c, None)
+
+    def postings(self, value: str) -> Optional[np.ndarray]:
+        c = self.codes.get(value)
+        if c is None:
+            return None
+        arr = self._arrays.get(c)
+        if arr is None:
+            arr = np.fromiter(self.rows[c], dtype=np.int64, count=len(self.rows[c]))
+            self._arrays[c] = arr
+        return arr
+
+
+def _norm(values: Iterable[str] | None) -> list[str]:
+    return sorted({v.strip().lower() for v in (values or []) if v and v.strip()})
+
+
+class HelperFeatureMatrix:
+    """
+    One row per helper. Numeric columns are dense numpy arrays, tag/language
+    columns are inverted indexes (sparse one-hot). Rows are never reused; a
+    removed helper is masked with `active=False`.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.ids: list[str] = []
+        self.index: dict[str, int] = {}
+        self.tags = _Vocab()
+        self.languages = _Vocab()
+        self.regions: dict[str, int] = {}
+        self._row_tags: list[list[int]] = []
+        self._row_langs: list[list[int]] = []
+
+        self.region = np.full(capacity, -1, dtype=np.int32)
+        self.reputation = np.zeros(capacity, dtype=np.float32)
+        self.completed = np.zeros(capacity, dtype=np.float32)
+        self.avg_stars = np.zeros(capacity, dtype=np.float32)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return int(self.active[: len(self.ids)].sum())
+
+    def _grow(self, need: int) -> None:
+        cap = self.region.shape[0]
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2)
+        for name in ("region", "reputation", "completed", "avg_stars", "active"):
+            old = getattr(self, name)
+            fill = -1 if name == "region" else 0
+            arr = np.full(new_cap, fill, dtype=old.dtype)
+            arr[:cap] = old
+            setattr(self, name, arr)
+
+    def upsert(
+        self,
+        helper_id: str,
+        *,
+        tags: Sequence[str] | None = None,
+        languages: Sequence[str] | None = None,
+        region: Optional[str] = None,
+        reputation: float = 0.0,
+        completed: float = 0.0,
+        avg_stars: float = 0.0,
+    ) -> int:
+        hid = str(helper_id)
+        row = self.index.get(hid)
+        if row is None:
+            row = len(self.ids)
+            self._grow(row + 1)
+            self.ids.append(hid)
+            self.index[hid] = row
+            self._row_tags.append([])
+            self._row_langs.append([])
+        else:
+            self.tags.discard(self._row_tags[row], row)
+            self.languages.discard(self._row_langs[row], row)
+
+        self._row_tags[row] = self.tags.add(_norm(tags), row)
+        self._row_langs[row] = self.languages.add(_norm(languages), row)
+        if region:
+            self.region[row] = self.regions.setdefault(region, len(self.regions))
+        else:
+            self.region[row] = -1
+        self.reputation[row] = float(reputation or 0)
+        self.completed[row] = float(completed or 0)
+        self.avg_stars[row] = float(avg_stars or 0)
+        self.active[row] = True
+        return row
+
+    def remove(self, helper_id: str) -> None:
+        row = self.index.get(str(helper_id))
+        if row is None:
+            return
+        self.tags.discard(self._row_tags[row], row)
+        self.languages.discard(self._row_langs[row], row)
+        self._row_tags[row] = []
+        self._row_langs[row] = []
+        self.active[row] = False
+
+    def bump_completed(self, helper_id: str, delta: int = 1) -> None:
+        row = self.index.get(str(helper_id))
+        if row is not None:
+            self.completed[row] += delta
+
+    def score(
+        self,
+        *,
+        tags: Sequence[str] | None = None,
+        language: Optional[str] = None,
+        region: Optional[str] = None,
+        weights: RankWeights = RankWeights(),
+        limit: int = 10,
+        exclude: Iterable[str] = (),
+    ) -> list[tuple[str, float]]:
+        n = len(self.ids)
+        if n == 0 or limit <= 0:
+            return []
+
+        score = weights.reputation * self.reputation[:n]
+        if weights.completed:
+            score = score + weights.completed * np.log1p(self.completed[:n])
+        if weights.stars:
+            score = score + weights.stars * self.avg_stars[:n]
+
+        q_tags = _norm(tags)
+        if q_tags and weights.tags:
+            postings = [p for p in (self.tags.postings(t) for t in q_tags) if p is not None]
+            if postings:
+                overlap = np.bincount(np.concatenate(postings), minlength=n)[:n]
+                score = score + weights.tags * overlap.astype(np.float32)
+
+        if language and weights.languages:
+            p = self.languages.postings(language.strip().lower())
+            if p is not None:
+                score[p] += weights.languages
+
+        if region and weights.region:
+            code = self.regions.get(region)
+            if code is not None:
+                score = score + weights.region * (self.region[:n] == code)
+
+        score = np.where(self.active[:n], score, -np.inf)
+        for hid in exclude:
+            row = self.index.get(str(hid))
+            if row is not None:
+                score[row] = -np.inf
+
+        k = min(limit, n)
+        top = np.argpartition(-score, k - 1)[:k]
+        top = top[np.argsort(-score[top], kind="stable")]
+        return [
+            (self.ids[i], float(score[i]))
+            for i in top
+            if math.isfinite(score[i])
+        ]
+
+
+# ---------------------------------------------------------------------------
+# DB load / incremental refresh
+# ---------------------------------------------------------------------------
+
+_HELPER_FEATURES_SQL = """
+    with otags as (
+      select o.owner_id as id, array_agg(distinct t) as tags
+        from public.offers o, unnest(o.tags) t
+       where (cast(:id as uuid) is null or o.owner_id = cast(:id as uuid))
+       group by 1
+    )
+    select p.id,
+           coalesce(p.offers, '{}') || coalesce(ot.tags, '{}') as tags,
+           coalesce(p.languages, '{}') as languages,
+           p.region,
+           coalesce(p.reputation, 0) as reputation,
+           coalesce(st.completed_engagements, 0) as completed,
+           coalesce(st.avg_stars, 0.0) as avg_stars
+      from public.profiles p
+      left join public.practitioner_stats st on st.practitioner_id = p.id
+      left join otags ot on ot.id = p.id
+     where (cast(:id as uuid) is null or p.id = cast(:id as uuid))
+       -- helpers only: profiles listing offer areas or owning tagged offers
+       and (array_length(p.offers, 1) is not null or ot.id is not null)
+"""
+
+
+class HelperRanker:
+    """Process-wide matrix plus load/refresh logic."""
+
+    def __init__(self, refresh_seconds: float) -> None:
+        self.matrix = HelperFeatureMatrix()
+        self.refresh_seconds = refresh_seconds
+        self._loaded_at: float = 0.0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _apply(matrix: HelperFeatureMatrix, row) -> None:
+        m = row._mapping
+        matrix.upsert(
+            str(m["id"]),
+            tags=m["tags"],
+            languages=m["languages"],
+            region=m["region"],
+            reputation=m["reputation"],
+            completed=m["completed"],
+            avg_stars=m["avg_stars"],
+        )
+
+    async def load(self, db: AsyncSession) -> None:
+        res = await db.execute(text(_HELPER_FEATURES_SQL), {"id": None})
+        matrix = HelperFeatureMatrix(capacity=1024)
+        for row in res:
+            self._apply(matrix, row)
+        self.matrix = matrix
+        self._loaded_at = time.monotonic()
+
+    async def ensure_loaded(self, db: AsyncSession) -> HelperFeatureMatrix:
+        stale = (time.monotonic() - self._loaded_at) > self.refresh_seconds
+        if self._loaded_at and not stale:
+            return self.matrix
+        async with self._lock:
+            if not self._loaded_at or (time.monotonic() - self._loaded_at) > self.refresh_seconds:
+                await self.load(db)
+        return self.matrix
+
+    async def refresh_helper(self, db: AsyncSession, helper_id: str) -> None:
+        """Re-read a single helper from the DB and write it into the matrix."""
+        if not self._loaded_at:
+            return  # not loaded yet; the first ensure_loaded reads fresh data anyway
+        res = await db.execute(text(_HELPER_FEATURES_SQL), {"id": str(helper_id)})
+        row = res.first()
+        if row is None:
+            self.matrix.remove(str(helper_id))
+        else:
+            self._apply(self.matrix, row)
+
+
+helper_ranker = HelperRanker(refresh_seconds=settings.MATCH_REFRESH_SECONDS)
@@ -0,0 +1,406 @@
+# app/services/retrieval.py
+"""
+In-process BM25 retrieval over offers, published content and accepted answers.
+
+- Documents are keyed by (kind, id); kind in {"offer", "content", "answer"}.
+- The index is persisted as a snapshot file and reloaded at startup; rows
+  changed since the snapshot watermark are then pulled from Postgres.
+- Writes call `refresh(db, kind, id)` so the index follows the tables in the
+  worker that handled them; every worker also re-runs the catch-up each
+  RETRIEVAL_CATCHUP_INTERVAL to pick up the other workers' writes.
+- `search()` never touches the DB; callers hydrate the returned ids.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import math
+import os
+import re
+import tempfile
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+
+import orjson
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..db.session import async_session
+
+# ---------------------------------------------------------------------------
+# Analyzer (en / tr)
+# ---------------------------------------------------------------------------
+
+_FOLD = str.maketrans({"ç": "c", "ğ": "g", "ı": "i", "ö": "o", "ş": "s", "ü": "u", "â": "a", "î": "i", "û": "u"})
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_STOP_EN = frozenset("""
+a an and are as at be but by can do for from has have how i if in into is it its
+me my no not of on or our so that the their them there this to was we what when
+where which who why will with you your
+""".split())
+_STOP_TR = frozenset("""
+acaba ama ancak bana bazi ben beni benim bir biraz bu bunu cok da daha de defa
+diye en gibi hem hep hic icin ile ise kez ki kim mi mu nasil ne neden nerede
+o olan olarak on ona onu sen siz su sey ve veya ya yani
+""".split())
+
+
+def _fold(s: str, lang: Optional[str]) -> str:
+    if lang == "tr":
+        # Turkish casing: I -> ı, İ -> i (folded to 'i' below either way)
+        s = s.replace("I", "ı").replace("İ", "i")
+    s = unicodedata.normalize("NFC", s.lower()).translate(_FOLD)
+    return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+
+
+def _stem_en(tok: str) -> str:
+    for suf in ("ations", "ation", "ings", "ing", "ies", "ers", "ed", "es", "er", "ly", "s"):
+        if tok.endswith(suf) and len(tok) - len(suf) >= 3:
+            return tok[: -len(suf)] + ("y" if suf == "ies" else "")
+    return tok
+
+
+def _stem_tr(tok: str) -> str:
+    # F5 stemming: the first five characters are a strong baseline for Turkish.
+    return tok[:5]
+
+
+def analyze(body: str, lang: Optional[str] = None) -> list[str]:
+    """Tokenize + stopword + stem. lang=None analyzes as both en and tr."""
+    if not body:
+        return []
+    langs = (lang,) if lang in ("en", "tr") else ("en", "tr")
+    out: list[str] = []
+    for lg in langs:
+        stop = _STOP_TR if lg == "tr" else _STOP_EN
+        stem = _stem_tr if lg == "tr" else _stem_en
+        for tok in _TOKEN_RE.findall(_fold(body, lg)):
+            if len(tok) < 2 or tok in stop:
+                continue
+            out.append(stem(tok))
+    return out
+
+
+def _doc_lang(langs: Iterable[str] | str | None) -> str:
+    if isinstance(langs, str):
+        langs = [langs]
+    langs = [l.lower() for l in (langs or [])]
+    return "tr" if langs and langs[0] == "tr" else "en"
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _Doc:
+    kind: str
+    id: str
+    tf: dict[str, int]
+    length: int
+    meta: dict = field(default_factory=dict)   # e.g. {"type": "legal"} for offers
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.docs: dict[int, _Doc] = {}
+        self.keys: dict[tuple[str, str], int] = {}
+        self.postings: dict[str, dict[int, int]] = {}
+        self.total_len = 0
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def upsert(self, kind: str, doc_id: str, body: str, lang: Optional[str] = None,
+               meta: Optional[dict] = None, tf: Optional[dict[str, int]] = None) -> None:
+        self.remove(kind, doc_id)
+        if tf is None:
+            tf = dict(Counter(analyze(body, lang)))
+        if not tf:
+            return
+        n = self._next
+        self._next += 1
+        d = _Doc(kind, str(doc_id), tf, sum(tf.values()), meta or {})
+        self.docs[n] = d
+        self.keys[(kind, d.id)] = n
+        self.total_len += d.length
+        for term, c in tf.items():
+            self.postings.setdefault(term, {})[n] = c
+
+    def remove(self, kind: str, doc_id: str) -> None:
+        n = self.keys.pop((kind, str(doc_id)), None)
+        if n is None:
+            return
+        d = self.docs.pop(n)
+        self.total_len -= d.length
+        for term in d.tf:
+            p = self.postings.get(term)
+            if p is not None:
+                p.pop(n, None)
+                if not p:
+                    del self.postings[term]
+
+    def search(self, query: str, *, lang: Optional[str] = None, kinds: Iterable[str] | None = None,
+               where: Optional[dict] = None, limit: int = 10) -> list[tuple[str, str, float]]:
+        """Returns [(kind, id, score)] best first."""
+        N = len(self.docs)
+        if not N or limit <= 0:
+            return []
+        terms = set(analyze(query, lang))
+        if not terms:
+            return []
+        kinds = set(kinds) if kinds else None
+        avgdl = self.total_len / N
+        k1, b = self.k1, self.b
+        scores: dict[int, float] = {}
+        for term in terms:
+            p = self.postings.get(term)
+            if not p:
+                continue
+            idf = math.log(1 + (N - len(p) + 0.5) / (len(p) + 0.5))
+            for n, tf in p.items():
+                dl = self.docs[n].length
+                s = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+                scores[n] = scores.get(n, 0.0) + s
+
+        def ok(n: int) -> bool:
+            d = self.docs[n]
+            if kinds and d.kind not in kinds:
+                return False
+            if where:
+                return all(d.meta.get(k) == v for k, v in where.items())
+            return True
+
+        best = heapq.nlargest(limit, (item for item in scores.items() if ok(item[0])), key=lambda x: x[1])
+        return [(self.docs[n].kind, self.docs[n].id, s) for n, s in best]
+
+    # -- snapshot ----------------------------------------------------------
+    def dump(self) -> list[list]:
+        return [[d.kind, d.id, d.tf, d.meta] for d in self.docs.values()]
+
+    @classmethod
+    def load(cls, rows: list[list]) -> "BM25Index":
+        idx = cls()
+        for kind, doc_id, tf, meta in rows:
+            idx.upsert(kind, doc_id, "", meta=meta, tf=tf)
+        return idx
+
+
+# ---------------------------------------------------------------------------
+# DB sources
+# ---------------------------------------------------------------------------
+
+# Each source: rows with (id, body, lang, meta..., updated_at) changed after :since.
+_SOURCES: dict[str, str] = {
+    "offer": """
+        select o.id,
+               concat_ws(' ', o.title, o.description, array_to_string(o.tags, ' ')) as body,
+               o.languages as lang, o.type as type, o.updated_at
+          from public.offer_public o
+         where (cast(:id as uuid) is null or o.id = cast(:id as uuid))
+           and (cast(:since as timestamptz) is null or o.updated_at > cast(:since as timestamptz))
+    """,
+    "content": """
+        select c.id,
+               concat_ws(' ', c.title, c.summary, c.body) as body,
+               c.language as lang, c.type::text as type, c.updated_at
+          from public.content c
+         where c.is_published = true and c.visibility = 'public'
+           and (cast(:id as uuid) is null or c.id = cast(:id as uuid))
+           and (cast(:since as timestamptz) is null or c.updated_at > cast(:since as timestamptz))
+    """,
+    "answer": """
+        select a.id,
+               concat_ws(' ', q.title, a.body) as body,
+               null::text as lang, null::text as type,
+               greatest(a.updated_at, q.updated_at) as updated_at
+          from public.answers a
+          join public.questions q on q.id = a.question_id
+         where a.is_accepted = true and q.visibility = 'public'
+           and (cast(:id as uuid) is null or a.id = cast(:id as uuid))
+           and (cast(:since as timestamptz) is null
+                or greatest(a.updated_at, q.updated_at) > cast(:since as timestamptz))
+    """,
+}
+
+CATCHUP_OVERLAP = timedelta(seconds=30)
+
+# Rows changed since :since that are no longer searchable (unpublished, made
+# private, un-accepted, offer no longer public). Hard deletes only show up in
+# the full _LIVE_IDS reconciliation (boot + RETRIEVAL_RECONCILE_INTERVAL);
+# the deleting worker drops them at once through refresh().
+_GONE_IDS: dict[str, str] = {
+    "offer": """
+        select o.id from public.offers o
+         where o.updated_at > cast(:since as timestamptz)
+           and not exists (select 1 from public.offer_public p where p.id = o.id)
+    """,
+    "content": """
+        select c.id from public.content c
+         where c.updated_at > cast(:since as timestamptz)
+           and not (c.is_published = true and c.visibility = 'public')
+    """,
+    "answer": """
+        select a.id from public.answers a
+          join public.questions q on q.id = a.question_id
+         where greatest(a.updated_at, q.updated_at) > cast(:since as timestamptz)
+           and not (a.is_accepted = true and q.visibility = 'public')
+    """,
+}
+
+_LIVE_IDS: dict[str, str] = {
+    "offer": "select id from public.offer_public",
+    "content": "select id from public.content where is_published = true and visibility = 'public'",
+    "answer": "select a.id from public.answers a join public.questions q on q.id = a.question_id "
+              "where a.is_accepted = true and q.visibility = 'public'",
+}
+
+
+class RetrievalIndex:
+    """Process-wide BM25 index + snapshot / catch-up lifecycle."""
+
+    def __init__(self, snapshot_path: str) -> None:
+        self.index = BM25Index()
+        self.path = Path(snapshot_path)
+        self.watermark: Optional[datetime] = None
+        self._dirty = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _apply(self, kind: str, row) -> None:
+        m = row._mapping
+        meta = {"type": m["type"]} if m["type"] else {}
+        self.index.upsert(kind, str(m["id"]), m["body"] or "", lang=_doc_lang(m["lang"]), meta=meta)
+        ts = m["updated_at"]
+        if ts is not None and (self.watermark is None or ts > self.watermark):
+            self.watermark = ts
+
+    async def catch_up(self, db: AsyncSession, reconcile: bool = False) -> None:
+        """
+        Pull rows changed since the watermark and drop the ones that stopped
+        being searchable; `reconcile` also diffs every live id against the
+        index to catch hard deletes (a full scan per kind -- boot / rarely).
+        """
+        since = self.watermark
+        if since is not None:
+            # rows committed late with an older updated_at still get picked up
+            since -= CATCHUP_OVERLAP
+        changed = 0
+        for kind, sql in _SOURCES.items():
+            res = await db.execute(text(sql), {"id": None, "since": since})
+            for row in res:
+                self._apply(kind, row)
+                changed += 1
+        if since is not None:
+            for kind, sql in _GONE_IDS.items():
+                for r in await db.execute(text(sql), {"since": since}):
+                    if (kind, str(r[0])) in self.index.keys:
+                        self.index.remove(kind, str(r[0]))
+                        changed += 1
+            if reconcile:
+                for kind, sql in _LIVE_IDS.items():
+                    live = {str(r[0]) for r in (await db.execute(text(sql)))}
+                    for (k, doc_id) in [key for key in self.index.keys if key[0] == kind]:
+                        if doc_id not in live:
+                            self.index.remove(k, doc_id)
+                            changed += 1
+        if changed:
+            self._dirty += 1
+
+    async def refresh(self, db: AsyncSession, kind: str, doc_id: str) -> None:
+        res = await db.execute(text(_SOURCES[kind]), {"id": str(doc_id), "since": None})
+        row = res.first()
+        if row is None:
+            self.index.remove(kind, str(doc_id))
+        else:
+            self._apply(kind, row)
+        self._dirty += 1
+        if self._dirty >= settings.RETRIEVAL_SNAPSHOT_EVERY:
+            await self.save()
+
+    def search(self, query: str, **kw) -> list[tuple[str, str, float]]:
+        return self.index.search(query, **kw)
+
+    # -- snapshot ----------------------------------------------------------
+    def _load_snapshot(self) -> None:
+        if not self.path.exists():
+            return
+        data = orjson.loads(self.path.read_bytes())
+        if data.get("version") != 1:
+            return
+        self.index = BM25Index.load(data["docs"])
+        wm = data.get("watermark")
+        self.watermark = datetime.fromisoformat(wm) if wm else None
+
+    def _write_snapshot(self, blob: bytes) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # per-writer temp name: workers share the snapshot path
+        with tempfile.NamedTemporaryFile(
+            dir=self.path.parent, prefix=self.path.name + ".", suffix=".tmp", delete=False,
+        ) as f:
+            f.write(blob)
+        try:
+            os.replace(f.name, self.path)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+
+    async def save(self) -> None:
+        if not self._dirty:
+            return
+        wm = self.watermark.astimezone(timezone.utc).isoformat() if self.watermark else None
+        blob = orjson.dumps({"version": 1, "watermark": wm, "docs": self.index.dump()})
+        self._dirty = 0
+        await asyncio.to_thread(self._write_snapshot, blob)
+
+    async def _loop(self) -> None:
+        first = True
+        reconciled_at = 0.0
+        while True:
+            t0 = time.perf_counter()
+            reconcile = first or (
+                settings.RETRIEVAL_RECONCILE_INTERVAL > 0
+                and time.monotonic() - reconciled_at >= settings.RETRIEVAL_RECONCILE_INTERVAL
+            )
+            try:
+                async with async_session() as db:
+                    await self.catch_up(db, reconcile=reconcile)
+                await self.save()
+                if reconcile:
+                    reconciled_at = time.monotonic()
+                if first:
+                    logger.info("retrieval index ready: {} docs in {:.2f}s", len(self.index), time.perf_counter() - t0)
+                first = False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # DB down -> keep serving the snapshot / what we have
+                logger.warning("retrieval index catch-up failed: {}", e)
+            if settings.RETRIEVAL_CATCHUP_INTERVAL <= 0:
+                return
+            await asyncio.sleep(settings.RETRIEVAL_CATCHUP_INTERVAL)
+
+    async def startup(self) -> None:
+        try:
+            await asyncio.to_thread(self._load_snapshot)
+        except Exception as e:
+            logger.warning("retrieval snapshot unreadable, rebuilding: {}", e)
+            self.index, self.watermark = BM25Index(), None
+        self._task = asyncio.create_task(self._loop())
+
+    async def shutdown(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+        await self.save()
+
+
+retrieval_index = RetrievalIndex(settings.RETRIEVAL_SNAPSHOT_PATH)
@@ -0,0 +1,255 @@
+# app/services/tags.py
+"""
+Tag autocomplete and facet counts.
+
+The catalogue (public.tags) and usage counters (public.tag_counts, one row per
+kind x tag) live in Postgres and are moved by `record_tags` in the same
+transaction as the entity write. Each worker keeps a read-only mirror:
+
+  - a sorted list of folded keys (slug and label, so "aile hu" finds
+    "aile-hukuku" / "Aile Hukuku") with a parallel array of tag positions;
+    a prefix is one bisect range
+  - dense numpy count columns (total + one per kind) indexed by tag position;
+    top-N inside the range is an argpartition
+
+Routes call `tag_index.apply(...)` after commit; other workers pick the change
+up on their next reload (TAGS_RELOAD_INTERVAL).
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..db.session import async_session
+
+TAG_KINDS = ("rfh", "question", "content", "offer", "project", "event")
+
+_FOLD = str.maketrans({"ç": "c", "ğ": "g", "ı": "i", "ö": "o", "ş": "s", "ü": "u", "â": "a", "î": "i", "û": "u"})
+
+
+def fold(s: str) -> str:
+    """Case/diacritic-insensitive key; '-', '_' and runs of spaces become one space."""
+    s = unicodedata.normalize("NFC", s.replace("İ", "i").lower()).translate(_FOLD)
+    s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+    return " ".join(s.replace("-", " ").replace("_", " ").split())
+
+
+def clean_tags(tags: Optional[Iterable[str]]) -> list[str]:
+    """Strip, drop empties and duplicates, keep order."""
+    out: list[str] = []
+    for t in tags or []:
+        t = (t or "").strip()
+        if t and t not in out:
+            out.append(t)
+    return out
+
+
+def default_label(slug: str) -> str:
+    # same as the SQL side: initcap(replace(slug, '-', ' '))
+    return slug.replace("-", " ").title()
+
+
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+
+_RECORD_SQL = """
+    with d as (
+      select x.tag, sum(x.delta)::int as delta
+        from (
+          select unnest(cast(:added as text[])) as tag, 1 as delta
+          union all
+          select unnest(cast(:removed as text[])), -1
+        ) x
+       group by x.tag
+      having sum(x.delta) <> 0
+    ),
+    cat as (
+      insert into public.tags (slug, label)
+      select d.tag, initcap(replace(d.tag, '-', ' ')) from d where d.delta > 0
+      on conflict (slug) do nothing
+    )
+    insert into public.tag_counts (kind, tag, count)
+    select cast(:kind as text), d.tag, d.delta from d
+    on conflict (kind, tag) do update
+       set count = greatest(public.tag_counts.count + excluded.count, 0)
+"""
+
+
+async def record_tags(
+    db: AsyncSession, kind: str, added: Sequence[str] = (), removed: Sequence[str] = (),
+) -> None:
+    """Upsert new tags into the catalogue and move tag_counts. Callers commit."""
+    if not added and not removed:
+        return
+    await db.execute(text(_RECORD_SQL), {"kind": kind, "added": list(added), "removed": list(removed)})
+
+
+# ---------------------------------------------------------------------------
+# In-memory index
+# ---------------------------------------------------------------------------
+
+class TagIndex:
+    def __init__(self, capacity: int = 1024) -> None:
+        self.slugs: list[str] = []
+        self.labels: list[str] = []
+        self.pos: dict[str, int] = {}
+        self.total = np.zeros(capacity, dtype=np.int64)
+        self.by_kind = {k: np.zeros(capacity, dtype=np.int64) for k in TAG_KINDS}
+        self._keys: list[str] = []          # sorted folded keys
+        self._key_tag: list[int] = []       # tag position per key
+        self._key_tag_arr: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.slugs)
+
+    def _grow(self, need: int) -> None:
+        cap = self.total.shape[0]
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2)
+        arr = np.zeros(new_cap, dtype=np.int64)
+        arr[:cap] = self.total
+        self.total = arr
+        for k, old in self.by_kind.items():
+            arr = np.zeros(new_cap, dtype=np.int64)
+            arr[:cap] = old
+            self.by_kind[k] = arr
+
+    def _add_key(self, key: str, p: int) -> None:
+        i = bisect_left(self._keys, key)
+        self._keys.insert(i, key)
+        self._key_tag.insert(i, p)
+        self._key_tag_arr = None
+
+    def add(self, slug: str, label: Optional[str] = None) -> int:
+        p = self.pos.get(slug)
+        if p is not None:
+            return p
+        p = len(self.slugs)
+        self._grow(p + 1)
+        label = label or default_label(slug)
+        self.slugs.append(slug)
+        self.labels.append(label)
+        self.pos[slug] = p
+        for key in {fold(slug), fold(label)}:
+            if key:
+                self._add_key(key, p)
+        return p
+
+    def bump(self, kind: str, slug: str, delta: int) -> None:
+        p = self.add(slug)
+        col = self.by_kind[kind]
+        before = int(col[p])
+        col[p] = max(before + delta, 0)
+        self.total[p] += int(col[p]) - before
+
+    def apply(self, kind: str, added: Sequence[str] = (), removed: Sequence[str] = ()) -> None:
+        """Mirror a committed record_tags() call."""
+        for t in added:
+            self.bump(kind, t, 1)
+        for t in removed:
+            self.bump(kind, t, -1)
+
+    # -- reads --------------------------------------------------------------
+    def _counts(self, kind: Optional[str]) -> np.ndarray:
+        return self.by_kind[kind] if kind else self.total
+
+    def _item(self, p: int, counts: np.ndarray) -> dict:
+        return {"slug": self.slugs[p], "label": self.labels[p], "count": int(counts[p])}
+
+    def _top(self, cand: np.ndarray, counts: np.ndarray, limit: int) -> list[dict]:
+        if cand.size == 0:
+            return []
+        c = counts[cand]
+        live = c > 0
+        cand, c = cand[live], c[live]
+        if cand.size > limit:
+            part = np.argpartition(-c, limit - 1)[:limit]
+            cand, c = cand[part], c[part]
+        # count desc, then slug for a stable order
+        order = sorted(range(cand.size), key=lambda i: (-int(c[i]), self.slugs[cand[i]]))
+        return [self._item(int(cand[i]), counts) for i in order]
+
+    def complete(self, prefix: str, limit: int = 10, kind: Optional[str] = None) -> list[dict]:
+        """Top `limit` tags whose slug or label starts with `prefix`, by usage."""
+        key = fold(prefix)
+        if not key:
+            return self.facets(kind, limit)
+        if self._key_tag_arr is None:
+            self._key_tag_arr = np.asarray(self._key_tag, dtype=np.int64)
+        lo = bisect_left(self._keys, key)
+        hi = bisect_left(self._keys, key + "\x7f", lo)
+        cand = np.unique(self._key_tag_arr[lo:hi])   # slug and label may both match
+        return self._top(cand, self._counts(kind), limit)
+
+    def facets(self, kind: Optional[str] = None, limit: int = 50) -> list[dict]:
+        """Most used tags overall or within one kind."""
+        return self._top(np.arange(len(self.slugs), dtype=np.int64), self._counts(kind), limit)
+
+
+async def _load(db: AsyncSession) -> TagIndex:
+    idx = TagIndex()
+    tags = await db.execute(text("select slug, label from public.tags order by slug"))
+    for r in tags:
+        idx.add(r.slug, r.label)
+    counts = await db.execute(text("select kind, tag, count from public.tag_counts where count > 0"))
+    for r in counts:
+        if r.kind in idx.by_kind:
+            idx.bump(r.kind, r.tag, int(r.count))
+    return idx
+
+
+class TagService:
+    """Process-wide TagIndex + reload lifecycle."""
+
+    def __init__(self) -> None:
+        self.index = TagIndex()
+        self._task: Optional[asyncio.Task] = None
+
+    async def reload(self) -> None:
+        t0 = time.perf_counter()
+        async with async_session() as db:
+            idx = await _load(db)
+        self.index = idx   # swap; readers never see a half-built index
+        logger.info("tag index loaded: {} tags in {:.2f}s", len(idx), time.perf_counter() - t0)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # DB down -> keep serving what we have
+                logger.warning("tag index reload failed: {}", e)
+            if settings.TAGS_RELOAD_INTERVAL <= 0:
+                return
+            await asyncio.sleep(settings.TAGS_RELOAD_INTERVAL)
+
+    async def startup(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def shutdown(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    def apply(self, kind: str, added: Sequence[str] = (), removed: Sequence[str] = ()) -> None:
+        self.index.apply(kind, added, removed)
+
+    def complete(self, prefix: str, limit: int = 10, kind: Optional[str] = None) -> list[dict]:
+        return self.index.complete(prefix, limit, kind)
+
+    def facets(self, kind: Optional[str] = None, limit: int = 50) -> list[dict]:
+        return self.index.facets(kind, limit)
+
+
+tag_index = TagService()
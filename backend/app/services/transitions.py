@@ -0,0 +1,333 @@
+# app/services/transitions.py
+"""
+State machines for offer requests and engagements.
+
+Each transition is one CTE statement: the current-state, actor and (optional)
+version predicates sit in the UPDATE's WHERE clause, and the side effects
+(slot reservation, gift unit, engagement + event insert, badge counters,
+practitioner_stats) hang off its RETURNING. Under READ COMMITTED a concurrent
+writer makes Postgres re-check the WHERE clause on the new row version, so a
+lost race simply matches no row. Only then do we read the row to tell
+404 / 403 / 409 apart.
+
+`version` is bumped on every transition; clients may send the version they
+saw and get 409 if someone moved the row first. Callers commit.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@dataclass(frozen=True)
+class Transition:
+    source: tuple[str, ...]
+    target: str
+    actor: str          # which party may fire it; see _REQUEST_ACTOR / _ENGAGEMENT_ACTOR
+
+
+REQUEST_TRANSITIONS: dict[str, Transition] = {
+    "accept":   Transition(("open",), "accepted", "owner"),
+    "decline":  Transition(("open",), "declined", "owner"),
+    "withdraw": Transition(("open",), "withdrawn", "requester"),
+}
+
+ENGAGEMENT_TRANSITIONS: dict[str, Transition] = {
+    "schedule": Transition(("accepted", "scheduled"), "scheduled", "practitioner"),
+    "complete": Transition(("accepted", "scheduled"), "completed", "practitioner"),
+    "cancel":   Transition(("accepted", "scheduled"), "cancelled", "party"),
+}
+
+_REQUEST_ACTOR = {
+    "owner": "r.offer_owner_id = cast(:actor as uuid)",
+    "requester": "r.requester_id = cast(:actor as uuid)",
+}
+_ENGAGEMENT_ACTOR = {
+    "practitioner": "e.practitioner_id = cast(:actor as uuid)",
+    "party": "cast(:actor as uuid) in (e.practitioner_id, e.requester_id)",
+}
+
+# request_counts deltas for the rows of a `moved` CTE returning
+# (requester_id, offer_owner_id, old_status, new_status):
+# both parties' boxes, -1 on the old status and +1 on the new one
+REQUEST_COUNTS_CTE = """
+    bump as (
+      insert into public.request_counts (user_id, box, status, count)
+      select d.user_id, d.box, d.status, greatest(d.delta, 0)
+        from moved m
+        cross join lateral (values
+          (m.requester_id,   'sent',     m.old_status, -1),
+          (m.offer_owner_id, 'received', m.old_status, -1),
+          (m.requester_id,   'sent',     m.new_status,  1),
+          (m.offer_owner_id, 'received', m.new_status,  1)
+        ) as d(user_id, box, status, delta)
+       where d.status is not null and m.old_status is distinct from m.new_status
+      -- excluded.count is 1 for a +1 delta and 0 for a -1 delta
+      on conflict (user_id, box, status) do update
+         set count = greatest(public.request_counts.count + (
+               case when excluded.count > 0 then 1 else -1 end), 0)
+    )
+"""
+
+_VERSION_OK = "(cast(:ver as integer) is null or {alias}.version = cast(:ver as integer))"
+
+
+async def _explain_miss(
+    db: AsyncSession, table: str, state_col: str, row_id: str, t: Transition,
+    actor_sql: str, params: dict[str, Any], what: str,
+) -> HTTPException:
+    """The transition matched nothing: find out why (404 / 403 / 409)."""
+    alias = "r" if table == "offer_requests" else "e"
+    res = await db.execute(
+        text(f"""
+          select {alias}.{state_col} as state, {alias}.version, ({actor_sql}) as allowed
+            from public.{table} {alias}
+           where {alias}.id = cast(:id as uuid)
+        """),
+        {"id": row_id, "actor": params["actor"]},
+    )
+    row = res.first()
+    if not row:
+        return HTTPException(404, f"{what} not found")
+    if not row.allowed:
+        return HTTPException(403, f"only the {t.actor} can do this")
+    if row.state not in t.source:
+        return HTTPException(409, f"{what} is {row.state}")
+    if params.get("ver") is not None and row.version != params["ver"]:
+        return HTTPException(409, f"{what} was changed by someone else (version {row.version})")
+    return HTTPException(409, "slot not available") if params.get("slot") else HTTPException(409, "conflict, retry")
+
+
+# ---------------------------------------------------------------------------
+# Offer requests
+# ---------------------------------------------------------------------------
+
+_ACCEPT_SQL = """
+    with target as (
+      select r.id, r.offer_id, r.status, r.version
+        from public.offer_requests r
+       where r.id = cast(:id as uuid)
+         and r.status = any(cast(:src as text[]))
+         and {actor}
+         and {version_ok}
+    ),
+    slot as (
+      update public.offer_slots s
+         set reserved   = s.reserved + 1,
+             status     = case when s.reserved + 1 >= s.capacity then 'full' else s.status end,
+             updated_at = now()
+        from target t
+       where s.id = cast(:slot as uuid)
+         and s.offer_id = t.offer_id
+         and s.status <> 'cancelled'
+         and s.reserved < s.capacity
+      returning s.id, s.start_at
+    ),
+    moved as (
+      update public.offer_requests r
+         set status = cast(:dst as text), version = r.version + 1, updated_at = now()
+        from target t
+       where r.id = t.id
+         and r.version = t.version
+         and r.status = any(cast(:src as text[]))
+         and (cast(:slot as uuid) is null or exists (select 1 from slot))
+      returning r.id, r.requester_id, r.offer_owner_id, r.version,
+                t.status as old_status, r.status as new_status
+    ),
+    gift as (
+      update public.offer_gifts g
+         set units_remaining = g.units_remaining - 1,
+             status = case when g.units_remaining - 1 <= 0 then 'exhausted' else 'active' end,
+             updated_at = now()
+        from (
+          select id
+            from public.offer_gifts
+           where cast(:use_gift as boolean)
+             and offer_id = (select offer_id from target)
+             and status = 'active'
+             and units_remaining > 0
+             and (valid_until is null or valid_until > now())
+           order by created_at asc
+           for update skip locked
+           limit 1
+        ) picked
+       where g.id = picked.id
+         and exists (select 1 from moved)
+      returning g.id
+    ),
+    eng as (
+      insert into public.engagements (request_id, practitioner_id, requester_id, state, scheduled_at, slot_id)
+      select m.id, m.offer_owner_id, m.requester_id,
+             case when exists (select 1 from slot) then 'scheduled' else 'accepted' end,
+             (select start_at from slot), (select id from slot)
+        from moved m
+      returning id, scheduled_at
+    ),
+    ev as (
+      insert into public.engagement_events (engagement_id, actor_id, action, data)
+      select eng.id, cast(:actor as uuid), 'accept', jsonb_build_object('slot_id', (select id from slot))
+        from eng
+    ),
+    {counts}
+    select eng.id as engagement_id, eng.scheduled_at, m.version,
+           (select id from gift) as gift_id,
+           m.requester_id, m.offer_owner_id, (select offer_id from target) as offer_id
+      from eng, moved m
+"""
+
+_REQUEST_SQL = """
+    with target as (
+      select r.id, r.status, r.version
+        from public.offer_requests r
+       where r.id = cast(:id as uuid)
+         and r.status = any(cast(:src as text[]))
+         and {actor}
+         and {version_ok}
+    ),
+    moved as (
+      update public.offer_requests r
+         set status = cast(:dst as text),
+             decline_reason = coalesce(cast(:reason as text), r.decline_reason),
+             version = r.version + 1,
+             updated_at = now()
+        from target t
+       where r.id = t.id
+         and r.version = t.version
+         and r.status = any(cast(:src as text[]))
+      returning r.id, r.requester_id, r.offer_owner_id, r.version,
+                t.status as old_status, r.status as new_status
+    ),
+    {counts}
+    select m.version from moved m
+"""
+
+
+async def request_transition(
+    db: AsyncSession,
+    request_id: str,
+    action: str,
+    actor: str,
+    *,
+    version: Optional[int] = None,
+    slot_id: Optional[str] = None,
+    use_gift: bool = False,
+    reason: Optional[str] = None,
+) -> dict:
+    t = REQUEST_TRANSITIONS.get(action)
+    if t is None:
+        raise HTTPException(422, "invalid action")
+    actor_sql = _REQUEST_ACTOR[t.actor]
+    template = _ACCEPT_SQL if action == "accept" else _REQUEST_SQL
+    sql = template.format(
+        actor=actor_sql, version_ok=_VERSION_OK.format(alias="r"), counts=REQUEST_COUNTS_CTE,
+    )
+    params: dict[str, Any] = {
+        "id": request_id, "actor": actor, "ver": version,
+        "src": list(t.source), "dst": t.target,
+    }
+    if action == "accept":
+        params.update({"slot": slot_id, "use_gift": use_gift})
+    else:
+        params["reason"] = reason
+    res = await db.execute(text(sql), params)
+    row = res.first()
+    if row is None:
+        await db.rollback()
+        raise await _explain_miss(db, "offer_requests", "status", request_id, t, actor_sql, params, "request")
+    return dict(row._mapping)
+
+
+# ---------------------------------------------------------------------------
+# Engagements
+# ---------------------------------------------------------------------------
+
+_ENGAGEMENT_SQL = """
+    with upd as (
+      update public.engagements e
+         set state = cast(:dst as text), version = e.version + 1, updated_at = now(){sets}
+       where e.id = cast(:id as uuid)
+         and e.state = any(cast(:src as text[]))
+         and {actor}
+         and {version_ok}
+      returning e.id, e.practitioner_id, e.requester_id, e.slot_id, e.state, e.version, e.scheduled_at
+    ),
+    ev as (
+      insert into public.engagement_events (engagement_id, actor_id, action, data)
+      select upd.id, cast(:actor as uuid), cast(:action as text), {data} from upd
+    ){extra}
+    select upd.id, upd.practitioner_id, upd.requester_id, upd.state, upd.version, upd.scheduled_at,
+           (select s.offer_id from public.offer_slots s where s.id = upd.slot_id) as offer_id
+      from upd
+"""
+
+_ENGAGEMENT_EFFECTS = {
+    "schedule": dict(
+        sets=", scheduled_at = cast(:sch as timestamptz)",
+        data="jsonb_build_object('scheduled_at', cast(:sch as timestamptz))",
+        extra="",
+    ),
+    "complete": dict(
+        sets=", completed_at = now()",
+        data="'{}'::jsonb",
+        extra=""",
+    stats as (
+      insert into public.practitioner_stats (practitioner_id, completed_engagements)
+      select practitioner_id, 1 from upd
+      on conflict (practitioner_id) do update
+         set completed_engagements = public.practitioner_stats.completed_engagements + 1,
+             updated_at = now()
+    )""",
+    ),
+    "cancel": dict(
+        sets=", cancellation_reason = cast(:reason as text)",
+        data="jsonb_build_object('reason', cast(:reason as text))",
+        extra=""",
+    released as (
+      update public.offer_slots s
+         set reserved = greatest(s.reserved - 1, 0),
+             status = case when s.status = 'full' and s.reserved - 1 < s.capacity then 'open' else s.status end,
+             updated_at = now()
+        from upd
+       where s.id = upd.slot_id
+    )""",
+    ),
+}
+
+
+async def engagement_transition(
+    db: AsyncSession,
+    engagement_id: str,
+    action: str,
+    actor: str,
+    *,
+    version: Optional[int] = None,
+    scheduled_at: Optional[Any] = None,
+    reason: Optional[str] = None,
+) -> dict:
+    t = ENGAGEMENT_TRANSITIONS.get(action)
+    if t is None:
+        raise HTTPException(422, "invalid action")
+    if action == "schedule" and not scheduled_at:
+        raise HTTPException(422, "scheduled_at required")
+    actor_sql = _ENGAGEMENT_ACTOR[t.actor]
+    sql = _ENGAGEMENT_SQL.format(
+        actor=actor_sql, version_ok=_VERSION_OK.format(alias="e"), **_ENGAGEMENT_EFFECTS[action],
+    )
+    params: dict[str, Any] = {
+        "id": engagement_id, "actor": actor, "ver": version, "action": action,
+        "src": list(t.source), "dst": t.target,
+    }
+    if action == "schedule":
+        params["sch"] = scheduled_at
+    if action == "cancel":
+        params["reason"] = reason or ""
+    res = await db.execute(text(sql), params)
+    row = res.first()
+    if row is None:
+        await db.rollback()
+        raise await _explain_miss(db, "engagements", "state", engagement_id, t, actor_sql, params, "engagement")
+    return dict(row._mapping)
@@ -0,0 +1,226 @@
+# app/services/trending.py
+"""
+Time-decayed trending scores for rfh, questions, content and offers.
+
+An entity's heat at time t is  sum_i w_i * exp(-lambda * (t - t_i))  over its
+activity (views, ratings, comments, answers, offer reviews and requests), with
+lambda = ln 2 / TRENDING_HALF_LIFE_HOURS. We store it anchored at a fixed epoch
+and in log space:
+
+    score = ln sum_i w_i * exp(lambda * (t_i - EPOCH))
+
+so heat(t) = exp(score - lambda * (t - EPOCH)): the same shift for every row.
+Ordering by `score` is ordering by current heat, and rows with no new activity
+never need rewriting. Log space keeps exp() from overflowing years after the
+epoch.
+
+Every TRENDING_INTERVAL seconds one worker (advisory lock) aggregates the
+events between trending_state.watermark and now() - TRENDING_LAG_SECONDS into
+(entity, id, signal, minute, n) buckets, folds them in with a vectorised
+logaddexp over that changed set only, and upserts the result.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..db.session import async_session
+
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+ENTITIES = ("rfh", "question", "content", "offer")
+
+_LOCK_KEY = 0x7472656E64   # "trend"
+
+# (entity, entity_id, signal, minute bucket, n) for activity in (:since, :until]
+_EVENTS_SQL = """
+    select entity::text as entity, entity_id, 'view' as signal,
+           date_trunc('minute', viewed_at) as at, count(*) as n
+      from public.views
+     where viewed_at > :since and viewed_at <= :until
+       and entity::text in ('rfh', 'question', 'content')
+     group by 1, 2, 4
+    union all
+    select entity::text, entity_id, 'rating', date_trunc('minute', created_at), count(*)
+      from public.ratings
+     where created_at > :since and created_at <= :until
+       and entity::text in ('rfh', 'question', 'content')
+     group by 1, 2, 4
+    union all
+    select entity::text, entity_id, 'comment', date_trunc('minute', created_at), count(*)
+      from public.comments
+     where created_at > :since and created_at <= :until
+       and entity::text in ('rfh', 'question', 'content')
+     group by 1, 2, 4
+    union all
+    select 'question', question_id, 'answer', date_trunc('minute', created_at), count(*)
+      from public.answers
+     where created_at > :since and created_at <= :until
+     group by 2, 4
+    union all
+    select 'offer', offer_id, 'review', date_trunc('minute', created_at), count(*)
+      from public.offer_reviews
+     where created_at > :since and created_at <= :until
+     group by 2, 4
+    union all
+    select 'offer', offer_id, 'request', date_trunc('minute', created_at), count(*)
+      from public.offer_requests
+     where created_at > :since and created_at <= :until
+     group by 2, 4
+"""
+
+_UPSERT_SQL = """
+    insert into public.trending_scores (entity, entity_id, score, last_event_at, updated_at)
+    select e, i, s, l, now()
+      from unnest(cast(:e as text[]), cast(:i as uuid[]),
+                  cast(:s as double precision[]), cast(:l as timestamptz[])) as t(e, i, s, l)
+    on conflict (entity, entity_id) do update
+       set score = excluded.score,
+           last_event_at = greatest(public.trending_scores.last_event_at, excluded.last_event_at),
+           updated_at = now()
+"""
+
+
+def decay_rate() -> float:
+    """lambda, per second."""
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600.0)
+
+
+def signal_weights() -> dict[str, float]:
+    return {
+        "view": settings.TRENDING_W_VIEW,
+        "rating": settings.TRENDING_W_RATING,
+        "comment": settings.TRENDING_W_COMMENT,
+        "answer": settings.TRENDING_W_ANSWER,
+        "review": settings.TRENDING_W_REVIEW,
+        "request": settings.TRENDING_W_REQUEST,
+    }
+
+
+def heat(score: float, now: Optional[datetime] = None) -> float:
+    """Current decayed activity for a stored score."""
+    now = now or datetime.now(timezone.utc)
+    return math.exp(score - decay_rate() * (now - EPOCH).total_seconds())
+
+
+def fold(
+    keys: list[tuple[str, str]],
+    weights: np.ndarray,
+    at_seconds: np.ndarray,
+    old: dict[tuple[str, str], float],
+) -> tuple[list[tuple[str, str]], np.ndarray]:
+    """
+    keys[k] / weights[k] / at_seconds[k] describe one event bucket (seconds since
+    EPOCH). Returns the distinct keys and their new log scores, merged with `old`.
+    """
+    uniq: dict[tuple[str, str], int] = {}
+    codes = np.fromiter((uniq.setdefault(k, len(uniq)) for k in keys), dtype=np.int64, count=len(keys))
+    terms = np.log(weights) + decay_rate() * at_seconds
+
+    order = np.argsort(codes, kind="stable")
+    codes, terms = codes[order], terms[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    new = np.logaddexp.reduceat(terms, starts)
+
+    out_keys = list(uniq)   # insertion order == code order == reduceat order
+    prev = np.fromiter((old.get(k, -np.inf) for k in out_keys), dtype=np.float64, count=len(out_keys))
+    return out_keys, np.logaddexp(prev, new)
+
+
+async def run_batch(db: AsyncSession) -> int:
+    """Fold activity since the watermark into trending_scores. Returns #entities touched."""
+    got = await db.execute(text("select pg_try_advisory_xact_lock(:k)"), {"k": _LOCK_KEY})
+    if not got.scalar():
+        return 0   # another worker is on it
+
+    state = (await db.execute(
+        text("""
+          select watermark, now() - make_interval(secs => :lag) as until
+            from public.trending_state where id = 1
+             for update
+        """),
+        {"lag": settings.TRENDING_LAG_SECONDS},
+    )).first()
+    if state is None or state.until <= state.watermark:
+        await db.rollback()
+        return 0
+
+    rows = (await db.execute(text(_EVENTS_SQL), {"since": state.watermark, "until": state.until})).fetchall()
+    touched = 0
+    if rows:
+        w = signal_weights()
+        keys = [(r.entity, str(r.entity_id)) for r in rows]
+        weights = np.fromiter((w[r.signal] * r.n for r in rows), dtype=np.float64, count=len(rows))
+        at = np.fromiter(((r.at - EPOCH).total_seconds() for r in rows), dtype=np.float64, count=len(rows))
+        last: dict[tuple[str, str], datetime] = {}
+        for k, r in zip(keys, rows):
+            if k not in last or r.at > last[k]:
+                last[k] = r.at
+
+        old_res = await db.execute(
+            text("""
+              select s.entity, s.entity_id, s.score
+                from public.trending_scores s
+                join unnest(cast(:e as text[]), cast(:i as uuid[])) as t(e, i)
+                  on s.entity = t.e and s.entity_id = t.i
+            """),
+            {"e": [k[0] for k in last], "i": [k[1] for k in last]},
+        )
+        old = {(r.entity, str(r.entity_id)): r.score for r in old_res}
+
+        out_keys, scores = fold(keys, weights, at, old)
+        await db.execute(text(_UPSERT_SQL), {
+            "e": [k[0] for k in out_keys],
+            "i": [k[1] for k in out_keys],
+            "s": scores.tolist(),
+            "l": [last[k] for k in out_keys],
+        })
+        touched = len(out_keys)
+
+    await db.execute(
+        text("update public.trending_state set watermark = :until where id = 1"),
+        {"until": state.until},
+    )
+    await db.commit()
+    return touched
+
+
+class TrendingUpdater:
+    """Background loop around run_batch."""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+
+    async def _loop(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                async with async_session() as db:
+                    n = await run_batch(db)
+                if n:
+                    logger.info("trending: {} entities updated in {:.2f}s", n, time.perf_counter() - t0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # DB hiccup -> try again next tick
+                logger.warning("trending batch failed: {}", e)
+            await asyncio.sleep(settings.TRENDING_INTERVAL)
+
+    async def startup(self) -> None:
+        if settings.TRENDING_INTERVAL > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def shutdown(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+
+trending_updater = TrendingUpdater()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+import orjson
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque keyset cursor, e.g. encode_cursor(created_at, id)."""
+    raw = orjson.dumps([v.isoformat() if isinstance(v, datetime) else str(v) if v is not None else None
+                        for v in values])
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], n: int) -> Optional[list[Any]]:
+    """Inverse of encode_cursor; None for no cursor, 422 for garbage."""
+    if not cursor:
+        return None
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        values = orjson.loads(base64.urlsafe_b64decode(cursor + pad))
+    except Exception:
+        raise HTTPException(422, "invalid cursor")
+    if not isinstance(values, list) or len(values) != n:
+        raise HTTPException(422, "invalid cursor")
+    return values
+
+
+def parse_ts(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(422, "invalid cursor")
+
+
+def page_of(rows: Sequence[dict], limit: int, *keys: str) -> tuple[list[dict], Optional[str]]:
+    """
+    Callers fetch limit + 1 rows; returns (first `limit` rows, cursor of the last
+    returned row or None when there is no further page).
+    """
+    items = list(rows[:limit])
+    if len(rows) <= limit or not items:
+        return items, None
+    last = items[-1]
+    return items, encode_cursor(*(last[k] for k in keys))
+
+
+def set_next_cursor(response: Response, cursor: Optional[str]) -> None:
+    """List endpoints that return a bare JSON array expose the cursor as a header."""
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
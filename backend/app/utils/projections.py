@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from typing import Mapping, Optional, Sequence
+
+from fastapi import HTTPException
+
+
+class Projection:
+    """
+    Whitelisted column sets for `?fields=` on list/detail endpoints.
+
+    columns : field name -> SQL expression (aliased to the field name)
+    presets : named projections, e.g. {"card": [...], "full": [...]}
+    virtual : fields filled in after the query (e.g. owner_username) -> the
+              column they need selected (e.g. owner_id)
+    always  : fields every projection includes (keys, cursor columns)
+
+    `fields` is either a preset name or a comma-separated list of field names;
+    anything not whitelisted is a 422, so the SQL is never built from input.
+    """
+
+    def __init__(
+        self,
+        columns: Mapping[str, str],
+        presets: Mapping[str, Sequence[str]],
+        default: str,
+        virtual: Optional[Mapping[str, str]] = None,
+        always: Sequence[str] = ("id",),
+    ) -> None:
+        self.columns = dict(columns)
+        self.presets = {k: list(v) for k, v in presets.items()}
+        self.default = default
+        self.virtual = dict(virtual or {})
+        self.always = list(always)
+
+    def resolve(self, fields: Optional[str], default: Optional[str] = None) -> tuple[list[str], list[str]]:
+        """-> (selected column names, requested virtual fields)"""
+        spec = (fields or default or self.default).strip()
+        names = self.presets.get(spec)
+        if names is None:
+            names = [f.strip() for f in spec.split(",") if f.strip()]
+        unknown = [n for n in names if n not in self.columns and n not in self.virtual]
+        if unknown:
+            raise HTTPException(422, f"unknown fields: {', '.join(unknown)}")
+        virtual = [n for n in names if n in self.virtual]
+        cols = list(dict.fromkeys(
+            self.always
+            + [n for n in names if n in self.columns]
+            + [self.virtual[v] for v in virtual]
+        ))
+        return cols, virtual
+
+    def sql(self, cols: Sequence[str]) -> str:
+        return ",\n".join(
+            self.columns[c] if self.columns[c] == c or self.columns[c].endswith(f".{c}")
+            else f"{self.columns[c]} as {c}"
+            for c in cols
+        )
+
+    def select(self, fields: Optional[str], default: Optional[str] = None) -> tuple[str, list[str]]:
+        cols, virtual = self.resolve(fields, default)
+        return self.sql(cols), virtual
@@ -0,0 +1,103 @@
+# bench/bench_ranking.py
+"""
+Micro-benchmark for app/services/ranking.py.
+
+    cd backend
+    python bench/bench_ranking.py --helpers 100000 --queries 200
+
+Builds a synthetic HelperFeatureMatrix (no DB needed) and times:
+  - full build
+  - single-RFH scoring (p50 / p95 / max)
+  - incremental upserts
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Settings() requires these; the benchmark never touches the DB or JWKS.
+os.environ.setdefault("DATABASE_URL", "postgresql://bench@localhost/bench")
+os.environ.setdefault("SUPABASE_JWKS_URL", "")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.ranking import HelperFeatureMatrix, RankWeights  # noqa: E402
+
+LANGS = ["tr", "en", "de", "ar", "ku", "fr", "es", "ru"]
+
+
+def _synthetic(n: int, n_tags: int, n_regions: int, rnd: random.Random):
+    tags = [f"tag-{i}" for i in range(n_tags)]
+    regions = [f"R-{i}" for i in range(n_regions)]
+    for i in range(n):
+        yield (
+            f"helper-{i}",
+            dict(
+                tags=rnd.sample(tags, rnd.randint(0, 8)),
+                languages=rnd.sample(LANGS, rnd.randint(1, 3)),
+                region=rnd.choice(regions),
+                reputation=rnd.randint(0, 500),
+                completed=rnd.randint(0, 40),
+                avg_stars=rnd.uniform(0, 5),
+            ),
+        )
+
+
+def _pct(samples: list[float], p: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p))]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--helpers", type=int, default=100_000)
+    ap.add_argument("--tags", type=int, default=2_000)
+    ap.add_argument("--regions", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--upserts", type=int, default=5_000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    rnd = random.Random(args.seed)
+
+    t0 = time.perf_counter()
+    m = HelperFeatureMatrix(capacity=args.helpers)
+    for hid, feats in _synthetic(args.helpers, args.tags, args.regions, rnd):
+        m.upsert(hid, **feats)
+    build_s = time.perf_counter() - t0
+
+    weights = RankWeights()
+    # warm posting-array caches the way a live process would be
+    m.score(tags=[f"tag-{i}" for i in range(args.tags)], weights=weights)
+
+    lat = []
+    for _ in range(args.queries):
+        q_tags = [f"tag-{rnd.randrange(args.tags)}" for _ in range(rnd.randint(1, 5))]
+        t = time.perf_counter()
+        m.score(
+            tags=q_tags,
+            language=rnd.choice(LANGS),
+            region=f"R-{rnd.randrange(args.regions)}",
+            weights=weights,
+            limit=10,
+        )
+        lat.append((time.perf_counter() - t) * 1000)
+
+    t0 = time.perf_counter()
+    for i in range(args.upserts):
+        hid = f"helper-{rnd.randrange(args.helpers)}"
+        m.upsert(hid, tags=[f"tag-{rnd.randrange(args.tags)}"], languages=["tr"], reputation=i)
+    upsert_us = (time.perf_counter() - t0) / max(1, args.upserts) * 1e6
+
+    print(f"helpers={args.helpers} tags={args.tags} regions={args.regions}")
+    print(f"build            : {build_s:8.2f} s")
+    print(
+        f"score (ms)       : p50={statistics.median(lat):.2f} "
+        f"p95={_pct(lat, 0.95):.2f} max={max(lat):.2f}"
+    )
+    print(f"upsert           : {upsert_us:8.1f} us/op")
+
+
+if __name__ == "__main__":
+    main()
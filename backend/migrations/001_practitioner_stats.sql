@@ -0,0 +1,50 @@
+-- 001_practitioner_stats.sql
+-- Per-practitioner counters read by GET /api/profiles/{id_or_username}.
+-- Maintained by the API in the same transaction as the write:
+--   - engagement -> completed      : completed_engagements + 1
+--   - insert into offer_reviews    : ratings_count + 1, stars_sum + stars
+-- Profile stars come from offer_reviews (one per completed engagement), not
+-- from public.ratings with entity = 'offer' as the old profile query did:
+-- those unverified ratings (POST /ratings still accepts them) are neither
+-- backfilled nor counted here.
+
+create table if not exists public.practitioner_stats (
+  practitioner_id       uuid primary key references public.profiles(id) on delete cascade,
+  completed_engagements integer not null default 0,
+  ratings_count         integer not null default 0,
+  stars_sum             integer not null default 0,
+  avg_stars             double precision generated always as
+                          (case when ratings_count > 0 then stars_sum::float / ratings_count else 0.0 end) stored,
+  updated_at            timestamptz not null default now()
+);
+
+-- backfill
+insert into public.practitioner_stats (practitioner_id, completed_engagements, ratings_count, stars_sum)
+select p.id,
+       coalesce(e.completed, 0),
+       coalesce(r.cnt, 0),
+       coalesce(r.sum, 0)
+  from public.profiles p
+  left join (
+    select practitioner_id, count(*)::int as completed
+      from public.engagements
+     where state = 'completed'
+     group by 1
+  ) e on e.practitioner_id = p.id
+  left join (
+    select o.owner_id, count(*)::int as cnt, sum(rv.stars)::int as sum
+      from public.offer_reviews rv
+      join public.offers o on o.id = rv.offer_id
+     group by 1
+  ) r on r.owner_id = p.id
+ where e.completed is not null or r.cnt is not null
+on conflict (practitioner_id) do update
+   set completed_engagements = excluded.completed_engagements,
+       ratings_count         = excluded.ratings_count,
+       stars_sum             = excluded.stars_sum,
+       updated_at            = now();
+
+-- profile page: offers of one owner, next open slots of one offer
+create index if not exists offers_owner_id_idx on public.offers (owner_id);
+create index if not exists offer_slots_offer_open_start_idx
+  on public.offer_slots (offer_id, start_at) where status = 'open';
@@ -0,0 +1,43 @@
+-- 002_threaded_comments.sql
+-- Threaded comments with a materialized path, keyset-friendly indexes and a
+-- maintained per-entity comment count.
+--
+-- path: dot-separated segments, one per ancestor, each segment being
+--   YYYYMMDDHH24MISSUS (UTC) || first 8 hex chars of the comment id
+-- so lexical order == thread order and a subtree of P is the range
+--   path > P || '.'  and  path < P || '/'      ('/' sorts right after '.')
+
+alter table public.comments
+  add column if not exists parent_id   uuid references public.comments(id) on delete cascade,
+  add column if not exists path        text,
+  add column if not exists depth       integer not null default 0,
+  add column if not exists reply_count integer not null default 0;
+
+update public.comments
+   set path = to_char(created_at at time zone 'UTC', 'YYYYMMDDHH24MISSUS') || substr(replace(id::text, '-', ''), 1, 8)
+ where path is null;
+
+alter table public.comments alter column path set not null;
+
+-- top-level page: newest first per entity
+create index if not exists comments_entity_top_idx
+  on public.comments (entity, entity_id, created_at desc, id desc)
+  where parent_id is null;
+
+-- subtree range scans
+create index if not exists comments_path_idx
+  on public.comments (path collate "C");
+
+create table if not exists public.comment_counts (
+  entity     text not null,
+  entity_id  uuid not null,
+  count      integer not null default 0,
+  updated_at timestamptz not null default now(),
+  primary key (entity, entity_id)
+);
+
+insert into public.comment_counts (entity, entity_id, count)
+select entity::text, entity_id, count(*)::int
+  from public.comments
+ group by 1, 2
+on conflict (entity, entity_id) do update set count = excluded.count, updated_at = now();
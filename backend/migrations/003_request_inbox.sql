@@ -0,0 +1,47 @@
+-- 003_request_inbox.sql
+-- Inboxes for GET /api/psm/requests/mine.
+--   - offer_requests.offer_owner_id: copy of offers.owner_id (owners never change),
+--     set by the API on insert, so the received box is one index range scan
+--   - request_counts: per (user, box, status) badge counters, moved by the API in
+--     the same statement as every status change
+
+alter table public.offer_requests
+  add column if not exists offer_owner_id uuid references public.profiles(id);
+
+update public.offer_requests r
+   set offer_owner_id = o.owner_id
+  from public.offers o
+ where o.id = r.offer_id
+   and r.offer_owner_id is null;
+
+alter table public.offer_requests
+  alter column offer_owner_id set not null;
+
+-- keyset (created_at desc, id desc), with and without a status filter
+create index if not exists offer_requests_owner_created_idx
+  on public.offer_requests (offer_owner_id, created_at desc, id desc);
+create index if not exists offer_requests_owner_status_created_idx
+  on public.offer_requests (offer_owner_id, status, created_at desc, id desc);
+create index if not exists offer_requests_requester_created_idx
+  on public.offer_requests (requester_id, created_at desc, id desc);
+create index if not exists offer_requests_requester_status_created_idx
+  on public.offer_requests (requester_id, status, created_at desc, id desc);
+
+create table if not exists public.request_counts (
+  user_id    uuid not null references public.profiles(id) on delete cascade,
+  box        text not null check (box in ('sent', 'received')),
+  status     text not null,
+  count      integer not null default 0,
+  primary key (user_id, box, status)
+);
+
+-- backfill
+insert into public.request_counts (user_id, box, status, count)
+select requester_id, 'sent', status, count(*)::int
+  from public.offer_requests
+ group by 1, 3
+union all
+select offer_owner_id, 'received', status, count(*)::int
+  from public.offer_requests
+ group by 1, 3
+on conflict (user_id, box, status) do update set count = excluded.count;
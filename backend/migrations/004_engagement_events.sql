@@ -0,0 +1,36 @@
+-- 004_engagement_events.sql
+-- Append-only engagement history, replacing the engagements.audit jsonb array
+-- (every `audit || ...` rewrote the whole value, so transitions got slower as
+-- history grew). The API inserts one row per transition in the same statement
+-- as the engagement update.
+--
+-- data: action-specific extras, e.g. {"scheduled_at": ...}, {"reason": ...}, {"slot_id": ...}
+
+create table if not exists public.engagement_events (
+  id            bigint generated always as identity primary key,
+  engagement_id uuid not null references public.engagements(id) on delete cascade,
+  at            timestamptz not null default now(),
+  actor_id      uuid references public.profiles(id),
+  action        text not null,
+  data          jsonb not null default '{}'::jsonb
+);
+
+create index if not exists engagement_events_engagement_at_idx
+  on public.engagement_events (engagement_id, at, id);
+
+-- backfill from the audit arrays, oldest first so ids follow history order
+insert into public.engagement_events (engagement_id, at, actor_id, action, data)
+select e.id,
+       coalesce((a.item->>'at')::timestamptz, e.created_at),
+       case when a.item->>'actor' ~* '^[0-9a-f-]{36}$' then (a.item->>'actor')::uuid end,
+       coalesce(a.item->>'action', 'unknown'),
+       a.item - 'at' - 'actor' - 'action'
+  from public.engagements e
+ cross join lateral jsonb_array_elements(
+         case when jsonb_typeof(e.audit) = 'array' then e.audit else '[]'::jsonb end
+       ) with ordinality as a(item, n)
+ where not exists (select 1 from public.engagement_events x where x.engagement_id = e.id)
+ order by e.id, a.n;
+
+-- history now lives in engagement_events; drop the copies from the rows
+update public.engagements set audit = '[]'::jsonb where audit <> '[]'::jsonb;
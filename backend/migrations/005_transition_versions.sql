@@ -0,0 +1,9 @@
+-- 005_transition_versions.sql
+-- Optimistic concurrency for app/services/transitions.py: every request /
+-- engagement transition bumps `version`; clients may send the version they saw.
+
+alter table public.offer_requests
+  add column if not exists version integer not null default 0;
+
+alter table public.engagements
+  add column if not exists version integer not null default 0;
@@ -0,0 +1,36 @@
+-- 006_offer_rating_aggregates.sql
+-- Rating aggregates on the offer row, maintained by the API in the same
+-- statement as the offer_reviews insert (POST /psm/engagements/{id}/reviews).
+--
+-- rating_score is a Bayesian average: every offer starts as if it had
+-- 5 reviews at 3.5 stars, so one 5-star review doesn't outrank fifty 4.8s.
+--   rating_score = (stars_sum + 5 * 3.5) / (ratings_count + 5)
+
+alter table public.offers
+  add column if not exists ratings_count integer not null default 0,
+  add column if not exists stars_sum     integer not null default 0;
+
+-- backfill
+update public.offers o
+   set ratings_count = r.cnt,
+       stars_sum     = r.sum
+  from (
+    select offer_id, count(*)::int as cnt, sum(stars)::int as sum
+      from public.offer_reviews
+     group by 1
+  ) r
+ where r.offer_id = o.id;
+
+alter table public.offers
+  add column if not exists avg_stars double precision generated always as
+    (case when ratings_count > 0 then stars_sum::float / ratings_count else 0.0 end) stored,
+  add column if not exists rating_score double precision generated always as
+    ((stars_sum + 5 * 3.5) / (ratings_count + 5)) stored;
+
+-- sort=rating / sort=score in GET /psm/offers, and the per-type top-3 in /psm/ai/answer
+create index if not exists offers_rating_idx
+  on public.offers (avg_stars desc, ratings_count desc, created_at desc);
+create index if not exists offers_rating_score_idx
+  on public.offers (rating_score desc, created_at desc);
+create index if not exists offers_type_rating_idx
+  on public.offers (type, avg_stars desc, ratings_count desc);
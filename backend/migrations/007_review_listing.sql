@@ -0,0 +1,27 @@
+-- 007_review_listing.sql
+-- Per-offer 1..5 star histogram next to the rating aggregates from 006,
+-- bumped in the same statement as the offer_reviews insert, and the keyset
+-- index behind GET /psm/offers/{id}/reviews.
+
+alter table public.offers
+  add column if not exists stars_hist integer[] not null default '{0,0,0,0,0}';
+
+-- backfill
+update public.offers o
+   set stars_hist = h.hist
+  from (
+    select offer_id,
+           array[
+             count(*) filter (where stars = 1),
+             count(*) filter (where stars = 2),
+             count(*) filter (where stars = 3),
+             count(*) filter (where stars = 4),
+             count(*) filter (where stars = 5)
+           ]::integer[] as hist
+      from public.offer_reviews
+     group by 1
+  ) h
+ where h.offer_id = o.id;
+
+create index if not exists offer_reviews_offer_created_idx
+  on public.offer_reviews (offer_id, created_at desc, id desc);
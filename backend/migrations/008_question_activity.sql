@@ -0,0 +1,44 @@
+-- 008_question_activity.sql
+-- Maintained Q&A columns so question lists never aggregate answers per row.
+--   answer_count     : +1 in the same statement as the answer insert
+--   last_activity_at : question created / answered / answer accepted
+--   accepted_answer_id (already on questions) is also set by the API on accept
+
+alter table public.questions
+  add column if not exists answer_count     integer not null default 0,
+  add column if not exists last_activity_at timestamptz;
+
+-- backfill
+update public.questions q
+   set answer_count     = coalesce(a.cnt, 0),
+       last_activity_at = greatest(q.created_at, a.last_at),
+       accepted_answer_id = coalesce(q.accepted_answer_id, a.accepted)
+  from public.questions q2
+  left join (
+    select question_id,
+           count(*)::int as cnt,
+           max(created_at) as last_at,
+           (array_agg(id) filter (where is_accepted))[1] as accepted
+      from public.answers
+     group by 1
+  ) a on a.question_id = q2.id
+ where q2.id = q.id;
+
+update public.questions set last_activity_at = coalesce(created_at, now()) where last_activity_at is null;
+
+alter table public.questions
+  alter column last_activity_at set default now(),
+  alter column last_activity_at set not null;
+
+-- keyset listings (sort=new / sort=activity)
+create index if not exists questions_public_created_idx
+  on public.questions (created_at desc, id desc) where visibility = 'public';
+create index if not exists questions_public_activity_idx
+  on public.questions (last_activity_at desc, id desc) where visibility = 'public';
+
+-- the helpers' triage queue: unanswered, oldest first
+create index if not exists questions_unanswered_idx
+  on public.questions (created_at, id) where answer_count = 0 and visibility = 'public';
+
+create index if not exists answers_question_created_idx
+  on public.answers (question_id, created_at, id);
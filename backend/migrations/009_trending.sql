@@ -0,0 +1,40 @@
+-- 009_trending.sql
+-- Trending feed (app/services/trending.py, GET /api/feed/trending).
+--
+-- score = ln( sum_i w_i * exp(lambda * (t_i - epoch)) ) over an entity's activity
+-- (views, ratings, comments, answers, reviews, requests). Anchoring every event at
+-- the same epoch keeps scores comparable without re-decaying idle rows: the
+-- current "heat" is exp(score - lambda * (now - epoch)), the same shift for all.
+-- A periodic batch folds in only the events since trending_state.watermark.
+
+create table if not exists public.trending_scores (
+  entity        text not null,
+  entity_id     uuid not null,
+  score         double precision not null,
+  last_event_at timestamptz not null,
+  updated_at    timestamptz not null default now(),
+  primary key (entity, entity_id)
+);
+
+create index if not exists trending_scores_score_idx
+  on public.trending_scores (score desc, entity, entity_id);
+create index if not exists trending_scores_entity_score_idx
+  on public.trending_scores (entity, score desc, entity_id);
+
+create table if not exists public.trending_state (
+  id        smallint primary key default 1 check (id = 1),
+  watermark timestamptz not null
+);
+
+-- first run folds in the last week
+insert into public.trending_state (id, watermark)
+values (1, now() - interval '7 days')
+on conflict (id) do nothing;
+
+-- range scans for "activity since the watermark"
+create index if not exists views_viewed_at_idx          on public.views (viewed_at);
+create index if not exists ratings_created_at_idx       on public.ratings (created_at);
+create index if not exists comments_created_at_idx      on public.comments (created_at);
+create index if not exists answers_created_at_idx       on public.answers (created_at);
+create index if not exists offer_reviews_created_at_idx on public.offer_reviews (created_at);
+create index if not exists offer_requests_created_at_idx on public.offer_requests (created_at);
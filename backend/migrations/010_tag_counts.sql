@@ -0,0 +1,47 @@
+-- 010_tag_counts.sql
+-- Tag discovery (app/services/tags.py, GET /api/tags/...).
+--   - public.tags becomes the catalogue of every tag in use, not just content tags:
+--     the API upserts into it whenever an entity is created with tags
+--   - tag_counts: per (kind, tag) usage, moved by the API in the same statement
+--     as the entity insert / delete. The in-memory prefix index ranks by it.
+--
+-- kind: rfh | question | content | offer | project | event
+-- tag:  the value as stored in the entity's tags array (= tags.slug)
+
+create table if not exists public.tag_counts (
+  kind  text not null,
+  tag   text not null,
+  count integer not null default 0,
+  primary key (kind, tag)
+);
+
+-- backfill the catalogue from the tag arrays
+insert into public.tags (slug, label)
+select distinct t, initcap(replace(t, '-', ' '))
+  from (
+    select unnest(tags) as t from public.rfh
+    union all select unnest(tags) from public.questions
+    union all select unnest(tags) from public.offers
+    union all select unnest(tags) from public.projects
+    union all select unnest(tags) from public.events
+  ) x
+ where t is not null and btrim(t) <> ''
+on conflict (slug) do nothing;
+
+-- backfill the counters
+insert into public.tag_counts (kind, tag, count)
+select kind, tag, count(*)::int
+  from (
+    select 'rfh' as kind, unnest(tags) as tag from public.rfh
+    union all select 'question', unnest(tags) from public.questions
+    union all select 'offer', unnest(tags) from public.offers
+    union all select 'project', unnest(tags) from public.projects
+    union all select 'event', unnest(tags) from public.events
+    union all
+    select 'content', tg.slug
+      from public.content_tags ct
+      join public.tags tg on tg.id = ct.tag_id
+  ) x
+ where tag is not null and btrim(tag) <> ''
+ group by 1, 2
+on conflict (kind, tag) do update set count = excluded.count;
@@ -0,0 +1,8 @@
+-- 011_entries_feed.sql
+-- Keyset pages for GET /api/entries: (created_at desc, id desc) over public rows.
+-- The newest ENTRIES_HEAD_SIZE entries are served from memory (app/services/entries_feed.py);
+-- this index serves the pages past that and the head reloads.
+
+create index if not exists entries_public_created_idx
+  on public.entries (created_at desc, id desc)
+  where visibility = 'public';
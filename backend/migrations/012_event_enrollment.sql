@@ -0,0 +1,27 @@
+-- 012_event_enrollment.sql
+-- Capacity-enforcing enrollment (app/api/v1/routes_events.py).
+--   - events.enrolled_count / waitlist_count: maintained by the API in the same
+--     statement as every enroll / un-enroll, under the event row's lock
+--   - event_enrollments.status: 'going' | 'waitlisted'; the oldest waitlisted row
+--     is promoted when a 'going' seat frees up
+
+alter table public.events
+  add column if not exists enrolled_count integer not null default 0,
+  add column if not exists waitlist_count integer not null default 0;
+
+update public.events e
+   set enrolled_count = c.going,
+       waitlist_count = c.waiting
+  from (
+    select event_id,
+           count(*) filter (where coalesce(status, 'going') = 'going')::int as going,
+           count(*) filter (where status = 'waitlisted')::int as waiting
+      from public.event_enrollments
+     group by event_id
+  ) c
+ where c.event_id = e.id;
+
+-- promotion order: oldest waitlisted first
+create index if not exists event_enrollments_waitlist_idx
+  on public.event_enrollments (event_id, created_at, user_id)
+  where status = 'waitlisted';
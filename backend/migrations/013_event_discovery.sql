@@ -0,0 +1,21 @@
+-- 013_event_discovery.sql
+-- GET /api/events filters: from/to on starts_at, tags (all of), type, location prefix.
+--
+-- Keyset order is (starts_at, id) from `from` (default now()). A partial index
+-- can't say "starts_at >= now()" (predicates must be immutable), but the range
+-- scan below starts at `from`, so past events are never read however many pile up.
+
+create index if not exists events_public_starts_idx
+  on public.events (starts_at, id)
+  where visibility = 'public';
+
+create index if not exists events_public_type_starts_idx
+  on public.events (type, starts_at, id)
+  where visibility = 'public';
+
+create index if not exists events_tags_gin_idx
+  on public.events using gin (tags);
+
+create index if not exists events_location_prefix_idx
+  on public.events (lower(location) text_pattern_ops)
+  where visibility = 'public';
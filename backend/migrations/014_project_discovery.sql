@@ -0,0 +1,33 @@
+-- 014_project_discovery.sql
+-- Project discovery (app/api/v1/routes_projects.py).
+--   - projects.role_keys: needed_roles trimmed / lower-cased / de-duplicated, set by
+--     the API on insert; role filters and "projects for me" overlap on it
+--     (needed_roles keeps the owner's spelling for display)
+--   - GIN on role_keys and tags, keyset btrees for the newest-first listing
+--   - project_applications keyset per project for the owner's inbox
+
+alter table public.projects
+  add column if not exists role_keys text[] not null default '{}';
+
+update public.projects
+   set role_keys = array(
+         select distinct lower(btrim(r))
+           from unnest(coalesce(needed_roles, '{}')) r
+          where btrim(r) <> ''
+       )
+ where role_keys = '{}' and cardinality(coalesce(needed_roles, '{}')) > 0;
+
+create index if not exists projects_role_keys_gin_idx on public.projects using gin (role_keys);
+create index if not exists projects_tags_gin_idx      on public.projects using gin (tags);
+
+create index if not exists projects_public_created_idx
+  on public.projects (created_at desc, id desc)
+  where visibility = 'public';
+create index if not exists projects_public_region_created_idx
+  on public.projects (region, created_at desc, id desc)
+  where visibility = 'public';
+
+create index if not exists project_applications_project_created_idx
+  on public.project_applications (project_id, created_at desc, id desc);
+create index if not exists project_applications_applicant_idx
+  on public.project_applications (applicant_id, project_id);
@@ -0,0 +1,87 @@
+-- 015_moderation_queue.sql
+-- Moderation queue (app/services/moderation.py, /api/moderation/...).
+--   - moderation_items: one open item per reported entity; every report is folded
+--     into it by the API in the same statement as the report insert
+--     (distinct reporters, max severity, reporter weight, priority)
+--   - state: open -> claimed (lease_until) -> resolved; an expired lease goes back
+--     to open on the next claim
+--   - reports.item_id links each report to its item
+
+create table if not exists public.moderation_items (
+  id                uuid primary key default gen_random_uuid(),
+  entity            text not null,
+  entity_id         uuid not null,
+  state             text not null default 'open' check (state in ('open', 'claimed', 'resolved')),
+  report_count      integer not null default 0,          -- distinct reporters
+  severity_max      integer not null default 1,
+  reporter_weight   double precision not null default 0, -- sum of per-reporter weights
+  priority          double precision not null default 0,
+  first_reported_at timestamptz not null default now(),
+  last_reported_at  timestamptz not null default now(),
+  claimed_by        uuid references public.profiles(id),
+  lease_until       timestamptz,
+  resolved_by       uuid references public.profiles(id),
+  resolved_at       timestamptz,
+  resolution        text,
+  note              text
+);
+
+-- at most one unresolved item per entity (upsert target)
+create unique index if not exists moderation_items_entity_live_uidx
+  on public.moderation_items (entity, entity_id)
+  where state <> 'resolved';
+
+-- claim order over open items only
+create index if not exists moderation_items_open_priority_idx
+  on public.moderation_items (priority desc, first_reported_at, id)
+  where state = 'open';
+
+-- expired leases
+create index if not exists moderation_items_claimed_lease_idx
+  on public.moderation_items (lease_until)
+  where state = 'claimed';
+
+alter table public.reports
+  add column if not exists item_id uuid references public.moderation_items(id);
+
+create index if not exists reports_item_reporter_idx
+  on public.reports (item_id, reporter_id);
+create index if not exists reports_item_created_idx
+  on public.reports (item_id, created_at desc);
+
+-- backfill open reports; priority as in services/moderation.py
+with per_reporter as (
+  select r.entity::text as entity, r.entity_id, r.reporter_id,
+         max(r.severity) as severity, min(r.created_at) as first_at, max(r.created_at) as last_at
+    from public.reports r
+   where coalesce(r.state, 'open') = 'open'
+     and r.item_id is null
+   group by 1, 2, 3
+),
+agg as (
+  select pr.entity, pr.entity_id,
+         count(*)::int as report_count,
+         coalesce(max(pr.severity), 1) as severity_max,
+         sum(1 + ln(1 + least(greatest(coalesce(p.reputation, 0), 0), 10000) / 100.0)) as reporter_weight,
+         min(pr.first_at) as first_reported_at,
+         max(pr.last_at) as last_reported_at
+    from per_reporter pr
+    left join public.profiles p on p.id = pr.reporter_id
+   group by 1, 2
+)
+insert into public.moderation_items
+  (entity, entity_id, report_count, severity_max, reporter_weight, priority, first_reported_at, last_reported_at)
+select entity, entity_id, report_count, severity_max, reporter_weight,
+       2.0 * severity_max + 3.0 * ln(1 + reporter_weight),
+       first_reported_at, last_reported_at
+  from agg
+on conflict (entity, entity_id) where state <> 'resolved' do nothing;
+
+update public.reports r
+   set item_id = m.id
+  from public.moderation_items m
+ where m.entity = r.entity::text
+   and m.entity_id = r.entity_id
+   and m.state <> 'resolved'
+   and r.item_id is null
+   and coalesce(r.state, 'open') = 'open';
@@ -0,0 +1,38 @@
+-- 016_view_rating_counts.sql
+-- Maintained per-entity view and rating counters, so detail ETags
+-- (GET /psm/offers/{id}, GET /questions/{id}) are built from single-row
+-- lookups instead of aggregating the append-only views log / ratings.
+--   - insert into views   : view_counts.count + 1            (POST /views)
+--   - upsert into ratings : rating_counts.count + 1 on a new rating,
+--                           stars_sum + (new - old stars)     (POST /ratings)
+
+create table if not exists public.view_counts (
+  entity     text not null,
+  entity_id  uuid not null,
+  count      bigint not null default 0,
+  updated_at timestamptz not null default now(),
+  primary key (entity, entity_id)
+);
+
+create table if not exists public.rating_counts (
+  entity     text not null,
+  entity_id  uuid not null,
+  count      integer not null default 0,
+  stars_sum  integer not null default 0,
+  updated_at timestamptz not null default now(),
+  primary key (entity, entity_id)
+);
+
+-- backfill
+insert into public.view_counts (entity, entity_id, count)
+select entity::text, entity_id, count(*)
+  from public.views
+ group by 1, 2
+on conflict (entity, entity_id) do update set count = excluded.count, updated_at = now();
+
+insert into public.rating_counts (entity, entity_id, count, stars_sum)
+select entity::text, entity_id, count(*)::int, sum(stars)::int
+  from public.ratings
+ group by 1, 2
+on conflict (entity, entity_id) do update
+   set count = excluded.count, stars_sum = excluded.stars_sum, updated_at = now();